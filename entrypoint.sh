@@ -1,4 +1,11 @@
 #!/bin/sh
 
 python manage.py migrate
-python manage.py runserver 0.0.0.0:8000
\ No newline at end of file
+python manage.py collectstatic --noinput
+case "$ASYNC_VIEWS" in
+    [Tt]rue|TRUE|1|[Yy]es|[Oo]n)
+        # Serve through ASGI so async views run on the event loop
+        uvicorn mysite.asgi:application --host 0.0.0.0 --port 8000 ;;
+    *)
+        python manage.py runserver 0.0.0.0:8000 ;;
+esac
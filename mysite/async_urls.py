@@ -0,0 +1,9 @@
+"""
+URL configuration for mysite served by ASGI.
+
+Same as mysite.urls but read views of polls are the async views, enabled
+with ASYNC_VIEWS setting.
+"""
+from .urls import site_patterns
+
+urlpatterns = site_patterns('polls.async_urls')
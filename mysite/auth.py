@@ -0,0 +1,157 @@
+"""
+Module contains the authentication backend of mysite.
+
+Password hashing is deliberately slow, so password checks run in a small
+pool of threads. At most AUTH_HASHER_THREADS hashes are computed at once
+and at most AUTH_HASHER_QUEUE more wait, further logins are refused right
+away with HasherBusy. A burst of logins then cannot take every CPU from
+the requests served by the same worker, such as votes and results.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import get_hasher, identify_hasher
+from django.core.exceptions import PermissionDenied
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.utils.deprecation import MiddlewareMixin
+
+from polls import throttle
+
+logger = logging.getLogger("polls")
+
+
+class HasherBusy(Exception):
+    """
+    Raised when the hasher pool and its queue are full.
+
+    Not a PermissionDenied, so authenticate() lets it through without
+    sending user_login_failed and the login is not counted as a failure.
+    """
+
+
+class HasherBusyMiddleware(MiddlewareMixin):
+    """
+    Answer logins refused by a full hasher pool with 503.
+
+    Covers every view calling authenticate(), such as the admin login.
+    LoginView handles HasherBusy itself to show the login form again.
+    """
+
+    def process_exception(self, request, exception):
+        """Return 503 with Retry-After if the hasher pool was full."""
+        if not isinstance(exception, HasherBusy):
+            return None
+        response = HttpResponse("Too many logins in progress, try again "
+                                "in a moment.", status=503,
+                                content_type="text/plain")
+        response.headers["Retry-After"] = "1"
+        return response
+
+
+class HasherPool:
+    """Bounded pool of threads computing password hashes."""
+
+    def __init__(self, threads, queue_size):
+        """Create pool of threads accepting queue_size waiting jobs."""
+        self.executor = ThreadPoolExecutor(threads,
+                                           thread_name_prefix="hasher")
+        self.slots = threading.BoundedSemaphore(threads + queue_size)
+
+    def run(self, function, *args):
+        """
+        Run function in the pool and return its result.
+
+        :raises HasherBusy: if the pool and its queue are full
+        """
+        if not self.slots.acquire(blocking=False):
+            raise HasherBusy("Too many logins in progress.")
+        try:
+            return self.executor.submit(function, *args).result()
+        finally:
+            self.slots.release()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the hasher pool of this process."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = HasherPool(settings.AUTH_HASHER_THREADS,
+                               settings.AUTH_HASHER_QUEUE)
+        return _pool
+
+
+@receiver(setting_changed)
+def reset_pool(sender, setting, **kwargs):
+    """Create the pool again when its settings change in tests."""
+    global _pool
+    if setting.startswith("AUTH_HASHER_"):
+        with _pool_lock:
+            _pool = None
+
+
+def verify(user, password):
+    """Return whether password is the password of user, without saving."""
+    try:
+        hasher = identify_hasher(user.password)
+    except ValueError:
+        # Hashed by a hasher no longer in PASSWORD_HASHERS
+        return False
+    return hasher.verify(password, user.password)
+
+
+def must_update(encoded):
+    """Return whether the password hash should be computed again."""
+    hasher = get_hasher()
+    return identify_hasher(encoded).algorithm != hasher.algorithm \
+        or hasher.must_update(encoded)
+
+
+class PooledModelBackend(ModelBackend):
+    """Model backend checking passwords in the bounded hasher pool."""
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        """Authenticate with username and password, hashing in the pool."""
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        # Refuse before hashing, also for logins outside the login view
+        if throttle.login_wait(request, username):
+            raise PermissionDenied("Too many failed logins.")
+        try:
+            return self.authenticate_in_pool(UserModel, username, password)
+        except HasherBusy:
+            logger.warning("Login refused, hasher pool is full "
+                           "(user: %s)", username)
+            raise
+
+    def authenticate_in_pool(self, UserModel, username, password):
+        """Return the user if password is theirs, hashing in the pool."""
+        pool = get_pool()
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Hash anyway so unknown users take as long as known ones
+            pool.run(UserModel().set_password, password)
+            return None
+        correct = user.has_usable_password() \
+            and pool.run(verify, user, password)
+        if not correct or not self.user_can_authenticate(user):
+            return None
+        if must_update(user.password):
+            # Upgrade hash to current hasher settings, as check_password does
+            pool.run(user.set_password, password)
+            user.save(update_fields=["password"])
+        return user
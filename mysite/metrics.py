@@ -0,0 +1,231 @@
+"""
+Module contains per-request performance metrics of mysite.
+
+MetricsMiddleware measures wall time, database queries and time, and
+template render time of each request, adds them to the response as a
+Server-Timing header and aggregates them into in-process histograms by
+route, exposed in Prometheus text format by the metrics view.
+"""
+
+import contextvars
+import threading
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import DjangoTemplates
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERIES_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# Measurements of the request being served, shared with the threads that
+# run its ORM queries through sync_to_async
+current_stats = contextvars.ContextVar("current_stats", default=None)
+
+
+class RequestStats:
+    """Measurements of a single request."""
+
+    def __init__(self):
+        """Start measuring a request."""
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+
+
+class Histogram:
+    """Cumulative histogram of observed values with fixed buckets."""
+
+    def __init__(self, buckets):
+        """Create empty histogram with the upper bounds of buckets."""
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        """Add a value to the histogram."""
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+
+class Registry:
+    """Histograms of every metric by route, safe to use from any thread."""
+
+    metrics = {
+        "http_request_duration_seconds":
+            ("Wall time of requests by route.", SECONDS_BUCKETS),
+        "http_request_db_queries":
+            ("Database queries per request by route.", QUERIES_BUCKETS),
+        "http_request_db_duration_seconds":
+            ("Database time of requests by route.", SECONDS_BUCKETS),
+        "http_request_template_duration_seconds":
+            ("Template render time of requests by route.", SECONDS_BUCKETS),
+    }
+
+    def __init__(self):
+        """Create empty registry."""
+        self.histograms = {name: {} for name in self.metrics}
+        self.lock = threading.Lock()
+
+    def observe(self, route, stats, duration):
+        """Record measurements of a request to the route."""
+        values = {
+            "http_request_duration_seconds": duration,
+            "http_request_db_queries": stats.queries,
+            "http_request_db_duration_seconds": stats.db_time,
+            "http_request_template_duration_seconds": stats.template_time,
+        }
+        with self.lock:
+            for name, value in values.items():
+                histograms = self.histograms[name]
+                if route not in histograms:
+                    histograms[route] = Histogram(self.metrics[name][1])
+                histograms[route].observe(value)
+
+    def render(self):
+        """Return every histogram in Prometheus text exposition format."""
+        lines = []
+        with self.lock:
+            for name, (description, _) in self.metrics.items():
+                lines += [f"# HELP {name} {description}",
+                          f"# TYPE {name} histogram"]
+                for route, histogram in sorted(self.histograms[name].items()):
+                    label = f'route="{route}"'
+                    for bound, count in zip(histogram.buckets,
+                                            histogram.counts):
+                        lines.append(f'{name}_bucket{{{label},le="{bound}"}}'
+                                     f' {count}')
+                    lines += [
+                        f'{name}_bucket{{{label},le="+Inf"}} '
+                        f'{histogram.count}',
+                        f"{name}_sum{{{label}}} {histogram.sum}",
+                        f"{name}_count{{{label}}} {histogram.count}"]
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        """Remove every observation."""
+        with self.lock:
+            self.histograms = {name: {} for name in self.metrics}
+
+
+registry = Registry()
+
+
+def time_query(execute, sql, params, many, context):
+    """Database execute wrapper counting queries of the current request."""
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_time += time.perf_counter() - start
+
+
+def install_wrapper(connection, **kwargs):
+    """Time queries of the database connection."""
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+connection_created.connect(install_wrapper, dispatch_uid="mysite_metrics")
+
+
+class MetricsMiddleware:
+    """
+    Measure requests and record them by route name.
+
+    Should be first in MIDDLEWARE so the wall time covers every other
+    middleware. Works with both sync and async views.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        """Create middleware for the next handler in the chain."""
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        """Measure a request served by a sync handler."""
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats, token = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self.finish(request, response, stats)
+
+    async def __acall__(self, request):
+        """Measure a request served by an async handler."""
+        stats, token = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self.finish(request, response, stats)
+
+    def start(self):
+        """Start measuring the request."""
+        # Connections opened before this module was loaded
+        for connection in connections.all(initialized_only=True):
+            install_wrapper(connection)
+        stats = RequestStats()
+        return stats, current_stats.set(stats)
+
+    def finish(self, request, response, stats):
+        """Record measurements of the request and add Server-Timing."""
+        duration = time.perf_counter() - stats.start
+        response["Server-Timing"] = (
+            f"app;dur={duration * 1000:.1f}, "
+            f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries"'
+            f", tpl;dur={stats.template_time * 1000:.1f}")
+        match = request.resolver_match
+        registry.observe(match.view_name if match else "unmatched",
+                         stats, duration)
+        return response
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Django template backend recording render time of the request."""
+
+    def from_string(self, template_code):
+        """Return template from string, timed on render."""
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        """Return template by name, timed on render."""
+        return TimedTemplate(super().get_template(template_name))
+
+
+class TimedTemplate:
+    """Template of the backend adding its render time to the request."""
+
+    def __init__(self, template):
+        """Wrap a template of the Django backend."""
+        self.template = template
+
+    def __getattr__(self, name):
+        """Delegate other attributes to the wrapped template."""
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        """Render the template and record the time it took."""
+        stats = current_stats.get()
+        if stats is None:
+            return self.template.render(context, request)
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            stats.template_time += time.perf_counter() - start
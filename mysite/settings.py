@@ -9,6 +9,8 @@ https://docs.djangoproject.com/en/5.1/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
+import sys
+import tempfile
 from pathlib import Path
 from decouple import config, Csv
 from django.conf.global_settings import LOGIN_REDIRECT_URL, LOGOUT_REDIRECT_URL
@@ -41,20 +43,36 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First so that timings cover every other middleware
+    'mysite.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # Serve static files with the security headers, before any other work
+    # is done for the request. Every middleware must support async views,
+    # or Django runs the whole ASGI chain in threads
+    'mysite.static.StaticFilesMiddleware',
+    'polls.routers.PrimaryPinMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # 503 for logins refused by a full hasher pool, in any login view
+    'mysite.auth.HasherBusyMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'mysite.urls'
+# Serve read views of polls with async views, for ASGI deployments
+ASYNC_VIEWS = config('ASYNC_VIEWS', default=False, cast=bool)
+
+ROOT_URLCONF = 'mysite.async_urls' if ASYNC_VIEWS else 'mysite.urls'
+
+# Bearer token required to read /metrics, open to anyone when empty
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Django templates, timed for request metrics
+        'BACKEND': 'mysite.metrics.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -81,10 +99,142 @@ DATABASES = {
         "USER": config("DATABASE_USER", default="pollsapp"),
         "PASSWORD": config("DATABASE_PASSWORD", default="password"),
         "HOST": config("DATABASE_HOST", default="localhost"),
-        "PORT": config("DATABASE_PORT", default="5432")
+        "PORT": config("DATABASE_PORT", default="5432"),
+        # Seconds to keep a connection open for next requests, 0 closes it
+        # after each request, must be 0 when DATABASE_POOL is on
+        "CONN_MAX_AGE": config("CONN_MAX_AGE", default=0, cast=int),
+        # Check persistent connections are usable before reusing them
+        "CONN_HEALTH_CHECKS": config("CONN_HEALTH_CHECKS", default=False,
+                                     cast=bool),
+        "OPTIONS": {},
     }
 }
 
+# Share a psycopg connection pool between the threads of each process
+if config("DATABASE_POOL", default=False, cast=bool):
+    DATABASES["default"]["OPTIONS"]["pool"] = {
+        "min_size": config("DATABASE_POOL_MIN_SIZE", default=2, cast=int),
+        "max_size": config("DATABASE_POOL_MAX_SIZE", default=10, cast=int),
+        # Seconds a request waits for a free connection before failing
+        "timeout": config("DATABASE_POOL_TIMEOUT", default=10, cast=float),
+    }
+
+# Read replicas of the database, comma separated hosts. Tests use the
+# primary test database for every replica
+for n, host in enumerate(config("DATABASE_REPLICAS", default="",
+                                cast=Csv()), 1):
+    DATABASES[f"replica{n}"] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "OPTIONS": dict(DATABASES["default"]["OPTIONS"]),
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["polls.routers.ReplicaRouter"]
+
+# Aliases receiving reads of polls, reads of a browser stay on the primary
+# for some seconds after it voted
+POLLS_READ_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+POLLS_PRIMARY_PIN_SECONDS = config("POLLS_PRIMARY_PIN_SECONDS", default=10,
+                                   cast=int)
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": config(
+            "CACHE_BACKEND",
+            default="django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": config("CACHE_LOCATION", default="ku-polls"),
+    }
+}
+
+# True when the cache is shared by every server process, such as Redis or
+# Memcached, and not kept in the memory of each process
+CACHE_IS_SHARED = not CACHES["default"]["BACKEND"].endswith(
+    ("LocMemCache", "DummyCache"))
+
+# Sessions are read from cache and written through to the database when
+# the cache is shared. A per-process cache would keep a session flushed by
+# logout in one worker valid in the others, so sessions are then read from
+# the database. signed_cookies stores them in the browser without storage
+SESSION_ENGINE = config(
+    "SESSION_ENGINE",
+    default=("django.contrib.sessions.backends.cached_db" if CACHE_IS_SHARED
+             else "django.contrib.sessions.backends.db"))
+# Messages (such as "Your vote was updated") are kept in a cookie, so
+# showing them never writes the session
+MESSAGE_STORAGE = config(
+    "MESSAGE_STORAGE",
+    default="django.contrib.messages.storage.cookie.CookieStorage")
+
+# Seconds to keep results of open and closed polls in cache, also the
+# max-age of closed poll results sent to clients. An admin edit of a
+# closed poll only clears the cache of its own process, so with a
+# per-process cache closed results are kept as briefly as open ones
+POLLS_RESULTS_CACHE_TIMEOUT = config("POLLS_RESULTS_CACHE_TIMEOUT",
+                                     default=60, cast=int)
+POLLS_CLOSED_RESULTS_CACHE_TIMEOUT = config(
+    "POLLS_CLOSED_RESULTS_CACHE_TIMEOUT",
+    default=60 * 60 * 24 if CACHE_IS_SHARED else 60, cast=int)
+
+
+# Seconds to keep the map of choices each user voted for in cache. A vote
+# only updates the map in the cache of its own process, so with a
+# per-process cache other workers show the old map until it expires
+POLLS_VOTE_MAP_TIMEOUT = config(
+    "POLLS_VOTE_MAP_TIMEOUT", default=60 * 60 if CACHE_IS_SHARED else 10,
+    cast=int)
+
+# Days after the end of a poll before archive_votes moves its votes
+POLLS_ARCHIVE_AFTER_DAYS = config("POLLS_ARCHIVE_AFTER_DAYS", default=30,
+                                  cast=int)
+
+
+# Number of polls per page of the poll index
+POLLS_INDEX_PAGE_SIZE = config("POLLS_INDEX_PAGE_SIZE", default=20, cast=int)
+
+
+# Live results stream, the PostgreSQL backend reaches every worker process
+POLLS_BROKER_BACKEND = config("POLLS_BROKER_BACKEND",
+                              default="polls.broker.LocalBackend")
+# Most messages per second sent to each results stream subscriber
+POLLS_RESULTS_STREAM_RATE = config("POLLS_RESULTS_STREAM_RATE",
+                                   default=2, cast=float)
+# Seconds between keep-alive comments on an idle results stream
+POLLS_RESULTS_STREAM_KEEPALIVE = config("POLLS_RESULTS_STREAM_KEEPALIVE",
+                                        default=15, cast=float)
+
+
+# Buffered voting, votes are journaled locally and written in batches
+POLLS_VOTE_BUFFER = config("POLLS_VOTE_BUFFER", default=False, cast=bool)
+POLLS_VOTE_JOURNAL = config("POLLS_VOTE_JOURNAL",
+                            default=str(BASE_DIR / "vote-journal.sqlite3"))
+# Milliseconds between flushes and most votes written per batch
+POLLS_VOTE_FLUSH_INTERVAL = config("POLLS_VOTE_FLUSH_INTERVAL",
+                                   default=200, cast=int)
+POLLS_VOTE_FLUSH_SIZE = config("POLLS_VOTE_FLUSH_SIZE", default=500, cast=int)
+
+
+# Throttling of failed logins and votes, "hits/seconds" in a sliding window
+POLLS_THROTTLE_RATES = {
+    # failed logins of a username, and from an IP address
+    'login_username': config('POLLS_THROTTLE_LOGIN_USERNAME', default='5/300'),
+    'login_ip': config('POLLS_THROTTLE_LOGIN_IP', default='20/300'),
+    # vote requests of a user, or of an IP address for visitors
+    'vote': config('POLLS_THROTTLE_VOTE', default='30/60'),
+}
+# polls.throttle.LocalStore keeps hits in each process, CacheStore in the
+# POLLS_THROTTLE_CACHE cache shared by every process
+POLLS_THROTTLE_STORE = config('POLLS_THROTTLE_STORE',
+                              default='polls.throttle.LocalStore')
+POLLS_THROTTLE_CACHE = config('POLLS_THROTTLE_CACHE', default='default')
+# Most usernames, IP addresses and users remembered by LocalStore
+POLLS_THROTTLE_MAX_KEYS = config('POLLS_THROTTLE_MAX_KEYS', default=10000,
+                                 cast=int)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -106,10 +256,15 @@ AUTH_PASSWORD_VALIDATORS = [
 
 
 AUTHENTICATION_BACKENDS = [
-    # username & password authentication
-    'django.contrib.auth.backends.ModelBackend',
+    # username & password authentication, passwords checked in a thread pool
+    'mysite.auth.PooledModelBackend',
 ]
 
+# Password hashes computed at once, and logins waiting for a thread before
+# further logins are refused
+AUTH_HASHER_THREADS = config('AUTH_HASHER_THREADS', default=2, cast=int)
+AUTH_HASHER_QUEUE = config('AUTH_HASHER_QUEUE', default=16, cast=int)
+
 LOGIN_REDIRECT_URL = 'polls:index'  # after login, redirection
 LOGOUT_REDIRECT_URL = 'login'
 
@@ -130,6 +285,22 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR / "static"]
+# Directory collectstatic copies static files to, served by WhiteNoise
+STATIC_ROOT = config('STATIC_ROOT', default=str(BASE_DIR / "staticfiles"))
+
+# With COMPRESS_STATIC, collectstatic writes content hashed file names and
+# gzip/brotli copies, served with far-future immutable cache headers
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": (
+            "whitenoise.storage.CompressedManifestStaticFilesStorage"
+            if config('COMPRESS_STATIC', default=False, cast=bool)
+            else "django.contrib.staticfiles.storage.StaticFilesStorage"),
+    },
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
@@ -138,6 +309,13 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
 # Logging
+# Records are written to LOG_FILE by a background thread, rotated when the
+# file reach LOG_MAX_BYTES or at LOG_ROTATE_WHEN (for example "midnight").
+# Tests log to a file in the temporary directory, not to the site log.
+if sys.argv[1:2] == ["test"]:
+    DEFAULT_LOG_FILE = str(Path(tempfile.gettempdir()) / "polls-test.log")
+else:
+    DEFAULT_LOG_FILE = "activity.log"
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
@@ -147,13 +325,20 @@ LOGGING = {
             "datefmt": "%d/%b/%Y %H:%M:%S",
             "style": "%",
         },
+        "json": {
+            "()": "polls.log.JSONFormatter",
+        },
     },
     "handlers": {
         "polls_activity": {
-            "class": "logging.FileHandler",
-            "filename": "activity.log",
+            "class": "polls.log.QueuedFileHandler",
+            "filename": config("LOG_FILE", default=DEFAULT_LOG_FILE),
+            "max_bytes": config("LOG_MAX_BYTES", default=10 * 1024 * 1024,
+                                cast=int),
+            "backup_count": config("LOG_BACKUP_COUNT", default=5, cast=int),
+            "when": config("LOG_ROTATE_WHEN", default=""),
             "level": "DEBUG",
-            "formatter": "simple",
+            "formatter": config("LOG_FORMAT", default="simple"),
         }
     },
     "loggers": {
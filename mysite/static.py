@@ -0,0 +1,69 @@
+"""
+Module contains the static files middleware of mysite.
+
+WhiteNoiseMiddleware is sync only, so with it Django would run the whole
+ASGI middleware chain and every async view in threads. This subclass
+also works with async handlers: requests for other paths are awaited
+directly, and only static files are read in a thread.
+"""
+
+from asgiref.sync import (iscoroutinefunction, markcoroutinefunction,
+                          sync_to_async)
+from django.http import HttpResponse
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+
+def read_response(static_file, method, headers):
+    """
+    Return the response of a static file, with the file read whole.
+
+    :return: tuple of status, list of headers and body
+    """
+    response = static_file.get_response(method, headers)
+    if response.file is None:
+        return int(response.status), response.headers, b""
+    with response.file:
+        return int(response.status), response.headers, response.file.read()
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    Serve STATIC_ROOT with WhiteNoise, with both sync and async handlers.
+
+    Should come right after SecurityMiddleware, so static responses get
+    its headers and no other middleware does work for them.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        """Create middleware for the next handler in the chain."""
+        super().__init__(get_response)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        """Serve a static file, or the request with a sync handler."""
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        """Serve a static file, or the request with an async handler."""
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(
+                request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is None:
+            return await self.get_response(request)
+        # Static files are small, read whole rather than stream a sync file
+        status, headers, body = await sync_to_async(
+            read_response, thread_sensitive=False)(
+                static_file, request.method, request.META)
+        response = HttpResponse(body, status=status)
+        del response["Content-Type"]
+        for key, value in headers:
+            response[key] = value
+        return response
@@ -19,10 +19,18 @@ from django.urls import path, include
 from django.views.generic.base import RedirectView
 from . import views
 
-urlpatterns = [
-    path('polls/', include('polls.urls')),
-    path('', RedirectView.as_view(url='/polls/')),
-    path('admin/', admin.site.urls),
-    path('accounts/', include('django.contrib.auth.urls')),
-    path('signup/', views.signup, name='signup')
-]
+
+def site_patterns(polls_urls):
+    """Return urlpatterns of the site with polls app from polls_urls."""
+    return [
+        path('polls/', include(polls_urls)),
+        path('', RedirectView.as_view(url='/polls/')),
+        path('admin/', admin.site.urls),
+        path('accounts/login/', views.LoginView.as_view(), name='login'),
+        path('accounts/', include('django.contrib.auth.urls')),
+        path('signup/', views.signup, name='signup'),
+        path('metrics', views.metrics, name='metrics'),
+    ]
+
+
+urlpatterns = site_patterns('polls.urls')
@@ -1,8 +1,17 @@
 """Module contains view for mysite."""
 
+import hmac
+import math
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
 from django.shortcuts import render, redirect
-from django.contrib.auth import login, authenticate
+from django.contrib.auth import login
+from django.contrib.auth import views as auth_views
+from django.views.decorators.http import require_safe
+from .auth import HasherBusy
 from .form import UserRegisterForm
+from .metrics import registry
+from polls import throttle
 from django.contrib.messages import error
 
 
@@ -11,16 +20,54 @@ def signup(request):
     if request.method == 'POST':
         form = UserRegisterForm(request.POST)
         if form.is_valid():
-            form.save()
-            # get named fields from the form data
-            username = form.cleaned_data.get('username')
-            # password input field is named 'password1'
-            raw_passwd = form.cleaned_data.get('password1')
-            email = form.cleaned_data.get('email')
-            user = authenticate(username=username, password=raw_passwd, email=email)
-            login(request, user)
+            user = form.save()
+            # Password was just hashed by the form, log in without
+            # authenticate() hashing it again
+            login(request, user, backend=settings.AUTHENTICATION_BACKENDS[0])
             return redirect('polls:index')
     else:
         # create a user form and display it the signup page
         form = UserRegisterForm()
     return render(request, 'registration/signup.html', {'form': form})
+
+
+class LoginView(auth_views.LoginView):
+    """
+    Login view refusing usernames and IPs with too many failed logins.
+
+    A login refused because the hasher pool is full gets 503 and is not
+    counted as a failed login.
+    """
+
+    def post(self, request, *args, **kwargs):
+        """Log in, unless over the limit of failed logins or too busy."""
+        wait = throttle.login_wait(request, request.POST.get("username", ""))
+        if wait:
+            context = self.get_context_data(throttle_wait=math.ceil(wait))
+            return self.render_to_response(context, status=429)
+        try:
+            return super().post(request, *args, **kwargs)
+        except HasherBusy:
+            # Unbound form, rendering the posted one would authenticate again
+            form = self.get_form_class()(request, initial={
+                "username": request.POST.get("username", "")})
+            context = self.get_context_data(form=form, hasher_busy=True)
+            response = self.render_to_response(context, status=503)
+            response.headers["Retry-After"] = "1"
+            return response
+
+
+@require_safe
+def metrics(request):
+    """
+    Return request metrics of this process in Prometheus text format.
+
+    When METRICS_TOKEN is set, scrapers must send it as a bearer token.
+    """
+    if settings.METRICS_TOKEN:
+        expected = f"Bearer {settings.METRICS_TOKEN}"
+        supplied = request.headers.get("Authorization", "")
+        if not hmac.compare_digest(supplied.encode(), expected.encode()):
+            return HttpResponseForbidden()
+    return HttpResponse(registry.render(),
+                        content_type="text/plain; version=0.0.4")
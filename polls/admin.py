@@ -1,7 +1,205 @@
-"""Module to register model/class to admin sites for easy access."""
+"""
+Module to register model/class to admin sites for easy access.
 
-from django.contrib import admin
-from .models import Question, Choice
+Changelists run a fixed number of queries per page: related objects shown
+in a row are joined, foreign keys are edited with raw id or autocomplete
+widgets instead of a select listing every row, and the row count of a
+large unfiltered table is estimated instead of counted. Bulk actions run
+as a few set-based queries whatever the number of selected polls.
+"""
 
-admin.site.register(Question)  # Register Question model
-admin.site.register(Choice)  # Register Choice model
+from django.contrib import admin, messages
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.db.models import F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .cache import invalidate_many_results
+from .models import Question, Choice, Vote
+from .snapshots import take_snapshots
+
+# Tables estimated to have at least this many rows are not counted
+APPROXIMATE_COUNT_OVER = 10000
+TEXT_LENGTH = Question._meta.get_field('question_text').max_length
+
+
+class ApproximateCountPaginator(Paginator):
+    """Paginator estimating the count of large unfiltered tables."""
+
+    @cached_property
+    def count(self):
+        """Return PostgreSQL row estimate of a large table, else count."""
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if not queryset.query.where and connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT reltuples FROM pg_class "
+                               "WHERE oid = %s::regclass",
+                               [queryset.model._meta.db_table])
+                row = cursor.fetchone()
+            if row and row[0] >= APPROXIMATE_COUNT_OVER:
+                return int(row[0])
+        return super().count
+
+
+class FastChangeListMixin:
+    """Changelist options shared by the admins of large tables."""
+
+    paginator = ApproximateCountPaginator
+    # Skip the second COUNT of the whole table on filtered changelists
+    show_full_result_count = False
+
+
+class OpenListFilter(admin.SimpleListFilter):
+    """Filter polls still open for voting or closed, on end_date index."""
+
+    title = "status"
+    parameter_name = "status"
+
+    def lookups(self, request, model_admin):
+        """Return the filter choices."""
+        return [("open", "Open"), ("closed", "Closed")]
+
+    def queryset(self, request, queryset):
+        """Filter questions by status."""
+        now = timezone.now()
+        is_open = Q(end_date__isnull=True) | Q(end_date__gt=now)
+        if self.value() == "open":
+            return queryset.filter(is_open)
+        if self.value() == "closed":
+            return queryset.exclude(is_open)
+        return queryset
+
+
+class ChoiceInline(admin.TabularInline):
+    """Choices edited on the page of their question."""
+
+    model = Choice
+    extra = 0
+    fields = ['choice_text', 'vote_count']
+    # Tallies are kept by polls.tallies, never edited by hand
+    readonly_fields = ['vote_count']
+
+
+@admin.register(Question)
+class QuestionAdmin(FastChangeListMixin, admin.ModelAdmin):
+    """Admin of questions with their vote totals."""
+
+    list_display = ['question_text', 'pub_date', 'end_date', 'total_votes']
+    list_filter = [OpenListFilter]
+    search_fields = ['question_text']
+    # Served by the pub_date index, year and month pages are range scans
+    date_hierarchy = 'pub_date'
+    ordering = ['-pub_date', '-id']
+    readonly_fields = ['results_version', 'results_modified']
+    inlines = [ChoiceInline]
+    actions = ['close_polls', 'clone_polls']
+
+    def get_queryset(self, request):
+        """Annotate total votes, summed only for the questions shown."""
+        totals = Choice.objects.filter(question=OuterRef('pk')).order_by()\
+            .values('question').annotate(total=Sum('vote_count'))\
+            .values('total')
+        return super().get_queryset(request)\
+            .annotate(total_votes=Coalesce(Subquery(totals), 0))
+
+    @admin.display(description="votes")
+    def total_votes(self, question):
+        """Return number of votes of the question."""
+        return question.total_votes
+
+    @admin.action(description="Close selected polls now")
+    def close_polls(self, request, queryset):
+        """
+        Set end date of the selected open polls to now.
+
+        Polls not published yet are skipped, ending them before their
+        publication date would hide them for good.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            ids = list(queryset.filter(Q(end_date__isnull=True)
+                                       | Q(end_date__gt=now),
+                                       pub_date__lte=now)
+                       .values_list('id', flat=True))
+            skipped = queryset.filter(pub_date__gt=now).count()
+            Question.objects.filter(pk__in=ids)\
+                .update(end_date=now,
+                        results_version=F('results_version') + 1,
+                        results_modified=now)
+            transaction.on_commit(lambda: invalidate_many_results(ids))
+            transaction.on_commit(lambda: take_snapshots(
+                Question.objects.filter(pk__in=ids)))
+        self.message_user(request, f"Closed {len(ids)} polls.",
+                          messages.SUCCESS)
+        if skipped:
+            self.message_user(request, f"Skipped {skipped} polls not "
+                              f"published yet.", messages.WARNING)
+
+    @admin.action(description="Clone selected polls with their choices")
+    def clone_polls(self, request, queryset):
+        """Copy selected polls and their choices, without votes."""
+        now = timezone.now()
+        originals = list(queryset.order_by('id'))
+        with transaction.atomic():
+            clones = Question.objects.bulk_create([
+                Question(question_text=f"Copy of {question.question_text}"
+                         [:TEXT_LENGTH],
+                         pub_date=now,
+                         end_date=(now + (question.end_date
+                                          - question.pub_date)
+                                   if question.end_date else None))
+                for question in originals])
+            clone_ids = {original.id: clone.id
+                         for original, clone in zip(originals, clones)}
+            Choice.objects.bulk_create([
+                Choice(question_id=clone_ids[question_id],
+                       choice_text=choice_text)
+                for question_id, choice_text in Choice.objects
+                .filter(question__in=originals).order_by('id')
+                .values_list('question_id', 'choice_text')])
+        self.message_user(request, f"Cloned {len(clones)} polls.",
+                          messages.SUCCESS)
+
+
+@admin.register(Choice)
+class ChoiceAdmin(FastChangeListMixin, admin.ModelAdmin):
+    """Admin of choices, showing their question without a query per row."""
+
+    list_display = ['choice_text', 'question', 'vote_count']
+    list_select_related = ['question']
+    search_fields = ['choice_text']
+    autocomplete_fields = ['question']
+    readonly_fields = ['vote_count']
+    ordering = ['-id']
+
+
+@admin.register(Vote)
+class VoteAdmin(FastChangeListMixin, admin.ModelAdmin):
+    """
+    Read-only admin of votes.
+
+    Votes change tallies, so they are only added, changed or deleted by
+    users voting, never from the admin.
+    """
+
+    list_display = ['id', 'user', 'question', 'choice']
+    list_select_related = ['user', 'question', 'choice']
+    raw_id_fields = ['user', 'question', 'choice']
+    # Exact match uses the unique username index
+    search_fields = ['=user__username']
+    ordering = ['-id']
+
+    def has_add_permission(self, request):
+        """Votes are only added by voting."""
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        """Votes are only changed by voting."""
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        """Votes are only removed with their choice or user."""
+        return False
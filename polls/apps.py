@@ -1,6 +1,19 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.signals import request_started
 
 
 class PollsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'polls'
+
+    def ready(self):
+        # Connect results cache invalidation signals
+        import polls.cache  # noqa: F401
+        # Connect restore of archived votes of reopened polls
+        import polls.archive  # noqa: F401
+        if settings.POLLS_VOTE_BUFFER:
+            # Start flushing buffered votes with the first request served
+            from polls.votebuffer import start_buffer
+            request_started.connect(start_buffer,
+                                    dispatch_uid="polls_vote_buffer")
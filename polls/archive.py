@@ -0,0 +1,138 @@
+"""
+Module contains the archive of votes of polls closed long ago.
+
+Votes of polls closed for more than POLLS_ARCHIVE_AFTER_DAYS are moved
+from the Vote table to the ArchivedVote table in batches, so the table
+and indexes used by voting on open polls only hold recent polls. Choice
+tallies are not changed, they count archived votes too, and so do the
+tally rebuild, the vote maps and the vote export. A poll reopened by an
+admin gets its votes restored before anyone votes again.
+"""
+
+import datetime
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from polls import tallies
+from polls.models import Question, Choice, Vote, ArchivedVote
+
+FIELDS = ['id', 'choice_id', 'user_id', 'question_id']
+
+
+def archivable_questions(now=None):
+    """Return questions closed for more than POLLS_ARCHIVE_AFTER_DAYS."""
+    now = now or timezone.now()
+    cutoff = now - datetime.timedelta(days=settings.POLLS_ARCHIVE_AFTER_DAYS)
+    return Question.objects.filter(end_date__lte=cutoff)
+
+
+def move_batch(source, target, question_ids, batch_size, now):
+    """
+    Move up to batch_size rows of the questions from source to target.
+
+    On PostgreSQL rows are moved by a single DELETE ... RETURNING feeding
+    an INSERT, elsewhere they are read then inserted and deleted.
+
+    :return: number of rows moved
+    """
+    if connection.vendor == 'postgresql':
+        columns = ", ".join(FIELDS)
+        archived = target is ArchivedVote
+        with connection.cursor() as cursor:
+            # Rows dropped on conflict are still moved, so count deleted rows
+            cursor.execute(
+                f"WITH moved AS ("
+                f"DELETE FROM {source._meta.db_table} WHERE id IN ("
+                f"SELECT id FROM {source._meta.db_table} "
+                f"WHERE question_id = ANY(%s) LIMIT %s FOR UPDATE) "
+                f"RETURNING {columns}), inserted AS ("
+                f"INSERT INTO {target._meta.db_table} "
+                f"({columns}{', archived' if archived else ''}) "
+                f"SELECT {columns}{', %s' if archived else ''} FROM moved "
+                f"ON CONFLICT DO NOTHING) "
+                f"SELECT count(*) FROM moved",
+                [list(question_ids), batch_size] + ([now] if archived else []))
+            return cursor.fetchone()[0]
+    rows = list(source.objects.select_for_update()
+                .filter(question_id__in=question_ids)
+                .values_list(*FIELDS)[:batch_size])
+    if not rows:
+        return 0
+    extra = {'archived': now} if target is ArchivedVote else {}
+    target.objects.bulk_create(
+        [target(**dict(zip(FIELDS, row)), **extra) for row in rows],
+        ignore_conflicts=True)
+    source.objects.filter(id__in=[row[0] for row in rows]).delete()
+    return len(rows)
+
+
+def move_votes(source, target, questions, batch_size, progress):
+    """
+    Move votes of the questions from source to target, a batch at a time.
+
+    :return: number of votes moved
+    """
+    progress = progress or (lambda message: None)
+    question_ids = list(questions.values_list('id', flat=True))
+    moved = 0
+    for start in range(0, len(question_ids), batch_size):
+        chunk = question_ids[start:start + batch_size]
+        while True:
+            with transaction.atomic():
+                count = move_batch(source, target, chunk, batch_size,
+                                   timezone.now())
+            if not count:
+                break
+            moved += count
+            progress(f"Moved {moved} votes.")
+    return moved
+
+
+def archive_votes(questions=None, batch_size=5000, progress=None):
+    """
+    Move votes of polls closed long ago to the archive.
+
+    :param questions: queryset of questions, default archivable_questions()
+    only questions closed long enough are archived
+    :param progress: callable receiving a message after each batch
+    :return: number of votes archived
+    """
+    eligible = archivable_questions()
+    if questions is not None:
+        eligible = eligible.filter(pk__in=questions.values('pk'))
+    return move_votes(Vote, ArchivedVote, eligible, batch_size, progress)
+
+
+def restore_votes(questions=None, batch_size=5000, progress=None):
+    """
+    Move archived votes of the questions back to the Vote table.
+
+    A user who voted again meanwhile keeps their new vote, tallies of the
+    questions are rebuilt so they count the votes kept.
+
+    :param questions: queryset of questions, default all questions
+    :return: number of votes restored
+    """
+    if questions is None:
+        questions = Question.objects.filter(
+            pk__in=ArchivedVote.objects.values('question_id'))
+    # Resolve the ids now, the default queryset is empty once restored
+    questions = Question.objects.filter(
+        pk__in=list(questions.values_list('id', flat=True)))
+    restored = move_votes(ArchivedVote, Vote, questions, batch_size,
+                          progress)
+    if restored:
+        tallies.rebuild(Choice.objects.filter(question__in=questions))
+    return restored
+
+
+@receiver(post_save, sender=Question)
+def restore_reopened(sender, instance, raw=False, created=False, **kwargs):
+    """Restore archived votes of a question reopened for voting."""
+    if raw or created or not instance.can_vote():
+        return
+    if ArchivedVote.objects.filter(question=instance).exists():
+        restore_votes(Question.objects.filter(pk=instance.pk))
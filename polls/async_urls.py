@@ -0,0 +1,6 @@
+"""Module contains urlpatterns of polls app served by async views."""
+from . import async_views
+from .urls import polls_patterns
+
+app_name = 'polls'
+urlpatterns = polls_patterns(async_views)
@@ -0,0 +1,155 @@
+"""
+Module defined async version of the read-only views of Poll app.
+
+Used when the site is served through ASGI (ASYNC_VIEWS setting). Database
+reads use the async ORM, blocking work such as session, auth and messages
+is offloaded to a thread, so a single worker can serve many slow clients.
+"""
+
+from typing import Any
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.http import Http404
+from django.http import HttpRequest, HttpResponse, HttpResponseRedirect
+from django.urls import reverse
+from django.views.decorators.http import require_safe
+
+from polls import views
+from polls.broker import get_broker
+from polls.cache import aget_results
+from polls.models import Question, Choice
+from polls.votemap import aget_vote_map
+
+handle_access_non_exist_question = sync_to_async(
+    views.handle_access_non_exist_question)
+
+
+class IndexView(views.IndexView):
+    """Async index view show published questions, newest first."""
+
+    async def get(self, request: HttpRequest,
+                  *args: Any, **kwargs: Any) -> HttpResponse:
+        """Fetch a page of questions with the async ORM."""
+        self.object_list = [question async for question
+                            in self.get_queryset()]
+        self.vote_map = await aget_vote_map(await aget_user_id(request))
+        context = self.get_context_data()
+        return self.render_to_response(context)
+
+
+class DetailView(views.DetailView):
+    """Async detail view show question detail, choices and vote button."""
+
+    async def get(self, request: HttpRequest,
+                  *args: Any, **kwargs: Any) -> HttpResponse:
+        """Fetch question, choices and user's vote with the async ORM."""
+        try:
+            self.object = await self.get_queryset().aget(pk=kwargs['pk'])
+        except Question.DoesNotExist:
+            return await handle_access_non_exist_question(request,
+                                                          kwargs['pk'])
+        if not self.object.can_vote():  # Check if unable to vote
+            return HttpResponseRedirect(reverse('polls:results',
+                                        args=(self.object.id,)))
+        self.choices = [choice async for choice
+                        in self.object.choice_set.all()]
+        self.voted_choice = await aget_voted_choice(request, self.object)
+        context = self.get_context_data(object=self.object)
+        return self.render_to_response(context)
+
+
+class ResultsView(views.ResultsView):
+    """Async results view show question and each choice score."""
+
+    async def get(self, request: HttpRequest,
+                  *args: Any, **kwargs: Any) -> HttpResponse:
+        """Fetch results from cache, or with the async ORM on a miss."""
+        results = await aget_results(kwargs['pk'])
+        if results is None or not results[0].is_published():
+            return await handle_access_non_exist_question(request,
+                                                          kwargs['pk'])
+        self.object, self.choices = results
+        self.voted_choice = await aget_voted_choice(request, self.object)
+        context = self.get_context_data(object=self.object)
+        return self.render_to_response(context)
+
+
+@require_safe
+async def results_json(request: HttpRequest, pk: int) -> HttpResponse:
+    """Async version of JSON results of the question."""
+    return views.results_json_response(request, pk, await aget_results(pk))
+
+
+async def results_stream(request: HttpRequest, pk: int) -> HttpResponse:
+    """
+    Stream live results of the question as Server-Sent Events.
+
+    A snapshot of the counts is sent first, then a delta event with the
+    vote change of each choice whenever votes are committed. Deltas are
+    coalesced to at most POLLS_RESULTS_STREAM_RATE messages per second.
+    Both carry the results version, deltas already counted in the
+    snapshot are dropped.
+    """
+    # Subscribe before reading snapshot so no vote fall between the two
+    subscription = get_broker().subscribe(pk)
+    results = await aget_stream_results(pk)
+    if results is None or not results[0].is_published():
+        get_broker().unsubscribe(subscription)
+        raise Http404(f"Polls {pk} not exists.")
+    subscription.start_at(results[0].results_version)
+
+    async def events():
+        try:
+            yield views.sse_event("snapshot", views.results_data(*results))
+            while True:
+                message = await subscription.next(
+                    settings.POLLS_RESULTS_STREAM_KEEPALIVE)
+                if message is None:
+                    yield ": keep-alive\n\n"
+                elif message[1]:
+                    yield views.sse_event("delta", {"version": message[0],
+                                                    "choices": message[1]})
+        finally:
+            get_broker().unsubscribe(subscription)
+
+    return views.results_stream_response(events())
+
+
+async def aget_stream_results(question_id):
+    """
+    Read question and choices for the start of a results stream.
+
+    Read from the primary, not from the results cache or a replica, which
+    may be older than deltas already published. Choices are read with
+    their question in one query, so the counts match its results version.
+
+    :return: tuple of (question, list of choices) or None if the question
+    does not exist
+    """
+    choices = [choice async for choice in Choice.objects
+               .using(DEFAULT_DB_ALIAS).select_related('question')
+               .filter(question_id=question_id).order_by('id')]
+    if choices:
+        return choices[0].question, choices
+    question = await Question.objects.using(DEFAULT_DB_ALIAS)\
+        .filter(pk=question_id).afirst()
+    return None if question is None else (question, [])
+
+
+async def aget_user_id(request):
+    """Return id of the logged in user, None for visitors."""
+    user = await request.auser()
+    # Reuse the loaded user when the template is rendered
+    request.user = user
+    return user.id if user.is_authenticated else None
+
+
+async def aget_voted_choice(request, question):
+    """
+    Get the id of choice the current user voted for in the question.
+
+    :return: choice id, or None if user is anonymous or has not voted yet
+    """
+    vote_map = await aget_vote_map(await aget_user_id(request))
+    return vote_map.get(question.id)
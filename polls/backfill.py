@@ -0,0 +1,85 @@
+"""Module contains batched backfill and cleanup of Vote rows."""
+
+import time
+from django.db import transaction
+from django.db.models import Count, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_vote_question(vote_model, choice_model, batch_size=5000,
+                           start_id=0, pause=0, progress=None):
+    """
+    Copy question of the choice into Vote.question, batch by batch.
+
+    Each batch is a short UPDATE of at most batch_size rows walking forward
+    on the primary key, so the table is never locked for long. Filled rows
+    are skipped, which make the backfill safe to resume at any time.
+    Model classes are arguments so migrations can pass historical models.
+
+    :param start_id: only backfill votes with id greater than this
+    :param pause: seconds to sleep between batches
+    :param progress: callable receive (last id, rows updated) after a batch
+    :return: number of votes updated
+    """
+    question = Subquery(choice_model.objects.filter(pk=OuterRef('choice_id'))
+                        .values('question_id')[:1])
+    last_id = start_id
+    total = 0
+    while True:
+        ids = list(vote_model.objects
+                   .filter(pk__gt=last_id, question__isnull=True)
+                   .order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return total
+        total += vote_model.objects.filter(pk__in=ids)\
+            .update(question=question)
+        last_id = ids[-1]
+        if progress is not None:
+            progress(last_id, total)
+        if pause:
+            time.sleep(pause)
+
+
+def dedupe_votes(vote_model, choice_model, batch_size=1000, progress=None):
+    """
+    Delete duplicate votes of a user on a question, keeping the latest.
+
+    Duplicates were left by the old check-then-insert vote and must be gone
+    before the unique (user, question) index is built. Each batch of
+    duplicated pairs is deleted and the tallies of its choices are counted
+    again in one transaction. Model classes are arguments so migrations can
+    pass historical models.
+
+    :param batch_size: number of duplicated (user, question) pairs per batch
+    :param progress: callable receive number of votes deleted after a batch
+    :return: number of votes deleted
+    """
+    duplicates = vote_model.objects.filter(question__isnull=False)\
+        .order_by().values('user_id', 'question_id')\
+        .annotate(latest=Max('pk'), count=Count('pk')).filter(count__gt=1)
+    counts = vote_model.objects.filter(choice=OuterRef('pk')).order_by()\
+        .values('choice').annotate(total=Count('pk')).values('total')
+    total = 0
+    while True:
+        with transaction.atomic():
+            pairs = {(pair['user_id'], pair['question_id']): pair['latest']
+                     for pair in duplicates[:batch_size]}
+            if not pairs:
+                return total
+            rows = [(pk, choice_id, pairs[(user_id, question_id)] == pk)
+                    for pk, user_id, question_id, choice_id
+                    in vote_model.objects
+                    .filter(user_id__in={user for user, _ in pairs},
+                            question_id__in={question for _, question
+                                             in pairs})
+                    .values_list('pk', 'user_id', 'question_id', 'choice_id')
+                    if (user_id, question_id) in pairs]
+            total += vote_model.objects\
+                .filter(pk__in=[pk for pk, _, latest in rows if not latest])\
+                .delete()[0]
+            # Kept votes may have been counted twice too, recount them all
+            choice_model.objects\
+                .filter(pk__in={choice_id for _, choice_id, _ in rows})\
+                .update(vote_count=Coalesce(Subquery(counts), Value(0)))
+        if progress is not None:
+            progress(total)
@@ -0,0 +1,171 @@
+"""Module contains helpers shared by the benchmark commands of Poll app."""
+
+import contextlib
+import datetime
+import math
+import random
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import close_old_connections, connection
+from django.test import Client, override_settings
+from django.utils import timezone
+
+from polls import tallies
+from polls.models import Question, Choice, Vote
+
+# Number of queries of a response, from its Server-Timing header
+QUERIES_PATTERN = re.compile(r'desc="(\d+) queries"')
+
+
+@contextlib.contextmanager
+def test_database():
+    """
+    Run the block against a throwaway test database, never real data.
+
+    Throttling is off in the block, benchmarks send many requests per user.
+    Read replicas are off too, their aliases point at the real databases.
+    """
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True,
+                                       serialize=False)
+    try:
+        with override_settings(POLLS_THROTTLE_RATES=dict.fromkeys(
+                settings.POLLS_THROTTLE_RATES), POLLS_READ_REPLICAS=[]):
+            yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def seed(questions=50, choices=4, users=200, votes=2000, closed=0.2,
+         rng=None):
+    """
+    Fill the database with a dataset for benchmarks.
+
+    :param closed: fraction of questions whose end_date has passed
+    :return: list of created questions
+    """
+    rng = rng or random.Random(0)
+    now = timezone.now()
+    created = Question.objects.bulk_create([
+        Question(question_text=f"Question {n}",
+                 pub_date=now - datetime.timedelta(days=n + 1),
+                 end_date=(now - datetime.timedelta(hours=1)
+                           if rng.random() < closed else None))
+        for n in range(questions)])
+    Choice.objects.bulk_create([
+        Choice(question=question, choice_text=f"Choice {n}")
+        for question in created for n in range(choices)])
+    User.objects.bulk_create([
+        User(username=f"bench{n}", password="!") for n in range(users)])
+    question_choices = {}
+    for choice_id, question_id in Choice.objects.values_list('id',
+                                                             'question_id'):
+        question_choices.setdefault(question_id, []).append(choice_id)
+    user_ids = list(User.objects.filter(username__startswith="bench")
+                    .values_list('id', flat=True))
+    pairs = [(user_id, question.id) for question in created
+             for user_id in user_ids]
+    rng.shuffle(pairs)
+    Vote.objects.bulk_create([
+        Vote(user_id=user_id, question_id=question_id,
+             choice_id=rng.choice(question_choices[question_id]))
+        for user_id, question_id in pairs[:votes]], batch_size=5000)
+    tallies.rebuild()
+    return created
+
+
+def run_clients(requests, users):
+    """
+    Send requests from one thread per user, None for anonymous.
+
+    :param requests: list of (method, path, data), shared among the users
+    :return: list of (seconds, queries) of each request
+    """
+    def worker(n):
+        client = Client()
+        results = []
+        try:
+            if users[n] is not None:
+                client.force_login(users[n])
+            for method, path, data in requests[n::len(users)]:
+                start = time.perf_counter()
+                response = getattr(client, method)(path, data)
+                # Release connection as the request handler does, the
+                # test client keeps it open
+                close_old_connections()
+                results.append((time.perf_counter() - start,
+                                count_queries(response)))
+        finally:
+            connection.close()
+        return results
+
+    with ThreadPoolExecutor(max_workers=len(users)) as pool:
+        return [result for results in pool.map(worker, range(len(users)))
+                for result in results]
+
+
+def percentile(values, percent):
+    """Return the percentile of sorted values with nearest-rank method."""
+    if not values:
+        return None
+    rank = max(math.ceil(percent / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+def summarize(latencies, elapsed, queries=None):
+    """
+    Summarize request latencies of a run.
+
+    :param latencies: seconds taken by each request
+    :param elapsed: wall time of the whole run in seconds
+    :param queries: number of queries of each request, if measured
+    :return: dict with throughput and latency percentiles in milliseconds
+    """
+    latencies = sorted(latencies)
+    summary = {
+        'requests': len(latencies),
+        'throughput': round(len(latencies) / elapsed, 2) if elapsed else None,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+    }
+    if queries:
+        summary['queries'] = round(sum(queries) / len(queries), 2)
+    return summary
+
+
+def count_queries(response):
+    """Return number of queries of the response, None if not measured."""
+    match = QUERIES_PATTERN.search(response.get("Server-Timing", ""))
+    return int(match.group(1)) if match else None
+
+
+def compare(report, baseline, tolerance):
+    """
+    Compare summaries of routes against a baseline report.
+
+    :param tolerance: fraction that throughput and latency may get worse
+    :return: list of regressions found, empty if none
+    """
+    regressions = []
+    for route, summary in report.items():
+        base = baseline.get(route)
+        if base is None:
+            continue
+        if summary['throughput'] < base['throughput'] * (1 - tolerance):
+            regressions.append(f"{route}: throughput {summary['throughput']}"
+                               f" < baseline {base['throughput']}")
+        for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+            if summary[key] > base[key] * (1 + tolerance):
+                regressions.append(f"{route}: {key} {summary[key]}"
+                                   f" > baseline {base[key]}")
+        # Query counts are deterministic, any increase is a regression
+        if summary.get('queries') is not None \
+                and base.get('queries') is not None \
+                and summary['queries'] > base['queries']:
+            regressions.append(f"{route}: queries {summary['queries']}"
+                               f" > baseline {base['queries']}")
+    return regressions
@@ -0,0 +1,209 @@
+"""
+Module contains the in-process broker pushing live results to subscribers.
+
+Votes publish tally deltas through a backend, the backend hands them to
+the broker of every worker process, which fans them out to the results
+streams subscribed to the question. Deltas waiting for a subscriber are
+merged, so a hot poll sends a bounded number of messages per second.
+Deltas carry the results version of the question after them, so a stream
+drops the deltas already counted in the results it started from.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """Stream of merged tally deltas of one question for one subscriber."""
+
+    def __init__(self, question_id, rate):
+        """Create subscription bound to the running event loop."""
+        self.question_id = question_id
+        self.interval = 1 / rate
+        self.loop = asyncio.get_running_loop()
+        self.event = asyncio.Event()
+        self.pending = {}
+        self.version = None
+        # Results version the subscriber started from, deltas received
+        # before it is known wait in early
+        self.base = None
+        self.early = []
+        self.last_sent = 0
+
+    def start_at(self, version):
+        """Deliver only deltas newer than the results version given."""
+        self.loop.call_soon_threadsafe(self.set_base, version)
+
+    def set_base(self, version):
+        """Set the starting results version, in the loop thread."""
+        self.base = version
+        early, self.early = self.early, []
+        for deltas, delta_version in early:
+            self.merge(deltas, delta_version)
+
+    def push(self, deltas, version):
+        """Merge deltas from any thread into the pending message."""
+        self.loop.call_soon_threadsafe(self.merge, deltas, version)
+
+    def merge(self, deltas, version):
+        """Merge deltas newer than the base, in the loop thread."""
+        if self.base is None:
+            self.early.append((deltas, version))
+            return
+        # Deltas of concurrent votes may arrive out of order, so each one
+        # is only compared with the base
+        if version <= self.base:
+            return
+        for choice_id, delta in deltas.items():
+            self.pending[choice_id] = self.pending.get(choice_id, 0) + delta
+        self.version = max(self.version or version, version)
+        self.event.set()
+
+    async def next(self, timeout):
+        """
+        Wait for the next message, no sooner than the rate allows.
+
+        :return: tuple of (latest results version, dict of choice id to
+        vote change), None after timeout
+        """
+        wait = self.last_sent + self.interval - self.loop.time()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        self.event.clear()
+        deltas, self.pending = self.pending, {}
+        self.last_sent = self.loop.time()
+        return self.version, {choice_id: delta for choice_id, delta
+                              in deltas.items() if delta}
+
+
+class Broker:
+    """Fan out deltas delivered by the backend to local subscriptions."""
+
+    def __init__(self, backend):
+        """Create broker using the given backend."""
+        self.backend = backend
+        self.subscriptions = defaultdict(set)
+        self.lock = threading.Lock()
+
+    def subscribe(self, question_id):
+        """Subscribe the running event loop to results of the question."""
+        self.backend.start(self)
+        subscription = Subscription(question_id,
+                                    settings.POLLS_RESULTS_STREAM_RATE)
+        with self.lock:
+            self.subscriptions[question_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Stop delivering to the subscription."""
+        with self.lock:
+            subscribers = self.subscriptions[subscription.question_id]
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self.subscriptions[subscription.question_id]
+
+    def deliver(self, question_id, deltas, version):
+        """Push deltas to every local subscription of the question."""
+        with self.lock:
+            subscribers = list(self.subscriptions.get(question_id, ()))
+        for subscription in subscribers:
+            subscription.push(deltas, version)
+
+    def publish(self, question_id, deltas, version):
+        """
+        Publish deltas to subscribers of every worker.
+
+        :param version: results version of the question after the deltas
+        """
+        self.backend.publish(self, question_id, deltas, version)
+
+
+class LocalBackend:
+    """Deliver deltas inside this process only, for single worker setups."""
+
+    def start(self, broker):
+        """Nothing to start."""
+
+    def publish(self, broker, question_id, deltas, version):
+        """Deliver deltas to local subscribers."""
+        broker.deliver(question_id, deltas, version)
+
+
+class PostgresBackend:
+    """
+    Deliver deltas to every worker with PostgreSQL LISTEN/NOTIFY.
+
+    Each worker process listens on a dedicated connection in a background
+    thread, started with the first subscription.
+    """
+
+    channel = "polls_results"
+
+    def __init__(self):
+        """Create backend, the listener is started lazily."""
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def start(self, broker):
+        """Start listener thread if not running."""
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.listen,
+                                               args=(broker,), daemon=True)
+                self.thread.start()
+
+    def publish(self, broker, question_id, deltas, version):
+        """Send deltas as a notification on the channel."""
+        payload = json.dumps({"question": question_id, "deltas": deltas,
+                              "version": version})
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [self.channel,
+                                                        payload])
+
+    def listen(self, broker):
+        """Deliver notifications to the broker, reconnecting on errors."""
+        while True:
+            wrapper = connections.create_connection(DEFAULT_DB_ALIAS)
+            try:
+                wrapper.ensure_connection()
+                conn = wrapper.connection
+                conn.autocommit = True
+                conn.execute(f"LISTEN {self.channel}")
+                for notify in conn.notifies():
+                    message = json.loads(notify.payload)
+                    deltas = {int(choice_id): delta for choice_id, delta
+                              in message["deltas"].items()}
+                    broker.deliver(message["question"], deltas,
+                                   message["version"])
+            except Exception:
+                logger.exception("Results listener failed, reconnecting")
+                time.sleep(1)
+            finally:
+                wrapper.close()
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """Return the broker of this process, using POLLS_BROKER_BACKEND."""
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            backend = import_string(settings.POLLS_BROKER_BACKEND)()
+            _broker = Broker(backend)
+        return _broker
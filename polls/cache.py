@@ -0,0 +1,113 @@
+"""Module contains the results cache of Poll app."""
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from polls.models import Question, Choice
+from polls.routers import pinned_to_primary
+from polls.snapshots import aclosed_choices, closed_choices, is_final
+from polls.tallies import bump_version, remove_user_votes
+
+RESULTS_KEY = "polls:results:{}"
+
+
+def results_key(question_id):
+    """Return cache key of the results of the question."""
+    return RESULTS_KEY.format(question_id)
+
+
+def get_results(question_id):
+    """
+    Get question and its choices with tallies, from cache if possible.
+
+    Cached results are shared by every user, personalised part of the page
+    (such as user's choice) must be added by the caller. Choices of closed
+    polls come from their results snapshot when it is current, without
+    writing one. Requests pinned to the primary
+    read results from it and refill the cache, which may hold results read
+    from a lagging replica.
+
+    :return: tuple of (question, list of choices) or None if the question
+    does not exist
+    """
+    key = results_key(question_id)
+    results = None if pinned_to_primary() else cache.get(key)
+    if results is None:
+        question = Question.objects.select_related('snapshot')\
+            .filter(pk=question_id).first()
+        if question is None:
+            return None
+        if is_final(question):
+            choices = closed_choices(question)
+        else:
+            choices = list(question.choice_set.all())
+        results = (question, choices)
+        cache.set(key, results, results_timeout(question))
+    return results
+
+
+async def aget_results(question_id):
+    """Async version of get_results using the async ORM on cache miss."""
+    key = results_key(question_id)
+    results = None if pinned_to_primary() else await cache.aget(key)
+    if results is None:
+        question = await Question.objects.select_related('snapshot')\
+            .filter(pk=question_id).afirst()
+        if question is None:
+            return None
+        if is_final(question):
+            choices = await aclosed_choices(question)
+        else:
+            choices = [choice async for choice in question.choice_set.all()]
+        results = (question, choices)
+        await cache.aset(key, results, results_timeout(question))
+    return results
+
+
+def results_timeout(question):
+    """Return seconds to keep results of the question in cache."""
+    if question.can_vote() or not question.is_published():
+        return settings.POLLS_RESULTS_CACHE_TIMEOUT
+    # Closed poll results never change unless edited by admin
+    return settings.POLLS_CLOSED_RESULTS_CACHE_TIMEOUT
+
+
+def invalidate_results(question_id):
+    """Remove cached results of the question."""
+    cache.delete(results_key(question_id))
+
+
+def invalidate_many_results(question_ids):
+    """Remove cached results of the questions."""
+    cache.delete_many([results_key(question_id)
+                       for question_id in question_ids])
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def question_changed(sender, instance, raw=False, **kwargs):
+    """Invalidate results when the question is edited or deleted."""
+    if not raw and kwargs.get('created') is False:
+        bump_version(instance.id)
+    invalidate_results(instance.id)
+
+
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+def choice_changed(sender, instance, raw=False, **kwargs):
+    """Invalidate results when a choice is edited or deleted."""
+    if not raw:
+        bump_version(instance.question_id)
+    invalidate_results(instance.question_id)
+
+
+@receiver(pre_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    """Take votes of a deleted user out of tallies before they cascade."""
+    changed = remove_user_votes(instance.pk)
+    if changed:
+        transaction.on_commit(lambda: invalidate_many_results(changed))
@@ -0,0 +1,100 @@
+"""
+Module contains the logging handlers and formatters of Poll app.
+
+Requests only put log records on a queue, a background listener thread
+formats them and writes the log file, so disk I/O never happens inside
+the vote and login requests.
+"""
+
+import atexit
+import copy
+import datetime
+import json
+import logging
+import logging.handlers
+import queue
+
+
+class QueuedFileHandler(logging.handlers.QueueHandler):
+    """
+    Queue records for a rotating log file written by a listener thread.
+
+    The file rotates when it reaches max_bytes, or at the interval given by
+    when (see TimedRotatingFileHandler) if set. The formatter configured
+    on this handler is used by the file handler in the listener thread.
+    """
+
+    def __init__(self, filename, max_bytes=0, backup_count=0, when=None,
+                 queue_size=10000):
+        """Create the file handler and start the listener thread."""
+        super().__init__(queue.Queue(queue_size))
+        if when:
+            self.target = logging.handlers.TimedRotatingFileHandler(
+                filename, when=when, backupCount=backup_count,
+                encoding="utf-8")
+        else:
+            self.target = logging.handlers.RotatingFileHandler(
+                filename, maxBytes=max_bytes, backupCount=backup_count,
+                encoding="utf-8")
+        self.listener = logging.handlers.QueueListener(self.queue,
+                                                       self.target)
+        self.listener.start()
+        # Write records still queued when the process exits
+        atexit.register(self.stop)
+
+    def setFormatter(self, fmt):
+        """Format records with fmt in the listener thread."""
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        """
+        Merge message arguments before the record leaves the thread.
+
+        Arguments may change after the call, formatting of the record is
+        left to the listener thread.
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(
+                record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        """Queue the record, drop it rather than block if queue is full."""
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+    def stop(self):
+        """Stop the listener after writing queued records."""
+        if self.listener._thread is not None:
+            self.listener.stop()
+
+    def close(self):
+        """Stop the listener and close the log file."""
+        self.stop()
+        self.target.close()
+        super().close()
+
+
+class JSONFormatter(logging.Formatter):
+    """Format records as one JSON object per line."""
+
+    def format(self, record):
+        """Return the record as a JSON line."""
+        data = {
+            "time": datetime.datetime.fromtimestamp(
+                record.created, datetime.timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exception"] = record.exc_text
+        return json.dumps(data)
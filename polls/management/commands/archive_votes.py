@@ -0,0 +1,32 @@
+"""Management command to archive votes of polls closed long ago."""
+
+from django.core.management.base import BaseCommand
+
+from polls import archive
+from polls.models import Question
+
+
+class Command(BaseCommand):
+    """Move votes of polls closed long ago to the archive table."""
+
+    help = "Move votes of polls closed for more than " \
+           "POLLS_ARCHIVE_AFTER_DAYS days to the archive, in batches."
+
+    def add_arguments(self, parser):
+        """Add command line arguments."""
+        parser.add_argument('--question', type=int, action='append',
+                            help="Only archive this question id "
+                                 "(can be repeated).")
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help="Number of votes moved per transaction.")
+
+    def handle(self, *args, **options):
+        """Archive votes and report how many were moved."""
+        questions = None
+        if options['question']:
+            questions = Question.objects.filter(pk__in=options['question'])
+        archived = archive.archive_votes(
+            questions, options['batch_size'],
+            progress=lambda message: self.stdout.write(message))
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {archived} vote(s)."))
@@ -0,0 +1,36 @@
+"""Management command to fill Vote.question of existing votes."""
+
+from django.core.management.base import BaseCommand
+
+from polls.backfill import backfill_vote_question
+from polls.models import Choice, Vote
+
+
+class Command(BaseCommand):
+    """Backfill the question key of votes in small resumable batches."""
+
+    help = "Fill Vote.question from the vote's choice, in batches. " \
+           "Safe to stop and run again; use --start-id to skip done rows."
+
+    def add_arguments(self, parser):
+        """Add command line arguments."""
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help="Number of votes updated per batch.")
+        parser.add_argument('--start-id', type=int, default=0,
+                            help="Resume after this vote id (printed as "
+                                 "progress by a previous run).")
+        parser.add_argument('--pause', type=float, default=0,
+                            help="Seconds to sleep between batches.")
+
+    def handle(self, *args, **options):
+        """Run the backfill and print progress of each batch."""
+        def progress(last_id, total):
+            self.stdout.write(f"Backfilled {total} vote(s), last id {last_id}")
+
+        total = backfill_vote_question(Vote, Choice,
+                                       batch_size=options['batch_size'],
+                                       start_id=options['start_id'],
+                                       pause=options['pause'],
+                                       progress=progress)
+        self.stdout.write(self.style.SUCCESS(
+            f"Backfill complete, {total} vote(s) updated."))
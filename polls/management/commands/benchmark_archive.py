@@ -0,0 +1,122 @@
+"""Management command to measure votes before and after archiving."""
+
+import json
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from polls import archive, benchmark, synthetic
+from polls.models import Choice, Vote, ArchivedVote
+
+
+class Command(BaseCommand):
+    """
+    Compare the vote path and the Vote table before and after archiving.
+
+    A throwaway test database is filled with synthetic polls, most of them
+    closed, then votes on open polls are sent from concurrent logged-in
+    clients. Votes of polls closed for more than --days are archived, the
+    Vote table is compacted (as after pg_repack or VACUUM FULL, plain
+    VACUUM only lets new rows reuse the space) and votes are sent again.
+    Sizes are only reported on PostgreSQL.
+    """
+
+    help = "Measure vote latency and size of the Vote table and its " \
+           "indexes before and after archiving votes of closed polls, " \
+           "output JSON."
+
+    def add_arguments(self, parser):
+        """Add command line arguments."""
+        parser.add_argument('--questions', type=int, default=2000)
+        parser.add_argument('--choices', type=int, default=4,
+                            help="Choices per question.")
+        parser.add_argument('--users', type=int, default=5000)
+        parser.add_argument('--votes', type=int, default=1000000)
+        parser.add_argument('--closed', type=float, default=0.8,
+                            help="Fraction of closed polls.")
+        parser.add_argument('--days', type=int, default=30,
+                            help="Archive polls closed for more days.")
+        parser.add_argument('--requests', type=int, default=1000,
+                            help="Votes sent per measure.")
+        parser.add_argument('--concurrency', type=int, default=10,
+                            help="Concurrent voters.")
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help="Number of votes archived per transaction.")
+
+    def handle(self, *args, **options):
+        """Generate polls, measure, archive, measure again and report."""
+        with benchmark.test_database(), \
+                override_settings(POLLS_ARCHIVE_AFTER_DAYS=options['days']):
+            synthetic.generate(
+                questions=options['questions'], choices=options['choices'],
+                users=options['users'], votes=options['votes'],
+                closed=options['closed'], future=0,
+                progress=lambda message: self.stderr.write(message))
+            requests = self.vote_requests(options['requests'])
+            # Other voters after archiving, so their votes are not repeated
+            users = list(User.objects.order_by('id')
+                         [:options['concurrency'] * 2])
+            report = {'before': self.measure(
+                requests, users[:options['concurrency']])}
+            start = time.perf_counter()
+            archived = archive.archive_votes(
+                batch_size=options['batch_size'])
+            report['archive'] = {
+                'votes': archived,
+                'seconds': round(time.perf_counter() - start, 3),
+            }
+            self.compact()
+            report['after'] = self.measure(
+                requests, users[options['concurrency']:])
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def vote_requests(self, count):
+        """Return vote requests spread over the choices of open polls."""
+        choices = Choice.objects.filter(
+            Q(question__end_date__isnull=True)
+            | Q(question__end_date__gt=timezone.now()))\
+            .order_by('id').values_list('id', 'question_id')
+        requests = [('post', reverse('polls:vote', args=(question_id,)),
+                     {"choice": choice_id})
+                    for choice_id, question_id in choices]
+        # Stride through the choices so votes are spread over the polls
+        return [requests[n * 7919 % len(requests)] for n in range(count)]
+
+    def measure(self, requests, users):
+        """Return vote latency and sizes of the vote tables."""
+        start = time.perf_counter()
+        results = benchmark.run_clients(requests, users)
+        elapsed = time.perf_counter() - start
+        report = {
+            'vote': benchmark.summarize([latency for latency, _ in results],
+                                        elapsed,
+                                        [queries for _, queries in results
+                                         if queries is not None]),
+            'votes': Vote.objects.count(),
+            'archived_votes': ArchivedVote.objects.count(),
+        }
+        if connection.vendor == 'postgresql':
+            report['sizes'] = {model._meta.db_table: self.sizes(model)
+                               for model in (Vote, ArchivedVote)}
+        return report
+
+    def sizes(self, model):
+        """Return table and index sizes of the model in bytes."""
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_relation_size(%s::regclass), "
+                           "pg_indexes_size(%s::regclass)",
+                           [model._meta.db_table] * 2)
+            table, indexes = cursor.fetchone()
+        return {'table_bytes': table, 'index_bytes': indexes}
+
+    def compact(self):
+        """Give back the space of archived rows, on PostgreSQL."""
+        if connection.vendor != 'postgresql':
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(f"VACUUM FULL ANALYZE {Vote._meta.db_table}")
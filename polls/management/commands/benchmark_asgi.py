@@ -0,0 +1,105 @@
+"""Management command to compare WSGI and ASGI throughput of polls views."""
+
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import AsyncClient, Client, override_settings
+from django.urls import clear_url_caches, reverse
+
+from polls import benchmark
+
+
+class Command(BaseCommand):
+    """
+    Drive the read views through the WSGI and the ASGI handler.
+
+    WSGI clients run one thread each with the sync views, as a threaded
+    WSGI worker would. ASGI clients all run on a single event loop with the
+    async views, as one ASGI worker would. Both use the same dataset in a
+    throwaway test database.
+    """
+
+    help = "Compare WSGI and ASGI throughput of polls read views " \
+           "on a seeded test database, output JSON."
+
+    def add_arguments(self, parser):
+        """Add command line arguments."""
+        parser.add_argument('--questions', type=int, default=50)
+        parser.add_argument('--votes', type=int, default=2000)
+        parser.add_argument('--requests', type=int, default=1000,
+                            help="Requests per mode.")
+        parser.add_argument('--concurrency', type=int, default=50,
+                            help="Concurrent clients.")
+
+    def handle(self, *args, **options):
+        """Seed the database, run both modes and print the summary."""
+        with benchmark.test_database():
+            questions = benchmark.seed(questions=options['questions'],
+                                       votes=options['votes'])
+            report = {
+                'wsgi': self.run_mode('mysite.urls', self.run_wsgi,
+                                      questions, options),
+                'asgi': self.run_mode('mysite.async_urls', self.run_asgi,
+                                      questions, options),
+            }
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def run_mode(self, urlconf, runner, questions, options):
+        """Run one mode with the given root urlconf."""
+        with override_settings(ROOT_URLCONF=urlconf):
+            clear_url_caches()
+            urls = [reverse('polls:index')]
+            for question in questions:
+                urls += [reverse('polls:detail', args=(question.id,)),
+                         reverse('polls:results', args=(question.id,)),
+                         reverse('polls:results_json', args=(question.id,))]
+            paths = [urls[n % len(urls)] for n in range(options['requests'])]
+            start = time.perf_counter()
+            latencies = runner(paths, options['concurrency'])
+            elapsed = time.perf_counter() - start
+        clear_url_caches()
+        return benchmark.summarize(latencies, elapsed)
+
+    def run_wsgi(self, paths, concurrency):
+        """Request paths from a pool of threads with the WSGI client."""
+        def worker(chunk):
+            client = Client()
+            latencies = []
+            try:
+                for path in chunk:
+                    start = time.perf_counter()
+                    client.get(path)
+                    latencies.append(time.perf_counter() - start)
+            finally:
+                connection.close()
+            return latencies
+
+        chunks = [paths[n::concurrency] for n in range(concurrency)]
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            return [latency for latencies in pool.map(worker, chunks)
+                    for latency in latencies]
+
+    def run_asgi(self, paths, concurrency):
+        """Request paths from coroutines on one loop with the ASGI client."""
+        async def worker(chunk):
+            client = AsyncClient()
+            latencies = []
+            for path in chunk:
+                start = time.perf_counter()
+                await client.get(path)
+                latencies.append(time.perf_counter() - start)
+            return latencies
+
+        async def main():
+            chunks = [paths[n::concurrency] for n in range(concurrency)]
+            results = await asyncio.gather(*map(worker, chunks))
+            # Close connection of the thread running async ORM queries
+            await sync_to_async(connections.close_all)()
+            return [latency for latencies in results
+                    for latency in latencies]
+
+        return asyncio.run(main())
@@ -0,0 +1,120 @@
+"""Management command to measure vote latency with each logging handler."""
+
+import json
+import logging
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from polls import benchmark, tallies
+from polls.log import QueuedFileHandler
+from polls.models import Choice, Vote
+
+FORMAT = "[%(asctime)s] %(levelname)s: %(message)s"
+
+
+class Command(BaseCommand):
+    """
+    Vote concurrently with the log file written in or out of the request.
+
+    The file mode writes records in the request thread, as the plain
+    FileHandler used to. The queued mode hands them to the listener thread
+    of QueuedFileHandler. Both send the same new votes in a throwaway test
+    database, modes alternate over rounds so neither runs on a warmer
+    database.
+    """
+
+    help = "Compare vote latency with synchronous and queued logging " \
+           "on a seeded test database, output JSON."
+
+    def add_arguments(self, parser):
+        """Add command line arguments."""
+        parser.add_argument('--questions', type=int, default=20)
+        parser.add_argument('--requests', type=int, default=1000,
+                            help="Votes per mode.")
+        parser.add_argument('--concurrency', type=int, default=8,
+                            help="Concurrent voters.")
+        parser.add_argument('--rounds', type=int, default=3)
+
+    def handle(self, *args, **options):
+        """Seed the database, vote with both handlers, print the summary."""
+        with benchmark.test_database(), \
+                tempfile.TemporaryDirectory() as directory:
+            questions = benchmark.seed(questions=options['questions'],
+                                       users=options['concurrency'],
+                                       votes=0, closed=0)
+            choices = {}
+            for choice_id, question_id in Choice.objects.values_list(
+                    'id', 'question_id'):
+                choices.setdefault(question_id, []).append(choice_id)
+            votes = [(reverse('polls:vote', args=(question.id,)),
+                      choices[question.id][n % len(choices[question.id])])
+                     for n, question in enumerate(
+                         questions[n % len(questions)]
+                         for n in range(options['requests']))]
+            users = list(User.objects.filter(username__startswith="bench"))
+            modes = {
+                'file': lambda n: logging.FileHandler(
+                    Path(directory) / f"file{n}.log"),
+                'queued': lambda n: QueuedFileHandler(
+                    str(Path(directory) / f"queued{n}.log")),
+            }
+            latencies = {mode: [] for mode in modes}
+            elapsed = dict.fromkeys(modes, 0)
+            for n in range(options['rounds']):
+                for mode, handler in modes.items():
+                    start = time.perf_counter()
+                    latencies[mode] += self.run_mode(handler(n), votes, users)
+                    elapsed[mode] += time.perf_counter() - start
+            report = {mode: benchmark.summarize(latencies[mode],
+                                                elapsed[mode])
+                      for mode in modes}
+        report['p50_saved_ms'] = round(report['file']['p50_ms']
+                                       - report['queued']['p50_ms'], 3)
+        report['p99_saved_ms'] = round(report['file']['p99_ms']
+                                       - report['queued']['p99_ms'], 3)
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def run_mode(self, handler, votes, users):
+        """Send every vote as new with handler as the polls log handler."""
+        Vote.objects.all().delete()
+        tallies.rebuild()
+        handler.setFormatter(logging.Formatter(FORMAT))
+        logger = logging.getLogger("polls")
+        old_handlers = logger.handlers
+        logger.handlers = [handler]
+        try:
+            return self.run_votes(votes, users)
+        finally:
+            logger.handlers = old_handlers
+            handler.close()
+
+    def run_votes(self, votes, users):
+        """Send votes from one thread per user, all logged in first."""
+        ready = threading.Barrier(len(users))
+
+        def worker(n):
+            client = Client()
+            latencies = []
+            try:
+                client.force_login(users[n])
+                ready.wait()
+                for url, choice_id in votes[n::len(users)]:
+                    start = time.perf_counter()
+                    client.post(url, {"choice": choice_id})
+                    latencies.append(time.perf_counter() - start)
+            finally:
+                connection.close()
+            return latencies
+
+        with ThreadPoolExecutor(max_workers=len(users)) as pool:
+            return [latency for latencies in pool.map(worker,
+                                                      range(len(users)))
+                    for latency in latencies]
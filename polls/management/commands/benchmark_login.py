@@ -0,0 +1,132 @@
+"""Management command to measure logins and page latency during a burst."""
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from polls import benchmark
+
+PASSWORD = "Benchmark!"
+
+
+class Command(BaseCommand):
+    """
+    Log in concurrently while other clients browse poll pages.
+
+    The direct mode checks passwords in the request threads with the
+    ModelBackend, the pooled mode in the bounded pool of
+    PooledModelBackend. Logins refused by a full pool are counted apart.
+    Modes alternate over rounds in a throwaway test database.
+    """
+
+    help = "Compare login throughput and page latency during a login " \
+           "burst with direct and pooled password checks, output JSON."
+
+    def add_arguments(self, parser):
+        """Add command line arguments."""
+        parser.add_argument('--requests', type=int, default=200,
+                            help="Logins per mode.")
+        parser.add_argument('--concurrency', type=int, default=16,
+                            help="Concurrent logins.")
+        parser.add_argument('--readers', type=int, default=2,
+                            help="Clients browsing poll pages meanwhile.")
+        parser.add_argument('--rounds', type=int, default=3)
+
+    def handle(self, *args, **options):
+        """Seed the database, log in with both modes, print the summary."""
+        with benchmark.test_database():
+            questions = benchmark.seed(questions=20, users=0, votes=0,
+                                       closed=0)
+            password = make_password(PASSWORD)
+            User.objects.bulk_create([
+                User(username=f"login{n}", password=password)
+                for n in range(options['concurrency'])])
+            pages = [reverse('polls:detail', args=(question.id,))
+                     for question in questions]
+            modes = {
+                'direct': 'django.contrib.auth.backends.ModelBackend',
+                'pooled': 'mysite.auth.PooledModelBackend',
+            }
+            runs = {mode: {'logins': [], 'refused': 0, 'pages': [],
+                           'elapsed': 0} for mode in modes}
+            for _ in range(options['rounds']):
+                for mode, backend in modes.items():
+                    with override_settings(AUTHENTICATION_BACKENDS=[backend]):
+                        self.run_mode(runs[mode], pages, options)
+            report = {}
+            for mode, run in runs.items():
+                report[mode] = {
+                    'login': benchmark.summarize(run['logins'],
+                                                 run['elapsed']),
+                    'refused': run['refused'],
+                    'pages': benchmark.summarize(run['pages'],
+                                                 run['elapsed']),
+                }
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def run_mode(self, run, pages, options):
+        """Log in from concurrent clients while readers fetch pages."""
+        burst = threading.Event()
+        done = threading.Event()
+        login_url = reverse('login')
+
+        def login(n):
+            client = Client()
+            latencies = []
+            refused = 0
+            try:
+                burst.wait()
+                for _ in range(n, options['requests'],
+                               options['concurrency']):
+                    start = time.perf_counter()
+                    response = client.post(login_url, {
+                        'username': f"login{n}", 'password': PASSWORD})
+                    # A refused login shows the form again, with 503 when busy
+                    if response.status_code == 302:
+                        latencies.append(time.perf_counter() - start)
+                    else:
+                        refused += 1
+                    client.logout()
+                    close_old_connections()
+            finally:
+                connection.close()
+            return latencies, refused
+
+        def read(n):
+            client = Client()
+            latencies = []
+            try:
+                burst.wait()
+                while not done.is_set():
+                    start = time.perf_counter()
+                    client.get(pages[n % len(pages)])
+                    latencies.append(time.perf_counter() - start)
+                    close_old_connections()
+                    n += 1
+            finally:
+                connection.close()
+            return latencies
+
+        with ThreadPoolExecutor(options['concurrency']
+                                + options['readers']) as pool:
+            logins = [pool.submit(login, n)
+                      for n in range(options['concurrency'])]
+            readers = [pool.submit(read, n)
+                       for n in range(options['readers'])]
+            start = time.perf_counter()
+            burst.set()
+            for future in logins:
+                latencies, refused = future.result()
+                run['logins'] += latencies
+                run['refused'] += refused
+            run['elapsed'] += time.perf_counter() - start
+            done.set()
+            for future in readers:
+                run['pages'] += future.result()
@@ -0,0 +1,103 @@
+"""Management command to load test the request paths of polls app."""
+
+import json
+import time
+from pathlib import Path
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from polls import benchmark
+from polls.models import Choice
+
+ROUTES = ('index', 'detail', 'results', 'vote')
+
+
+class Command(BaseCommand):
+    """
+    Drive index, detail, results and vote with concurrent clients.
+
+    Each route is loaded on its own by one thread per client on a seeded
+    throwaway test database. Database connections are closed or returned
+    to the pool after each request according to the DATABASES settings.
+    Reads are anonymous, every vote client is logged in as its own user.
+    The JSON report can be saved as a baseline, a later run compared
+    against it fails on regressions.
+    """
+
+    help = "Load test polls routes on a seeded test database, output JSON " \
+           "and optionally compare it against a baseline."
+
+    def add_arguments(self, parser):
+        """Add command line arguments."""
+        parser.add_argument('--questions', type=int, default=50)
+        parser.add_argument('--choices', type=int, default=4,
+                            help="Choices per question.")
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--votes', type=int, default=2000)
+        parser.add_argument('--requests', type=int, default=500,
+                            help="Requests per route.")
+        parser.add_argument('--concurrency', type=int, default=10,
+                            help="Concurrent clients.")
+        parser.add_argument('--route', choices=ROUTES, action='append',
+                            help="Only load this route (can be repeated).")
+        parser.add_argument('-o', '--output',
+                            help="Also write the report to this file, for "
+                                 "example to save a baseline.")
+        parser.add_argument('--baseline',
+                            help="Fail when results regress from this "
+                                 "report.")
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help="Fraction throughput and latency may get "
+                                 "worse than the baseline (default 0.2).")
+
+    def handle(self, *args, **options):
+        """Seed the database, load every route and report."""
+        with benchmark.test_database():
+            questions = benchmark.seed(questions=options['questions'],
+                                       choices=options['choices'],
+                                       users=options['users'],
+                                       votes=options['votes'])
+            report = {route: self.run_route(route, questions, options)
+                      for route in options['route'] or ROUTES}
+        output = json.dumps(report, indent=2)
+        self.stdout.write(output)
+        if options['output']:
+            Path(options['output']).write_text(output + "\n")
+        if options['baseline']:
+            baseline = json.loads(Path(options['baseline']).read_text())
+            regressions = benchmark.compare(report, baseline,
+                                            options['tolerance'])
+            if regressions:
+                raise CommandError("Performance regressed:\n"
+                                   + "\n".join(regressions))
+
+    def run_route(self, route, questions, options):
+        """Send the requests of a route from concurrent clients."""
+        open_questions = [question for question in questions
+                          if question.can_vote()]
+        if route == 'index':
+            requests = [('get', reverse('polls:index'), None)]
+        elif route == 'detail':
+            requests = [('get', reverse('polls:detail', args=(question.id,)),
+                         None) for question in open_questions]
+        elif route == 'results':
+            requests = [('get', reverse('polls:results', args=(question.id,)),
+                         None) for question in questions]
+        else:
+            choices = Choice.objects.filter(question__in=open_questions)\
+                .values_list('id', 'question_id')
+            requests = [('post', reverse('polls:vote', args=(question_id,)),
+                         {"choice": choice_id})
+                        for choice_id, question_id in choices]
+        requests = [requests[n % len(requests)]
+                    for n in range(options['requests'])]
+        users = User.objects.order_by('id')[:options['concurrency']] \
+            if route == 'vote' else [None] * options['concurrency']
+        start = time.perf_counter()
+        results = benchmark.run_clients(requests, list(users))
+        elapsed = time.perf_counter() - start
+        return benchmark.summarize([latency for latency, _ in results],
+                                   elapsed,
+                                   [queries for _, queries in results
+                                    if queries is not None])
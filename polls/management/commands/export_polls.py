@@ -0,0 +1,47 @@
+"""Management command to export poll results or votes."""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from polls.export import ExportError, export_rows, parse_moment, stream
+
+
+class Command(BaseCommand):
+    """Stream poll results or votes to a file or stdout."""
+
+    help = "Export poll results or votes as CSV or NDJSON with constant " \
+           "memory, whatever the number of votes."
+
+    def add_arguments(self, parser):
+        """Add command line arguments."""
+        parser.add_argument('kind', choices=['results', 'votes'],
+                            help="Per-choice results or raw votes.")
+        parser.add_argument('--format', default='csv',
+                            choices=['csv', 'ndjson'])
+        parser.add_argument('--question', action='append',
+                            help="Only export this question id "
+                                 "(can be repeated).")
+        parser.add_argument('--since',
+                            help="Only polls published at or after this "
+                                 "date or datetime.")
+        parser.add_argument('--until',
+                            help="Only polls published before this date "
+                                 "or datetime.")
+        parser.add_argument('--output', '-o',
+                            help="File to write, default is stdout.")
+
+    def handle(self, *args, **options):
+        """Write the export line by line."""
+        kind = options['kind']
+        try:
+            rows = export_rows(kind, questions=options['question'],
+                               since=parse_moment(options['since']),
+                               until=parse_moment(options['until']))
+            lines = stream(kind, options['format'], rows)
+        except ExportError as error:
+            raise CommandError(error)
+        if options['output']:
+            with open(options['output'], 'w', newline='') as file:
+                file.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
@@ -0,0 +1,18 @@
+"""Management command to flush votes of the buffered voting journal."""
+
+from django.core.management.base import BaseCommand
+
+from polls.votebuffer import get_buffer
+
+
+class Command(BaseCommand):
+    """Record every journaled vote, for example before a deployment."""
+
+    help = "Write votes waiting in the buffered voting journal to the " \
+           "database."
+
+    def handle(self, *args, **options):
+        """Flush the journal and report how many votes were written."""
+        flushed = get_buffer().flush()
+        self.stdout.write(self.style.SUCCESS(
+            f"Flushed {flushed} buffered vote(s)."))
@@ -0,0 +1,66 @@
+"""Management command to generate a large synthetic dataset."""
+
+import random
+import time
+from django.core.management.base import BaseCommand, CommandError
+
+from polls import synthetic
+
+
+class Command(BaseCommand):
+    """Fill the database with synthetic questions, users and votes."""
+
+    help = "Generate questions, choices, users and votes with Zipf-like " \
+           "choice popularity, for testing at production scale."
+
+    def add_arguments(self, parser):
+        """Add command line arguments."""
+        parser.add_argument('--questions', type=int, default=1000)
+        parser.add_argument('--choices', type=int, default=4,
+                            help="Choices per question.")
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--votes', type=int, default=1000000)
+        parser.add_argument('--closed', type=float, default=0.3,
+                            help="Fraction of closed questions.")
+        parser.add_argument('--future', type=float, default=0.05,
+                            help="Fraction of questions not published yet.")
+        parser.add_argument('--days', type=int, default=365,
+                            help="Questions are published over this many "
+                                 "past days.")
+        parser.add_argument('--zipf', type=float, default=1.0,
+                            help="Zipf exponent of choice popularity, "
+                                 "0 for uniform.")
+        parser.add_argument('--password', default="synthetic",
+                            help="Password of every generated user.")
+        parser.add_argument('--prefix', default="synthetic",
+                            help="Username prefix of generated users.")
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--method', choices=['auto', 'copy', 'bulk'],
+                            default='auto',
+                            help="Insert with PostgreSQL COPY or bulk "
+                                 "INSERT, auto use COPY when available.")
+        parser.add_argument('--seed', type=int,
+                            help="Random seed, for a reproducible dataset.")
+
+    def handle(self, *args, **options):
+        """Generate the dataset and report what was created."""
+        start = time.perf_counter()
+        try:
+            created = synthetic.generate(
+                questions=options['questions'], choices=options['choices'],
+                users=options['users'], votes=options['votes'],
+                closed=options['closed'], future=options['future'],
+                days=options['days'], exponent=options['zipf'],
+                password=options['password'], prefix=options['prefix'],
+                batch_size=options['batch_size'],
+                use_copy={'auto': None, 'copy': True,
+                          'bulk': False}[options['method']],
+                rng=random.Random(options['seed']),
+                progress=lambda message: self.stdout.write(message))
+        except ValueError as error:
+            raise CommandError(error)
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {created['questions']} questions, "
+            f"{created['choices']} choices, {created['users']} users and "
+            f"{created['votes']} votes in "
+            f"{time.perf_counter() - start:.1f}s."))
@@ -0,0 +1,29 @@
+"""Management command to rebuild choice vote tallies from Vote rows."""
+
+from django.core.management.base import BaseCommand
+
+from polls import tallies
+from polls.models import Choice
+
+
+class Command(BaseCommand):
+    """Recount votes of every choice and fix tallies that drifted."""
+
+    help = "Rebuild the persisted vote tally of choices from raw Vote rows."
+
+    def add_arguments(self, parser):
+        """Add command line arguments."""
+        parser.add_argument('--question', type=int, action='append',
+                            help="Only reconcile choices of this question "
+                                 "id (can be repeated).")
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Number of choices per UPDATE statement.")
+
+    def handle(self, *args, **options):
+        """Reconcile tallies and report how many choices were corrected."""
+        choices = Choice.objects.all()
+        if options['question']:
+            choices = choices.filter(question__in=options['question'])
+        fixed = tallies.rebuild(choices, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Reconciled tallies, {fixed} choice(s) corrected."))
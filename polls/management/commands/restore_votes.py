@@ -0,0 +1,37 @@
+"""Management command to restore archived votes."""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from polls import archive
+from polls.models import Question
+
+
+class Command(BaseCommand):
+    """Move archived votes back to the Vote table."""
+
+    help = "Move archived votes of polls back to the Vote table, in " \
+           "batches, and rebuild their tallies."
+
+    def add_arguments(self, parser):
+        """Add command line arguments."""
+        parser.add_argument('--question', type=int, action='append',
+                            help="Restore votes of this question id "
+                                 "(can be repeated).")
+        parser.add_argument('--all', action='store_true',
+                            help="Restore all archived votes.")
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help="Number of votes moved per transaction.")
+
+    def handle(self, *args, **options):
+        """Restore votes and report how many were moved."""
+        if options['all']:
+            questions = None
+        elif options['question']:
+            questions = Question.objects.filter(pk__in=options['question'])
+        else:
+            raise CommandError("Give --question or --all.")
+        restored = archive.restore_votes(
+            questions, options['batch_size'],
+            progress=lambda message: self.stdout.write(message))
+        self.stdout.write(self.style.SUCCESS(
+            f"Restored {restored} vote(s)."))
@@ -0,0 +1,35 @@
+"""Management command to take results snapshots of closed polls."""
+
+from django.core.management.base import BaseCommand
+
+from polls import snapshots
+from polls.models import Question
+
+
+class Command(BaseCommand):
+    """Snapshot results of closed polls that have no current snapshot."""
+
+    help = "Take results snapshots of closed polls without one, or whose " \
+           "results changed since their snapshot."
+
+    def add_arguments(self, parser):
+        """Add command line arguments."""
+        parser.add_argument('--question', type=int, action='append',
+                            help="Only snapshot this question id "
+                                 "(can be repeated).")
+        parser.add_argument('--all', action='store_true',
+                            help="Take snapshots again even when current.")
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help="Number of polls per batch.")
+
+    def handle(self, *args, **options):
+        """Take missing snapshots and report how many were taken."""
+        if options['all']:
+            questions = Question.objects.all()
+        else:
+            questions = snapshots.missing_snapshots()
+        if options['question']:
+            questions = questions.filter(pk__in=options['question'])
+        taken = snapshots.take_snapshots(questions, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Took {taken} results snapshot(s)."))
@@ -0,0 +1,23 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    Add a nullable Vote.question without index, which is instant.
+
+    On a large live table, stop at this migration (migrate polls 0008),
+    run backfill_vote_question, then apply 0009.
+    """
+
+    dependencies = [
+        ('polls', '0007_choice_vote_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vote',
+            name='question',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='polls.question'),
+        ),
+    ]
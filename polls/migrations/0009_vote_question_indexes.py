@@ -0,0 +1,47 @@
+from django.db import migrations, models
+
+from polls.backfill import backfill_vote_question, dedupe_votes
+from polls.operations import AddIndexOnline, AddUniqueConstraintOnline
+
+
+def backfill(apps, schema_editor):
+    """Fill any vote left without question, no-op if already backfilled."""
+    backfill_vote_question(apps.get_model('polls', 'Vote'),
+                           apps.get_model('polls', 'Choice'))
+
+
+def dedupe(apps, schema_editor):
+    """Keep the latest vote of each user on a question before the index."""
+    dedupe_votes(apps.get_model('polls', 'Vote'),
+                 apps.get_model('polls', 'Choice'))
+
+
+class Migration(migrations.Migration):
+    """Backfill Vote.question and build indexes without locking tables."""
+
+    atomic = False
+
+    dependencies = [
+        ('polls', '0008_vote_question'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+        AddIndexOnline(
+            model_name='question',
+            index=models.Index(fields=['pub_date', 'id'], name='polls_question_pub_date_idx'),
+        ),
+        AddIndexOnline(
+            model_name='question',
+            index=models.Index(fields=['end_date'], name='polls_question_end_date_idx'),
+        ),
+        AddIndexOnline(
+            model_name='vote',
+            index=models.Index(fields=['question'], name='polls_vote_question_idx'),
+        ),
+        migrations.RunPython(dedupe, migrations.RunPython.noop),
+        AddUniqueConstraintOnline(
+            model_name='vote',
+            constraint=models.UniqueConstraint(fields=('user', 'question'), name='polls_vote_user_question_uniq'),
+        ),
+    ]
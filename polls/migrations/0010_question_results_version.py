@@ -0,0 +1,23 @@
+# Generated by Django 5.1.15 on 2026-10-18 19:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0009_vote_question_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='results_modified',
+            field=models.DateTimeField(blank=True, default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='results_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
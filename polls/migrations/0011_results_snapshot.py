@@ -0,0 +1,24 @@
+# Generated by Django 5.1.15 on 2026-10-18 20:42
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0010_question_results_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResultsSnapshot',
+            fields=[
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='snapshot', serialize=False, to='polls.question')),
+                ('results_version', models.PositiveIntegerField()),
+                ('choices', models.JSONField()),
+                ('taken', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
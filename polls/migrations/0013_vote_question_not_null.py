@@ -0,0 +1,30 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+from polls.backfill import backfill_vote_question
+from polls.operations import SetNotNullOnline
+
+
+def backfill(apps, schema_editor):
+    """Fill any vote left without question since the first backfill."""
+    backfill_vote_question(apps.get_model('polls', 'Vote'),
+                           apps.get_model('polls', 'Choice'))
+
+
+class Migration(migrations.Migration):
+    """Make Vote.question NOT NULL once every row is backfilled."""
+
+    atomic = False
+
+    dependencies = [
+        ('polls', '0012_archivedvote'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+        SetNotNullOnline(
+            model_name='vote',
+            name='question',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='polls.question'),
+        ),
+    ]
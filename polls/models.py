@@ -15,6 +15,20 @@ class Question(models.Model):
     end_date = models.DateTimeField('poll end date',
                                     blank=True, null=True,
                                     default=None)
+    # Incremented whenever results change, used for conditional requests
+    results_version = models.PositiveIntegerField(default=0)
+    results_modified = models.DateTimeField(null=True, blank=True,
+                                            default=None)
+
+    class Meta:
+        """Indexes serving the published and open question filters."""
+
+        indexes = [
+            models.Index(fields=['pub_date', 'id'],
+                         name='polls_question_pub_date_idx'),
+            models.Index(fields=['end_date'],
+                         name='polls_question_end_date_idx'),
+        ]
 
     def __str__(self):
         """Return question text as a string representative of Question."""
@@ -61,11 +75,13 @@ class Choice(models.Model):
 
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
     choice_text = models.CharField(max_length=200)
+    # Denormalized tally of Vote rows, kept in sync by polls.tallies
+    vote_count = models.PositiveIntegerField('votes', default=0)
 
     @property
     def votes(self):
         """Return the votes for this choice."""
-        return self.vote_set.count()
+        return self.vote_count
 
     def __str__(self):
         """Return choice_text as string representative."""
@@ -77,3 +93,63 @@ class Vote(models.Model):
 
     choice = models.ForeignKey(Choice, on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
+    # Question of the choice, denormalized for direct (user, question)
+    # lookups
+    question = models.ForeignKey(Question, on_delete=models.CASCADE,
+                                 db_index=False)
+
+    class Meta:
+        """A user has at most one vote per question."""
+
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'question'],
+                                    name='polls_vote_user_question_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['question'],
+                         name='polls_vote_question_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        """Keep question in sync with the choice before saving."""
+        self.question_id = self.choice.question_id
+        super().save(*args, **kwargs)
+
+
+class ArchivedVote(models.Model):
+    """
+    Vote of a poll closed long ago, moved out of the Vote table.
+
+    Keeps the id of the vote, so it is restored as it was. Choice tallies
+    still count archived votes.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    choice = models.ForeignKey(Choice, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    question = models.ForeignKey(Question, on_delete=models.CASCADE)
+    archived = models.DateTimeField(default=timezone.now)
+
+
+class ResultsSnapshot(models.Model):
+    """
+    Final results of a closed question.
+
+    Taken once the question is closed, so its results are served without
+    reading choices or votes. The snapshot is valid while its version is
+    the results version of the question, an admin editing the closed poll
+    makes it taken again.
+    """
+
+    question = models.OneToOneField(Question, on_delete=models.CASCADE,
+                                    primary_key=True,
+                                    related_name='snapshot')
+    results_version = models.PositiveIntegerField()
+    # List of [choice id, choice text, votes], in choice id order
+    choices = models.JSONField()
+    taken = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        """Return string representative of the snapshot."""
+        return f"Results of {self.question_id} " \
+               f"(version {self.results_version})"
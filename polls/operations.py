@@ -0,0 +1,126 @@
+"""
+Module contains migration operations that do not lock large tables.
+
+On PostgreSQL indexes are built with CREATE INDEX CONCURRENTLY, so reads and
+writes continue while the index is built. Other databases fall back to the
+normal operation. Migrations using these operations must set atomic = False.
+"""
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db.migrations.operations import (AddConstraint, AddIndex,
+                                             AlterField)
+
+
+def is_postgresql(schema_editor):
+    """Return True if the migration is applied to PostgreSQL database."""
+    return schema_editor.connection.vendor == 'postgresql'
+
+
+class AddIndexOnline(AddIndexConcurrently):
+    """Add index concurrently on PostgreSQL, normally elsewhere."""
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        """Create the index."""
+        if is_postgresql(schema_editor):
+            super().database_forwards(app_label, schema_editor,
+                                      from_state, to_state)
+        else:
+            AddIndex.database_forwards(self, app_label, schema_editor,
+                                       from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        """Drop the index."""
+        if is_postgresql(schema_editor):
+            super().database_backwards(app_label, schema_editor,
+                                       from_state, to_state)
+        else:
+            AddIndex.database_backwards(self, app_label, schema_editor,
+                                        from_state, to_state)
+
+
+class AddUniqueConstraintOnline(AddConstraint):
+    """
+    Add a UniqueConstraint backed by an index built concurrently.
+
+    On PostgreSQL the unique index is created concurrently first, then
+    attached to the table as a constraint, which only needs a brief lock.
+    An invalid index left by a failed earlier attempt is dropped first, as
+    IF NOT EXISTS would otherwise keep it.
+    """
+
+    atomic = False
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        """Create the unique index and constraint."""
+        if not is_postgresql(schema_editor):
+            return super().database_forwards(app_label, schema_editor,
+                                             from_state, to_state)
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias,
+                                        model):
+            return
+        quote = schema_editor.quote_name
+        table = quote(model._meta.db_table)
+        name = quote(self.constraint.name)
+        columns = ", ".join(quote(model._meta.get_field(field).column)
+                            for field in self.constraint.fields)
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("SELECT indisvalid FROM pg_index "
+                           "WHERE indexrelid = to_regclass(%s)",
+                           [self.constraint.name])
+            row = cursor.fetchone()
+        if row and not row[0]:
+            schema_editor.execute(f"DROP INDEX CONCURRENTLY {name}")
+        schema_editor.execute(f"CREATE UNIQUE INDEX CONCURRENTLY "
+                              f"IF NOT EXISTS {name} ON {table} ({columns})")
+        schema_editor.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} "
+                              f"UNIQUE USING INDEX {name}")
+
+
+class SetNotNullOnline(AlterField):
+    """
+    Make a nullable column NOT NULL without a long exclusive lock.
+
+    On PostgreSQL a NOT VALID check constraint is added first, which only
+    needs a brief lock. It is validated while reads and writes continue,
+    then SET NOT NULL uses it instead of scanning the table under an
+    exclusive lock, and it is dropped. Other databases alter the field
+    normally.
+    """
+
+    atomic = False
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        """Validate no row is null, then set the column NOT NULL."""
+        if not is_postgresql(schema_editor):
+            return super().database_forwards(app_label, schema_editor,
+                                             from_state, to_state)
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias,
+                                        model):
+            return
+        quote = schema_editor.quote_name
+        table = quote(model._meta.db_table)
+        column = quote(model._meta.get_field(self.name).column)
+        check = quote(f"{model._meta.db_table}_{self.name}_not_null")
+        # Left by a failed earlier attempt, possibly still NOT VALID
+        schema_editor.execute(f"ALTER TABLE {table} "
+                              f"DROP CONSTRAINT IF EXISTS {check}")
+        schema_editor.execute(f"ALTER TABLE {table} ADD CONSTRAINT {check} "
+                              f"CHECK ({column} IS NOT NULL) NOT VALID")
+        schema_editor.execute(f"ALTER TABLE {table} "
+                              f"VALIDATE CONSTRAINT {check}")
+        schema_editor.execute(f"ALTER TABLE {table} "
+                              f"ALTER COLUMN {column} SET NOT NULL")
+        schema_editor.execute(f"ALTER TABLE {table} DROP CONSTRAINT {check}")
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        """Make the column nullable again."""
+        # AlterField runs backwards through database_forwards
+        super().database_forwards(app_label, schema_editor, from_state,
+                                  to_state)
@@ -0,0 +1,127 @@
+"""
+Module contains the database router sending poll reads to replicas.
+
+Reads of polls models go to a random alias of POLLS_READ_REPLICAS, every
+write goes to the primary. A request that writes polls data pins the
+browser to the primary for POLLS_PRIMARY_PIN_SECONDS with a cookie, so
+the user's next pages (such as the results after voting) always show
+their own vote, whatever the replication lag. Pinned requests also skip
+the shared results cache, which other requests may fill from a replica.
+"""
+
+import contextvars
+import random
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = "polls_primary"
+
+# Pinning state of the request being served, shared with the threads that
+# run its ORM queries through sync_to_async
+current_pin = contextvars.ContextVar("current_pin", default=None)
+
+
+def pinned_to_primary():
+    """
+    Return True if polls reads of the request are pinned to the primary.
+
+    Shared caches may be filled from a lagging replica by other requests,
+    so pinned requests must read from the database instead.
+    """
+    pin = current_pin.get()
+    return bool(settings.POLLS_READ_REPLICAS) and pin is not None \
+        and (pin.pinned or pin.wrote)
+
+
+class Pin:
+    """Primary pinning state of a request."""
+
+    def __init__(self, pinned):
+        """Create state, pinned if a recent request wrote polls data."""
+        self.pinned = pinned
+        self.wrote = False
+
+
+class ReplicaRouter:
+    """Route reads of polls models to replicas, unless pinned to primary."""
+
+    def db_for_read(self, model, **hints):
+        """Return a replica alias for polls reads, None for the primary."""
+        replicas = settings.POLLS_READ_REPLICAS
+        if not replicas or model._meta.app_label != "polls":
+            return None
+        pin = current_pin.get()
+        if pin is not None and (pin.pinned or pin.wrote):
+            return None
+        # Reads in a transaction on the primary must see its writes
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        """Write to the primary, pinning the request if it is polls data."""
+        pin = current_pin.get()
+        if pin is not None and model._meta.app_label == "polls":
+            pin.wrote = True
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """Allow relations between primary and replicas of the database."""
+        aliases = {DEFAULT_DB_ALIAS, *settings.POLLS_READ_REPLICAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        """Only migrate the primary, replicas receive its changes."""
+        if db in settings.POLLS_READ_REPLICAS:
+            return False
+        return None
+
+
+class PrimaryPinMiddleware:
+    """
+    Pin reads of a browser to the primary after it wrote polls data.
+
+    Works with both sync and async views.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        """Create middleware for the next handler in the chain."""
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        """Serve a request with a sync handler."""
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        pin = Pin(PIN_COOKIE in request.COOKIES)
+        token = current_pin.set(pin)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_pin.reset(token)
+        return self.finish(pin, response)
+
+    async def __acall__(self, request):
+        """Serve a request with an async handler."""
+        pin = Pin(PIN_COOKIE in request.COOKIES)
+        token = current_pin.set(pin)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_pin.reset(token)
+        return self.finish(pin, response)
+
+    def finish(self, pin, response):
+        """Set the pin cookie if the request wrote polls data."""
+        if pin.wrote:
+            response.set_cookie(PIN_COOKIE, "1",
+                                max_age=settings.POLLS_PRIMARY_PIN_SECONDS,
+                                httponly=True, samesite="Lax")
+        return response
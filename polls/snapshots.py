@@ -0,0 +1,104 @@
+"""
+Module contains the results snapshots of closed polls.
+
+Results of a closed poll never change, so its final tallies are stored
+once as a snapshot and served from it instead of reading Choice rows.
+Snapshots are taken when polls are closed from the admin, and by the
+snapshot_results command for polls that closed at their end date or
+were edited since. Loading results never writes a snapshot, results of
+a poll without a current one are read from its Choice rows.
+"""
+
+from django.db.models import F, Q
+from django.utils import timezone
+
+from polls.models import Question, Choice, ResultsSnapshot
+
+
+def is_final(question):
+    """Return whether results of the question can no longer change."""
+    return question.is_published() and not question.can_vote()
+
+
+def make_snapshot(question, choices):
+    """Return unsaved snapshot of the question with its choices."""
+    return ResultsSnapshot(
+        question=question, results_version=question.results_version,
+        choices=[[choice.id, choice.choice_text, choice.vote_count]
+                 for choice in choices])
+
+
+def save_snapshots(snapshots):
+    """Insert snapshots, replacing older ones of the same questions."""
+    ResultsSnapshot.objects.bulk_create(
+        snapshots, update_conflicts=True, unique_fields=['question'],
+        update_fields=['results_version', 'choices', 'taken'])
+
+
+def snapshot_choices(question):
+    """
+    Return choices of the question from its snapshot.
+
+    The question must be loaded with select_related('snapshot').
+
+    :return: list of unsaved choices, None if the question has no snapshot
+    of its current results version
+    """
+    try:
+        snapshot = question.snapshot
+    except ResultsSnapshot.DoesNotExist:
+        return None
+    if snapshot.results_version != question.results_version:
+        return None
+    return [Choice(id=choice_id, question=question, choice_text=text,
+                   vote_count=votes)
+            for choice_id, text, votes in snapshot.choices]
+
+
+def closed_choices(question):
+    """Return choices of the closed question, from its snapshot if any."""
+    choices = snapshot_choices(question)
+    if choices is None:
+        choices = list(question.choice_set.order_by('id'))
+    return choices
+
+
+async def aclosed_choices(question):
+    """Async version of closed_choices."""
+    choices = snapshot_choices(question)
+    if choices is None:
+        choices = [choice async for choice
+                   in question.choice_set.order_by('id')]
+    return choices
+
+
+def missing_snapshots():
+    """Return closed questions without a snapshot of their results."""
+    now = timezone.now()
+    return Question.objects.filter(pub_date__lte=now, end_date__lte=now)\
+        .filter(Q(snapshot__isnull=True)
+                | ~Q(snapshot__results_version=F('results_version')))
+
+
+def take_snapshots(questions, batch_size=500):
+    """
+    Take snapshots of closed questions, a batch at a time.
+
+    :param questions: queryset of questions, those still open are skipped
+    :return: number of snapshots taken
+    """
+    now = timezone.now()
+    questions = questions.filter(pub_date__lte=now, end_date__lte=now)\
+        .order_by('pk')
+    taken = 0
+    last_id = 0
+    while batch := list(questions.filter(pk__gt=last_id)[:batch_size]):
+        choices = {}
+        for choice in Choice.objects.filter(question__in=batch)\
+                .order_by('id'):
+            choices.setdefault(choice.question_id, []).append(choice)
+        save_snapshots([make_snapshot(question, choices.get(question.id, []))
+                        for question in batch])
+        taken += len(batch)
+        last_id = batch[-1].id
+    return taken
@@ -0,0 +1,35 @@
+// Keep vote counts of an open poll up to date from the results stream
+(function () {
+  const table = document.querySelector("table[data-stream]");
+  if (!table || !window.EventSource) {
+    return;
+  }
+  const cells = {};
+  table.querySelectorAll("td[data-choice]").forEach(function (cell) {
+    cells[cell.dataset.choice] = cell;
+  });
+  const source = new EventSource(table.dataset.stream);
+  // Results version of the last snapshot, deltas up to it are counted
+  let version = 0;
+  source.addEventListener("snapshot", function (event) {
+    const snapshot = JSON.parse(event.data);
+    version = snapshot.version;
+    snapshot.choices.forEach(function (choice) {
+      if (cells[choice.id]) {
+        cells[choice.id].textContent = choice.votes;
+      }
+    });
+  });
+  source.addEventListener("delta", function (event) {
+    const data = JSON.parse(event.data);
+    if (data.version <= version) {
+      return;
+    }
+    const deltas = data.choices;
+    Object.keys(deltas).forEach(function (id) {
+      if (cells[id]) {
+        cells[id].textContent = Number(cells[id].textContent) + deltas[id];
+      }
+    });
+  });
+})();
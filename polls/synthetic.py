@@ -0,0 +1,180 @@
+"""
+Module contains the synthetic dataset generator of Poll app.
+
+Votes are spread over published questions, questions not published yet
+get none. Each voter votes at most once per question, and choices of a question are ranked by Zipf-like popularity,
+so the most popular choice get about twice the votes of the second one.
+Tallies are counted while generating, so they match the Vote rows without
+a rebuild.
+"""
+
+import datetime
+import itertools
+import random
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+
+from polls.models import Question, Choice, Vote
+
+
+def zipf_weights(count, exponent):
+    """Return cumulative Zipf weights of count ranks."""
+    return list(itertools.accumulate(1 / rank ** exponent
+                                     for rank in range(1, count + 1)))
+
+
+def question_dates(rng, now, days, closed, future):
+    """
+    Return random (pub_date, end_date) of a question.
+
+    :param closed: fraction of questions whose end_date has passed
+    :param future: fraction of questions not published yet
+    """
+    roll = rng.random()
+    if roll < future:
+        pub_date = now + datetime.timedelta(days=rng.uniform(1, days / 10))
+        return pub_date, pub_date + datetime.timedelta(days=7)
+    pub_date = now - datetime.timedelta(days=rng.uniform(1, days))
+    if roll < future + closed:
+        return pub_date, pub_date + (now - pub_date) * rng.random()
+    if rng.random() < 0.5:
+        return pub_date, None
+    return pub_date, now + datetime.timedelta(days=rng.uniform(1, 30))
+
+
+def vote_counts(dates, votes, now):
+    """
+    Return number of votes of each question.
+
+    Votes are spread evenly over the published questions, the first ones
+    take the remainder. Questions not published yet get no votes.
+
+    :param dates: list of (pub_date, end_date) of the questions
+    """
+    published = sum(pub_date <= now for pub_date, _ in dates)
+    counts = []
+    rank = 0
+    for pub_date, _ in dates:
+        if pub_date > now:
+            counts.append(0)
+            continue
+        counts.append(votes // published + (rank < votes % published))
+        rank += 1
+    return counts
+
+
+def write_rows(model, fields, rows, batch_size, use_copy):
+    """
+    Insert rows of field values without creating model instances at once.
+
+    :param use_copy: stream rows with PostgreSQL COPY instead of INSERT
+    """
+    if use_copy:
+        columns = ", ".join(connection.ops.quote_name(
+            model._meta.get_field(field).column) for field in fields)
+        table = connection.ops.quote_name(model._meta.db_table)
+        with connection.cursor() as cursor:
+            with cursor.copy(f"COPY {table} ({columns}) FROM STDIN") as copy:
+                for row in rows:
+                    copy.write_row(row)
+        return
+    rows = iter(rows)
+    while batch := list(itertools.islice(rows, batch_size)):
+        model.objects.bulk_create(
+            [model(**dict(zip(fields, row))) for row in batch])
+
+
+def generate(questions=1000, choices=4, users=10000, votes=1000000,
+             closed=0.3, future=0.05, days=365, exponent=1.0,
+             password="synthetic", prefix="synthetic", batch_size=10000,
+             use_copy=None, rng=None, progress=None):
+    """
+    Generate questions, choices, users and votes.
+
+    :param exponent: Zipf exponent of choice popularity, 0 for uniform
+    :param password: password of every generated user, hashed only once
+    :param prefix: prefix of usernames, must not be used by existing users
+    :param use_copy: use PostgreSQL COPY, default when database supports it
+    :param progress: callable receiving a message after each step
+    :return: dict with number of rows created by model
+    """
+    if use_copy is None:
+        use_copy = connection.vendor == 'postgresql'
+    rng = rng or random.Random()
+    progress = progress or (lambda message: None)
+    now = timezone.now()
+    dates = [question_dates(rng, now, days, closed, future)
+             for _ in range(questions)]
+    published = sum(pub_date <= now for pub_date, _ in dates)
+    if votes > published * users:
+        raise ValueError("Each user votes at most once per published "
+                         f"question, {votes} votes need more questions "
+                         "or users.")
+    counts = vote_counts(dates, votes, now)
+    password_hash = make_password(password)
+    with transaction.atomic():
+        write_rows(User, ['username', 'password', 'is_active', 'is_staff',
+                          'is_superuser', 'first_name', 'last_name', 'email',
+                          'date_joined'],
+                   ((f"{prefix}{n}", password_hash, True, False, False,
+                     "", "", "", now) for n in range(users)),
+                   batch_size, use_copy)
+    user_ids = list(User.objects.filter(username__startswith=prefix)
+                    .values_list('id', flat=True))
+    progress(f"Created {users} users.")
+    created = {'users': users, 'questions': 0, 'choices': 0, 'votes': 0}
+    weights = zipf_weights(choices, exponent)
+    for start in range(0, questions, max(batch_size // choices, 1)):
+        count = min(max(batch_size // choices, 1), questions - start)
+        with transaction.atomic():
+            batch_votes = generate_batch(start, dates[start:start + count],
+                                         counts[start:start + count],
+                                         choices, user_ids, weights, rng,
+                                         batch_size, use_copy)
+        created['questions'] += count
+        created['choices'] += count * choices
+        created['votes'] += batch_votes
+        progress(f"Created {created['questions']} questions, "
+                 f"{created['votes']} votes.")
+    return created
+
+
+def generate_batch(start, dates, numbers, choices, user_ids, weights, rng,
+                   batch_size, use_copy):
+    """
+    Generate a batch of questions with their choices and votes.
+
+    :param dates: list of (pub_date, end_date) of the questions
+    :param numbers: list of number of votes of the questions
+    :return: number of votes created
+    """
+    batch = Question.objects.bulk_create([
+        Question(question_text=f"Synthetic question {start + n}",
+                 pub_date=pub_date, end_date=end_date)
+        for n, (pub_date, end_date) in enumerate(dates)])
+    picks = []
+    choice_rows = []
+    for question, number in zip(batch, numbers):
+        voters = rng.sample(user_ids, number)
+        ranks = rng.choices(range(choices), cum_weights=weights, k=number)
+        counts = [0] * choices
+        for rank in ranks:
+            counts[rank] += 1
+        # Position of each popularity rank, so the most popular choice is
+        # not always the first one
+        positions = rng.sample(range(choices), choices)
+        by_position = sorted(range(choices), key=positions.__getitem__)
+        choice_rows += [Choice(question=question, vote_count=counts[rank],
+                               choice_text=f"Choice {positions[rank] + 1}")
+                        for rank in by_position]
+        picks.append((question.id, voters, ranks, positions))
+    choice_rows = Choice.objects.bulk_create(choice_rows)
+    rows = ((user_id, question_id,
+             choice_rows[n * choices + positions[rank]].id)
+            for n, (question_id, voters, ranks, positions) in enumerate(picks)
+            for user_id, rank in zip(voters, ranks))
+    write_rows(Vote, ['user_id', 'question_id', 'choice_id'], rows,
+               batch_size, use_copy)
+    return sum(len(pick[1]) for pick in picks)
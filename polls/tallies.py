@@ -0,0 +1,231 @@
+"""Module contains helpers to record votes and maintain choice tallies."""
+
+from collections import Counter
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from polls.broker import get_broker
+from polls.models import Question, Choice, Vote, ArchivedVote
+
+
+def record_vote(user, choice):
+    """
+    Create or update the vote of user on the question of choice.
+
+    Votes of the same user are serialized by locking the user row, then the
+    vote is written with a single insert-or-update on the unique
+    (user, question) constraint, so concurrent submissions can never create
+    duplicate votes or count a vote twice in the tally. Tally deltas are
+    published to live results subscribers once the transaction commits.
+
+    :return: previously voted Choice of the user, None for a new vote
+    """
+    with transaction.atomic():
+        list(User.objects.select_for_update().filter(pk=user.pk)
+             .values_list('pk'))
+        old_vote = Vote.objects.select_related('choice')\
+            .filter(user=user, question_id=choice.question_id).first()
+        Vote.objects.bulk_create(
+            [Vote(user=user, choice=choice, question_id=choice.question_id)],
+            update_conflicts=True,
+            unique_fields=['user', 'question'],
+            update_fields=['choice'])
+        old_choice = old_vote.choice if old_vote else None
+        if old_choice != choice:
+            move_vote(old_choice and old_choice.id, choice.id)
+            version = bump_version(choice.question_id)
+            deltas = vote_deltas(old_choice and old_choice.id, choice.id)
+            transaction.on_commit(lambda: get_broker().publish(
+                choice.question_id, deltas, version))
+    return old_choice
+
+
+def record_votes(votes):
+    """
+    Create or update a batch of votes, like record_vote for each of them.
+
+    Later votes of the same user on a question win over earlier ones, votes
+    whose choice or user was deleted are dropped. Users are locked in id
+    order, so batches never deadlock with each other or with record_vote,
+    and every tally is changed once per batch.
+
+    :param votes: iterable of (user_id, question_id, choice_id) in the
+    order they were submitted
+    :return: set of question ids whose results changed
+    """
+    latest = {}
+    for user_id, question_id, choice_id in votes:
+        latest[(user_id, question_id)] = choice_id
+    if not latest:
+        return set()
+    user_ids = sorted({user_id for user_id, _ in latest})
+    with transaction.atomic():
+        users = set(User.objects.select_for_update()
+                    .filter(pk__in=user_ids).order_by('pk')
+                    .values_list('pk', flat=True))
+        valid = set(Choice.objects.filter(pk__in=set(latest.values()))
+                    .values_list('pk', 'question_id'))
+        latest = {key: choice_id for key, choice_id in latest.items()
+                  if (choice_id, key[1]) in valid and key[0] in users}
+        old = {(user_id, question_id): choice_id for
+               user_id, question_id, choice_id in Vote.objects
+               .filter(user_id__in=user_ids,
+                       question_id__in={key[1] for key in latest})
+               .values_list('user_id', 'question_id', 'choice_id')}
+        Vote.objects.bulk_create(
+            [Vote(user_id=user_id, question_id=question_id,
+                  choice_id=choice_id)
+             for (user_id, question_id), choice_id in latest.items()],
+            update_conflicts=True,
+            unique_fields=['user', 'question'],
+            update_fields=['choice'])
+        deltas = {}
+        for key, choice_id in latest.items():
+            deltas.setdefault(key[1], Counter()).update(
+                vote_deltas(old.get(key), choice_id))
+        # Update rows in id order so concurrent batches cannot deadlock
+        changes = sorted(item for question_deltas in deltas.values()
+                         for item in question_deltas.items() if item[1])
+        for choice_id, delta in changes:
+            Choice.objects.filter(pk=choice_id)\
+                .update(vote_count=F('vote_count') + delta)
+        changed = {question_id for question_id, question_deltas
+                   in deltas.items() if any(question_deltas.values())}
+        versions = bump_versions(changed)
+        for question_id in changed:
+            transaction.on_commit(
+                lambda question_id=question_id: get_broker().publish(
+                    question_id, {choice_id: delta for choice_id, delta
+                                  in deltas[question_id].items() if delta},
+                    versions[question_id]))
+    return changed
+
+
+def remove_user_votes(user_id):
+    """
+    Take all votes of a user about to be deleted out of the tallies.
+
+    Must be called in the transaction deleting the user, before its votes
+    and archived votes are deleted by cascade. The user row is locked so no
+    vote of the user is recorded meanwhile.
+
+    :return: set of question ids whose results changed
+    """
+    list(User.objects.select_for_update().filter(pk=user_id)
+         .values_list('pk'))
+    deltas = {}
+    for model in (Vote, ArchivedVote):
+        for question_id, choice_id in model.objects.filter(user_id=user_id)\
+                .values_list('question_id', 'choice_id'):
+            deltas.setdefault(question_id, Counter())[choice_id] -= 1
+    # Update rows in id order so concurrent removals cannot deadlock
+    changes = sorted(item for question_deltas in deltas.values()
+                     for item in question_deltas.items())
+    for choice_id, delta in changes:
+        Choice.objects.filter(pk=choice_id)\
+            .update(vote_count=F('vote_count') + delta)
+    versions = bump_versions(deltas)
+    for question_id, question_deltas in deltas.items():
+        transaction.on_commit(
+            lambda question_id=question_id, changes=dict(question_deltas):
+            get_broker().publish(question_id, changes,
+                                 versions[question_id]))
+    return set(deltas)
+
+
+def bump_version(question_id):
+    """
+    Mark results of the question as changed.
+
+    :return: new results version of the question
+    """
+    return bump_versions([question_id]).get(question_id)
+
+
+def bump_versions(question_ids):
+    """
+    Mark results of the questions as changed, in a single UPDATE.
+
+    The new versions are returned by the UPDATE itself, deltas published
+    with them let live results streams skip deltas already counted.
+
+    :return: dict of question id to its new results version
+    """
+    question_ids = list(question_ids)
+    if not question_ids:
+        return {}
+    table = connection.ops.quote_name(Question._meta.db_table)
+    placeholders = ", ".join(["%s"] * len(question_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f"UPDATE {table} SET results_version = "
+                       f"results_version + 1, results_modified = %s "
+                       f"WHERE id IN ({placeholders}) "
+                       f"RETURNING id, results_version",
+                       [connection.ops.adapt_datetimefield_value(
+                           timezone.now()), *question_ids])
+        return dict(cursor.fetchall())
+
+
+def move_vote(old_choice_id, new_choice_id):
+    """
+    Move one vote from old choice to new choice in the tally.
+
+    Must be called in the same transaction that creates or updates the Vote
+    so the tally can never drift from the Vote rows.
+
+    :param old_choice_id: id of previously voted choice, None for a new vote
+    :param new_choice_id: id of the choice that receive the vote
+    """
+    deltas = vote_deltas(old_choice_id, new_choice_id)
+    # Update rows in id order so concurrent moves cannot deadlock
+    for choice_id in sorted(deltas):
+        Choice.objects.filter(pk=choice_id)\
+            .update(vote_count=F('vote_count') + deltas[choice_id])
+
+
+def vote_deltas(old_choice_id, new_choice_id):
+    """
+    Return tally changes of a vote moved from old choice to new choice.
+
+    :return: dict of choice id to vote change, empty if choice is the same
+    """
+    if old_choice_id == new_choice_id:
+        return {}
+    deltas = {new_choice_id: 1}
+    if old_choice_id is not None:
+        deltas[old_choice_id] = -1
+    return deltas
+
+
+def rebuild(choices=None, batch_size=1000):
+    """
+    Rebuild tallies from raw Vote rows, archived votes included.
+
+    :param choices: queryset of Choice to rebuild, default is all choices
+    :param batch_size: number of choices updated per UPDATE statement
+    :return: number of choices whose tally was wrong and got corrected
+    """
+    if choices is None:
+        choices = Choice.objects.all()
+    actual = Value(0)
+    for model in (Vote, ArchivedVote):
+        counts = model.objects.filter(choice=OuterRef('pk')).order_by()\
+            .values('choice').annotate(total=Count('pk')).values('total')
+        actual = actual + Coalesce(Subquery(counts), Value(0))
+    ids = list(choices.order_by('pk').values_list('pk', flat=True))
+    fixed = 0
+    for start in range(0, len(ids), batch_size):
+        batch = Choice.objects.filter(pk__in=ids[start:start + batch_size])\
+            .annotate(actual=actual).exclude(vote_count=F('actual'))
+        changed = set(batch.values_list('question_id', flat=True))
+        if not changed:
+            continue
+        fixed += batch.update(vote_count=actual)
+        # Corrected results are new results, so snapshots are taken again
+        Question.objects.filter(pk__in=changed)\
+            .update(results_version=F('results_version') + 1,
+                    results_modified=timezone.now())
+    return fixed
@@ -0,0 +1,149 @@
+"""Module to test the admins of Poll app."""
+
+from unittest import mock
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from polls import admin
+from polls.admin import ApproximateCountPaginator
+from polls.models import Question, Choice, Vote
+from .shortcut import create_question, create_choice
+
+
+class AdminTests(TestCase):
+    """Changelists stay at a fixed number of queries, actions are bulk."""
+
+    def setUp(self):
+        """Log in a superuser."""
+        self.admin = User.objects.create_superuser("admin", "", "FatChance!")
+        self.client.force_login(self.admin)
+        self.voters = 0
+
+    def grow(self, n_questions):
+        """Add questions with two choices and a vote each."""
+        for n in range(n_questions):
+            question = create_question(f"Question {n}", -n - 1)
+            choices = [create_choice(question, f"Choice {c}")
+                       for c in range(2)]
+            self.voters += 1
+            voter = User.objects.create(username=f"voter{self.voters}")
+            Vote.objects.create(user=voter, choice=choices[0])
+            Choice.objects.filter(pk=choices[0].pk).update(vote_count=1)
+
+    def queries(self, url, data=None):
+        """Return number of queries of a GET, or POST of data, to url."""
+        with CaptureQueriesContext(connection) as captured:
+            if data is None:
+                response = self.client.get(url)
+            else:
+                response = self.client.post(url, data)
+        self.assertIn(response.status_code, (200, 302))
+        return len(captured)
+
+    def test_changelists_fixed_queries(self):
+        """Changelist queries do not grow with the rows shown."""
+        urls = [reverse(f"admin:polls_{model}_changelist")
+                for model in ("question", "choice", "vote")]
+        self.grow(2)
+        before = [self.queries(url) for url in urls]
+        self.grow(8)
+        self.assertEqual([self.queries(url) for url in urls], before)
+
+    def test_vote_totals(self):
+        """Question list shows the total votes of each question."""
+        self.grow(2)
+        response = self.client.get(reverse("admin:polls_question_changelist"))
+        totals = [question.total_votes for question
+                  in response.context["cl"].result_list]
+        self.assertEqual(totals, [1, 1])
+
+    def test_close_polls(self):
+        """Close action ends open polls now, closed ones keep their end."""
+        url = reverse("admin:polls_question_changelist")
+        open_question = create_question("Open", -2)
+        closed = create_question("Closed", -2, -1)
+        end_date = closed.end_date
+        queries = self.queries(url, {
+            "action": "close_polls",
+            "_selected_action": [open_question.id, closed.id]})
+        open_question.refresh_from_db()
+        closed.refresh_from_db()
+        self.assertFalse(open_question.can_vote())
+        self.assertEqual(open_question.results_version, 1)
+        self.assertEqual(closed.end_date, end_date)
+        more = [create_question(f"Open {n}", -2).id for n in range(8)]
+        self.assertEqual(self.queries(url, {"action": "close_polls",
+                                            "_selected_action": more}),
+                         queries)
+        self.assertFalse(Question.objects.get(pk=more[0]).can_vote())
+
+    def test_close_skips_unpublished(self):
+        """Close action leaves polls not published yet and reports them."""
+        url = reverse("admin:polls_question_changelist")
+        future = create_question("Future", 2, 5)
+        end_date = future.end_date
+        response = self.client.post(url, {
+            "action": "close_polls", "_selected_action": [future.id]},
+            follow=True)
+        future.refresh_from_db()
+        self.assertEqual(future.end_date, end_date)
+        self.assertContains(response, "Closed 0 polls.")
+        self.assertContains(response, "Skipped 1 polls not published yet.")
+
+    def test_clone_polls(self):
+        """Clone action copies polls and choices without votes."""
+        self.grow(2)
+        originals = list(Question.objects.values_list('id', flat=True))
+        self.client.post(reverse("admin:polls_question_changelist"), {
+            "action": "clone_polls", "_selected_action": originals})
+        clones = Question.objects.exclude(pk__in=originals)
+        self.assertEqual(sorted(clones.values_list('question_text',
+                                                   flat=True)),
+                         ["Copy of Question 0", "Copy of Question 1"])
+        for clone in clones:
+            self.assertTrue(clone.can_vote())
+            self.assertEqual([(choice.choice_text, choice.vote_count)
+                              for choice in clone.choice_set.order_by('id')],
+                             [("Choice 0", 0), ("Choice 1", 0)])
+        self.assertEqual(Vote.objects.count(), 2)
+
+    def test_votes_read_only(self):
+        """Votes cannot be added, changed or deleted from the admin."""
+        self.grow(1)
+        vote = Vote.objects.get()
+        response = self.client.get(reverse("admin:polls_vote_change",
+                                           args=(vote.id,)))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'name="_save"')
+        response = self.client.get(reverse("admin:polls_vote_add"))
+        self.assertEqual(response.status_code, 403)
+
+
+class PaginatorTests(TestCase):
+    """Test the approximate count paginator."""
+
+    def test_exact_count_when_small(self):
+        """Small or filtered tables are counted exactly."""
+        create_question("Counted", -1)
+        paginator = ApproximateCountPaginator(
+            Question.objects.order_by('id'), 10)
+        self.assertEqual(paginator.count, 1)
+
+    @skipUnlessDBFeature("is_postgresql_14")
+    def test_estimate_when_large(self):
+        """Unfiltered large table uses the PostgreSQL row estimate."""
+        for n in range(3):
+            create_question(f"Estimated {n}", -1)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE polls_question")
+        with mock.patch.object(admin, "APPROXIMATE_COUNT_OVER", 1):
+            paginator = ApproximateCountPaginator(
+                Question.objects.order_by('id'), 10)
+            with self.assertNumQueries(1):
+                self.assertEqual(paginator.count, 3)
+            filtered = ApproximateCountPaginator(
+                Question.objects.filter(question_text="Estimated 0")
+                .order_by('id'), 10)
+            self.assertEqual(filtered.count, 1)
@@ -0,0 +1,97 @@
+"""Module to test the archive of votes of polls closed long ago."""
+
+import datetime
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from polls import archive, tallies
+from polls.export import export_rows
+from polls.models import ArchivedVote, Choice, Vote
+from polls.votemap import get_vote_map
+from .shortcut import create_question, create_choice
+
+
+@override_settings(POLLS_ARCHIVE_AFTER_DAYS=30)
+class ArchiveTests(TestCase):
+    """Votes move to the archive and back without changing tallies."""
+
+    def setUp(self):
+        """Create an old, a recently closed and an open poll with votes."""
+        cache.clear()
+        self.old = create_question("Old question", -90, -60)
+        self.recent = create_question("Recent question", -20, -10)
+        self.open = create_question("Open question", -1)
+        self.voters = [User.objects.create(username=f"voter{n}")
+                       for n in range(3)]
+        self.choices = {}
+        for question in (self.old, self.recent, self.open):
+            self.choices[question] = [create_choice(question, f"Choice {n}")
+                                      for n in range(2)]
+            for n, voter in enumerate(self.voters):
+                tallies.record_vote(voter, self.choices[question][n % 2])
+
+    def tallies(self):
+        """Return vote count of every choice."""
+        return dict(Choice.objects.values_list('id', 'vote_count'))
+
+    def test_archive_old_polls_only(self):
+        """Only votes of polls closed for more than the age are moved."""
+        before = self.tallies()
+        out = StringIO()
+        call_command("archive_votes", "--batch-size", "2", stdout=out)
+        self.assertIn("Archived 3 vote(s)", out.getvalue())
+        self.assertFalse(Vote.objects.filter(question=self.old).exists())
+        self.assertEqual(ArchivedVote.objects.filter(question=self.old)
+                         .count(), 3)
+        self.assertEqual(Vote.objects.count(), 6)
+        self.assertEqual(self.tallies(), before)
+        self.assertEqual(tallies.rebuild(), 0)
+
+    def test_restore_round_trip(self):
+        """Restored votes are the archived votes, with the same ids."""
+        votes = set(Vote.objects.values_list('id', 'user_id', 'choice_id'))
+        archive.archive_votes(batch_size=2)
+        with self.assertRaises(CommandError):
+            call_command("restore_votes", stdout=StringIO())
+        out = StringIO()
+        call_command("restore_votes", "--question", str(self.old.id),
+                     stdout=out)
+        self.assertIn("Restored 3 vote(s)", out.getvalue())
+        self.assertEqual(set(Vote.objects.values_list('id', 'user_id',
+                                                      'choice_id')), votes)
+        self.assertFalse(ArchivedVote.objects.exists())
+
+    def test_restore_keeps_newer_vote(self):
+        """A vote cast after archiving wins over the archived one."""
+        archive.archive_votes()
+        Vote.objects.create(user=self.voters[0],
+                            choice=self.choices[self.old][1])
+        archive.restore_votes()
+        self.assertEqual(Vote.objects.get(user=self.voters[0],
+                                          question=self.old).choice,
+                         self.choices[self.old][1])
+        self.assertEqual([choice.vote_count for choice
+                          in Choice.objects.filter(question=self.old)
+                          .order_by('id')], [1, 2])
+
+    def test_votes_still_shown(self):
+        """Vote map and vote export include archived votes."""
+        archive.archive_votes()
+        voter = self.voters[0]
+        self.assertEqual(get_vote_map(voter.id)[self.old.id],
+                         self.choices[self.old][0].id)
+        rows = list(export_rows('votes'))
+        self.assertEqual(len(rows), 9)
+        self.assertEqual(rows, sorted(rows, key=lambda row: (row[1], row[0])))
+
+    def test_reopen_restores(self):
+        """Reopening an archived poll moves its votes back."""
+        archive.archive_votes()
+        self.old.end_date = timezone.now() + datetime.timedelta(days=1)
+        self.old.save()
+        self.assertFalse(ArchivedVote.objects.exists())
+        self.assertEqual(Vote.objects.filter(question=self.old).count(), 3)
@@ -0,0 +1,79 @@
+"""Module to test async views of polls app."""
+
+from asgiref.sync import SyncToAsync, iscoroutinefunction
+from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIHandler
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from polls import tallies
+from .shortcut import create_question, create_choice
+
+
+@override_settings(ROOT_URLCONF='mysite.async_urls')
+class AsyncViewTests(TestCase):
+    """Async views render the same pages as the sync views."""
+
+    def setUp(self):
+        """Create an open and a closed question, and a voter."""
+        self.question = create_question("Async question", -1)
+        self.choice = create_choice(self.question, "Async choice")
+        self.closed = create_question("Closed async question", -5, -1)
+        self.user = User.objects.create(username="async")
+        tallies.record_vote(self.user, self.choice)
+
+    async def test_index(self):
+        """Index list published questions."""
+        response = await self.async_client.get(reverse("polls:index"))
+        self.assertEqual(response.context['latest_question_list'],
+                         [self.question, self.closed])
+
+    async def test_detail(self):
+        """Detail show choices and the choice of logged in user."""
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(
+            reverse("polls:detail", args=(self.question.id,)))
+        self.assertContains(response, "Async choice")
+        self.assertEqual(response.context['voted_choice'], self.choice.id)
+
+    async def test_detail_closed(self):
+        """Closed question detail redirect to results."""
+        response = await self.async_client.get(
+            reverse("polls:detail", args=(self.closed.id,)))
+        self.assertRedirects(response, reverse("polls:results",
+                                               args=(self.closed.id,)),
+                             fetch_redirect_response=False)
+
+    async def test_not_exist(self):
+        """Non-existent question redirect to index."""
+        for name in ["polls:detail", "polls:results"]:
+            response = await self.async_client.get(reverse(name, args=(0,)))
+            self.assertRedirects(response, reverse("polls:index"),
+                                 fetch_redirect_response=False)
+
+    async def test_results(self):
+        """Results show tallies and the user's choice."""
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(
+            reverse("polls:results", args=(self.question.id,)))
+        self.assertEqual(response.context['choices'][0].votes, 1)
+        self.assertEqual(response.context['voted_choice'], self.choice.id)
+
+    async def test_results_json(self):
+        """JSON results support conditional requests."""
+        url = reverse("polls:results_json", args=(self.question.id,))
+        response = await self.async_client.get(url)
+        self.assertEqual(response.json()['total'], 1)
+        response = await self.async_client.get(
+            url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+
+class ASGIMiddlewareTests(SimpleTestCase):
+    """ASGI requests reach async views without going through threads."""
+
+    def test_middleware_chain_async(self):
+        """Every middleware supports async, so the chain stays async."""
+        chain = ASGIHandler()._middleware_chain
+        # A sync only middleware makes Django wrap the chain in SyncToAsync
+        self.assertNotIsInstance(chain, SyncToAsync)
+        self.assertTrue(iscoroutinefunction(chain))
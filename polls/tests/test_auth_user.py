@@ -5,6 +5,7 @@ import django.test
 from .shortcut import create_user, create_question, create_choice
 from django.urls import reverse
 from django.conf import settings
+from polls.models import Vote
 
 
 class UserAuthTest(django.test.TestCase):
@@ -59,3 +60,24 @@ class UserAuthTest(django.test.TestCase):
         self.assertEqual(response.status_code, 302)
         login_with_next = f"{reverse('login')}?next={vote_url}"
         self.assertRedirects(response, login_with_next)
+
+    def test_vote_after_login(self):
+        """Choice submitted before login is voted after user logged in."""
+        vote_url = reverse('polls:vote', args=[self.question.id])
+        choice = self.question.choice_set.last()
+        self.client.post(vote_url, {"choice": f"{choice.id}"})
+        self.client.login(username=self.username, password=self.password)
+        response = self.client.get(vote_url)
+        self.assertRedirects(response, reverse('polls:results',
+                                               args=[self.question.id]))
+        self.assertEqual(Vote.objects.get(user=self.user1).choice, choice)
+
+    def test_pending_choice_is_per_session(self):
+        """Choice submitted by another visitor is not used for the user."""
+        vote_url = reverse('polls:vote', args=[self.question.id])
+        choice = self.question.choice_set.last()
+        other = django.test.Client()
+        other.post(vote_url, {"choice": f"{choice.id}"})
+        self.client.login(username=self.username, password=self.password)
+        self.client.get(vote_url)
+        self.assertFalse(Vote.objects.filter(user=self.user1).exists())
@@ -0,0 +1,35 @@
+"""Module to test the helpers of benchmark commands."""
+
+from django.test import SimpleTestCase
+from polls import benchmark
+
+BASELINE = {
+    "index": {"throughput": 100, "p50_ms": 10, "p95_ms": 20, "p99_ms": 30,
+              "queries": 1},
+}
+
+
+class CompareTests(SimpleTestCase):
+    """Test comparing a report against a baseline."""
+
+    def test_within_tolerance(self):
+        """Small changes within tolerance are not regressions."""
+        report = {"index": {"throughput": 85, "p50_ms": 11, "p95_ms": 23,
+                            "p99_ms": 35, "queries": 1},
+                  "vote": {"throughput": 1, "p50_ms": 1, "p95_ms": 1,
+                           "p99_ms": 1}}
+        self.assertEqual(benchmark.compare(report, BASELINE, 0.2), [])
+
+    def test_regressions(self):
+        """Slower latency, lower throughput and extra queries regress."""
+        report = {"index": {"throughput": 50, "p50_ms": 10, "p95_ms": 40,
+                            "p99_ms": 30, "queries": 2}}
+        regressions = benchmark.compare(report, BASELINE, 0.2)
+        self.assertEqual(len(regressions), 3)
+        self.assertIn("index: queries 2 > baseline 1", regressions)
+
+    def test_summarize_queries(self):
+        """Summary include mean queries per request when measured."""
+        summary = benchmark.summarize([0.01, 0.02, 0.03], 1, [1, 2, 3])
+        self.assertEqual(summary["queries"], 2)
+        self.assertEqual(summary["p50_ms"], 20)
@@ -0,0 +1,77 @@
+"""Module to test votes submitted concurrently."""
+
+import threading
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections
+from django.test import Client, TransactionTestCase, skipUnlessDBFeature
+from django.urls import reverse
+from polls.models import Choice, Vote
+from .shortcut import create_question, create_choice
+
+THREADS = 16
+VOTES_PER_THREAD = 5
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class ConcurrentVoteTests(TransactionTestCase):
+    """Fire many parallel votes from threads against the vote view."""
+
+    # Votes read polls from replica aliases when they are configured
+    databases = {"default", *settings.POLLS_READ_REPLICAS}
+
+    def setUp(self):
+        """Create a question with choices and a few users."""
+        self.question = create_question("Concurrent question", -1)
+        self.choices = [create_choice(self.question, f"Choice {n}")
+                        for n in range(4)]
+        self.users = [User.objects.create(username=f"user{n}")
+                      for n in range(4)]
+        self.url = reverse('polls:vote', args=(self.question.id,))
+
+    def fire(self, clients):
+        """Let every client vote repeatedly, all threads start together."""
+        barrier = threading.Barrier(len(clients))
+        errors = []
+
+        def worker(n, client):
+            try:
+                barrier.wait()
+                for i in range(VOTES_PER_THREAD):
+                    choice = self.choices[(n + i) % len(self.choices)]
+                    response = client.post(self.url, {'choice': choice.id})
+                    if response.status_code != 302:
+                        errors.append(response.status_code)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker, args=(n, client))
+                   for n, client in enumerate(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def make_clients(self):
+        """Create THREADS logged in clients spread over the users."""
+        clients = []
+        for n in range(THREADS):
+            client = Client()
+            client.force_login(self.users[n % len(self.users)])
+            clients.append(client)
+        return clients
+
+    def test_parallel_votes(self):
+        """Each user end with one vote and tallies match the votes."""
+        self.fire(self.make_clients())
+        for user in self.users:
+            self.assertEqual(Vote.objects.filter(user=user).count(), 1)
+        for choice in Choice.objects.filter(question=self.question):
+            self.assertEqual(choice.vote_count,
+                             Vote.objects.filter(choice=choice).count())
+        self.assertEqual(sum(c.vote_count for c in
+                             Choice.objects.filter(question=self.question)),
+                         len(self.users))
@@ -0,0 +1,98 @@
+"""Module to test export of poll results and votes."""
+
+import json
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from polls import tallies
+from .shortcut import create_question, create_choice
+
+
+class ExportTests(TestCase):
+    """Test export endpoint and export_polls command."""
+
+    def setUp(self):
+        """Create two polls with votes and a staff user."""
+        self.old = create_question("Old question", -30)
+        self.new = create_question("New question", -1)
+        self.old_choice = create_choice(self.old, "Old choice")
+        self.new_choice = create_choice(self.new, "New choice")
+        self.voter = User.objects.create(username="voter")
+        tallies.record_vote(self.voter, self.old_choice)
+        tallies.record_vote(self.voter, self.new_choice)
+        self.staff = User.objects.create(username="staff", is_staff=True)
+
+    def get(self, kind, **params):
+        """Request an export as staff and return the streamed body."""
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('polls:export', args=(kind,)),
+                                   params)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode()
+
+    async def test_async_stream(self):
+        """Export through ASGI is streamed by an async iterator."""
+        await self.async_client.aforce_login(self.staff)
+        response = await self.async_client.get(
+            reverse('polls:export', args=('votes',)), {'format': 'ndjson'})
+        self.assertTrue(response.is_async)
+        body = b"".join([chunk async for chunk
+                         in response.streaming_content]).decode()
+        self.assertEqual(len(body.splitlines()), 2)
+
+    def test_results_csv(self):
+        """Results export has a header and one line per choice."""
+        lines = self.get('results').splitlines()
+        self.assertEqual(lines[0], "question_id,question_text,choice_id,"
+                                   "choice_text,votes")
+        self.assertIn(f"{self.new.id},New question,{self.new_choice.id},"
+                      f"New choice,1", lines)
+        self.assertEqual(len(lines), 3)
+
+    def test_votes_ndjson(self):
+        """Votes export as NDJSON give one object per vote."""
+        rows = [json.loads(line) for line in
+                self.get('votes', format='ndjson').splitlines()]
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['username'], "voter")
+        self.assertEqual(rows[0]['choice_id'], self.old_choice.id)
+
+    def test_filter_question(self):
+        """Only the selected question is exported."""
+        rows = self.get('votes', format='ndjson', question=self.new.id)
+        self.assertEqual(len(rows.splitlines()), 1)
+        self.assertIn("New choice", rows)
+
+    def test_filter_date_range(self):
+        """Date range select polls by publication date."""
+        since = self.new.pub_date.date().isoformat()
+        lines = self.get('results', since=since).splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn("New question", lines[1])
+
+    def test_invalid_arguments(self):
+        """Invalid kind, format or date is a bad request."""
+        self.client.force_login(self.staff)
+        for kind, params in [('users', {}), ('votes', {'format': 'xml'}),
+                             ('votes', {'since': 'yesterday'}),
+                             ('votes', {'question': 'one'})]:
+            response = self.client.get(reverse('polls:export', args=(kind,)),
+                                       params)
+            self.assertEqual(response.status_code, 400)
+
+    def test_staff_only(self):
+        """Non staff user cannot export votes."""
+        self.client.force_login(self.voter)
+        response = self.client.get(reverse('polls:export', args=('votes',)))
+        self.assertEqual(response.status_code, 302)
+
+    def test_command(self):
+        """export_polls command write the same rows."""
+        out = StringIO()
+        call_command('export_polls', 'votes', '--question', str(self.old.id),
+                     stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn("Old choice,voter", lines[1])
@@ -1,7 +1,7 @@
 """Module to test index page of polls app."""
 
 from .shortcut import create_question
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
 
 
@@ -49,3 +49,57 @@ class QuestionIndexViewTests(TestCase):
         response = self.client.get(reverse("polls:index"))
         self.assertQuerySetEqual(response.context['latest_question_list'],
                                  [question2, question1])
+
+
+@override_settings(POLLS_INDEX_PAGE_SIZE=2)
+class QuestionIndexPaginationTests(TestCase):
+    """Module to test the keyset pagination of the index view."""
+
+    def setUp(self):
+        """Create five published questions, newest last."""
+        self.questions = [create_question(f"Question {n}", n - 10)
+                          for n in range(5)]
+
+    def test_first_page(self):
+        """First page contain the newest questions and a next cursor."""
+        response = self.client.get(reverse("polls:index"))
+        self.assertQuerySetEqual(response.context['latest_question_list'],
+                                 [self.questions[4], self.questions[3]])
+        self.assertIsNotNone(response.context['next_cursor'])
+
+    def test_follow_cursor(self):
+        """Following next cursor walk through every question once."""
+        seen = []
+        cursor = None
+        for _ in range(3):
+            data = {'before': cursor} if cursor else {}
+            response = self.client.get(reverse("polls:index"), data)
+            seen += response.context['latest_question_list']
+            cursor = response.context['next_cursor']
+        self.assertIsNone(cursor)
+        self.assertEqual(seen, self.questions[::-1])
+
+    def test_same_pub_date(self):
+        """Questions with the same pub_date are not skipped or repeated."""
+        for question in self.questions:
+            question.pub_date = self.questions[0].pub_date
+            question.save()
+        response = self.client.get(reverse("polls:index"))
+        cursor = response.context['next_cursor']
+        response = self.client.get(reverse("polls:index"), {'before': cursor})
+        self.assertQuerySetEqual(response.context['latest_question_list'],
+                                 [self.questions[2], self.questions[1]])
+
+    def test_invalid_cursor(self):
+        """Invalid cursor show the first page."""
+        response = self.client.get(reverse("polls:index"), {'before': 'x'})
+        self.assertQuerySetEqual(response.context['latest_question_list'],
+                                 [self.questions[4], self.questions[3]])
+
+    def test_open_status(self):
+        """Open status is computed for each question."""
+        create_question("Closed question", -1, -1)
+        response = self.client.get(reverse("polls:index"))
+        closed, opened = response.context['latest_question_list']
+        self.assertIs(closed.is_open, False)
+        self.assertIs(opened.is_open, True)
@@ -0,0 +1,73 @@
+"""Module to test the queued logging of polls app."""
+
+import json
+import logging
+import tempfile
+from pathlib import Path
+from django.test import SimpleTestCase
+from polls.log import JSONFormatter, QueuedFileHandler
+
+
+class QueuedFileHandlerTests(SimpleTestCase):
+    """Test log records written by the listener thread."""
+
+    def setUp(self):
+        """Create a logger writing to a temporary directory."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / "activity.log"
+        self.logger = logging.getLogger("polls.tests.log")
+        self.logger.propagate = False
+        self.addCleanup(setattr, self.logger, "propagate", True)
+
+    def log(self, handler, *args, **kwargs):
+        """Log a message through handler and wait until it is written."""
+        self.logger.addHandler(handler)
+        try:
+            self.logger.warning(*args, **kwargs)
+        finally:
+            self.logger.removeHandler(handler)
+            handler.close()
+
+    def test_write_formatted(self):
+        """Record is formatted with the configured formatter."""
+        handler = QueuedFileHandler(str(self.path))
+        handler.setFormatter(logging.Formatter("%(levelname)s %(message)s"))
+        self.log(handler, "User %s voted", "alice")
+        self.assertEqual(self.path.read_text(), "WARNING User alice voted\n")
+
+    def test_arguments_merged_in_caller(self):
+        """Changing an argument after logging does not change the record."""
+        handler = QueuedFileHandler(str(self.path))
+        choices = ["first"]
+        self.logger.addHandler(handler)
+        self.logger.warning("Choices %s", choices)
+        choices.append("second")
+        self.logger.removeHandler(handler)
+        handler.close()
+        self.assertEqual(self.path.read_text(), "Choices ['first']\n")
+
+    def test_json(self):
+        """JSON formatter write one object per line with the exception."""
+        handler = QueuedFileHandler(str(self.path))
+        handler.setFormatter(JSONFormatter())
+        try:
+            raise ValueError("bad choice")
+        except ValueError:
+            self.log(handler, "Vote of %s failed", "bob", exc_info=True)
+        data = json.loads(self.path.read_text())
+        self.assertEqual(data["message"], "Vote of bob failed")
+        self.assertEqual(data["level"], "WARNING")
+        self.assertIn("ValueError: bad choice", data["exception"])
+
+    def test_rotate_by_size(self):
+        """Log file is rotated once it reach the size limit."""
+        handler = QueuedFileHandler(str(self.path), max_bytes=20,
+                                    backup_count=1)
+        self.logger.addHandler(handler)
+        for n in range(3):
+            self.logger.warning("Message number %d", n)
+        self.logger.removeHandler(handler)
+        handler.close()
+        self.assertEqual(self.path.read_text(), "Message number 2\n")
+        self.assertTrue(Path(f"{self.path}.1").exists())
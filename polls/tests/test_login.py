@@ -0,0 +1,116 @@
+"""Module to test signup and the pooled authentication backend."""
+
+import threading
+from unittest import mock
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import MD5PasswordHasher
+from django.contrib.auth.models import User
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from mysite import auth
+from polls import throttle
+from .shortcut import create_user
+
+HASHES = []
+
+
+class CountingHasher(MD5PasswordHasher):
+    """Password hasher recording each hash it computes."""
+
+    algorithm = "counting"
+
+    def encode(self, password, salt):
+        """Record the hash then encode the password."""
+        HASHES.append(password)
+        return super().encode(password, salt)
+
+
+@override_settings(PASSWORD_HASHERS=["polls.tests.test_login.CountingHasher"])
+class SignupTests(TestCase):
+    """Signup must hash the new password only once."""
+
+    def setUp(self):
+        """Forget hashes of earlier tests."""
+        HASHES.clear()
+
+    def test_signup_logs_in_with_one_hash(self):
+        """New user is logged in without authenticate() hashing again."""
+        response = self.client.post(reverse("signup"), {
+            "username": "newcomer", "email": "",
+            "password1": "FatChance!", "password2": "FatChance!"})
+        self.assertRedirects(response, reverse("polls:index"))
+        self.assertEqual(len(HASHES), 1)
+        user = User.objects.get(username="newcomer")
+        self.assertEqual(int(self.client.session["_auth_user_id"]), user.id)
+
+
+class PooledBackendTests(TestCase):
+    """Passwords are checked in the bounded hasher pool."""
+
+    def setUp(self):
+        """Create a user."""
+        self.user = create_user("pooled", "FatChance!")
+
+    def test_authenticate(self):
+        """Right password authenticates, wrong or unknown user does not."""
+        request = RequestFactory().post(reverse("login"))
+        self.assertEqual(authenticate(request, username="pooled",
+                                      password="FatChance!"), self.user)
+        self.assertIsNone(authenticate(request, username="pooled",
+                                       password="wrong"))
+        self.assertIsNone(authenticate(request, username="nobody",
+                                       password="FatChance!"))
+
+    def test_hash_upgraded(self):
+        """Password hashed by an old hasher is hashed again on login."""
+        md5 = "django.contrib.auth.hashers.MD5PasswordHasher"
+        with override_settings(PASSWORD_HASHERS=[md5]):
+            self.user.set_password("FatChance!")
+            self.user.save()
+        hashers = ["django.contrib.auth.hashers.PBKDF2PasswordHasher", md5]
+        with override_settings(PASSWORD_HASHERS=hashers):
+            self.assertEqual(authenticate(username="pooled",
+                                          password="FatChance!"), self.user)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.password.startswith("md5$"))
+
+    @override_settings(AUTH_HASHER_THREADS=1, AUTH_HASHER_QUEUE=0,
+                       POLLS_THROTTLE_RATES={"login_username": "1/300",
+                                             "login_ip": "1/300", "vote": ""})
+    def test_full_pool_refuses_login(self):
+        """Login is refused at once while busy, without counting a failure."""
+        busy = threading.Event()
+        release = threading.Event()
+
+        def block():
+            busy.set()
+            release.wait(5)
+
+        pool = auth.get_pool()
+        blocker = threading.Thread(target=pool.run, args=(block,))
+        blocker.start()
+        try:
+            busy.wait(5)
+            response = self.client.post(reverse("login"), {
+                "username": "pooled", "password": "FatChance!"})
+            self.assertEqual(response.status_code, 503)
+            self.assertNotIn("_auth_user_id", self.client.session)
+            self.assertEqual(throttle.login_wait(response.wsgi_request,
+                                                 "pooled"), 0)
+        finally:
+            release.set()
+            blocker.join()
+        response = self.client.post(reverse("login"), {
+            "username": "pooled", "password": "FatChance!"})
+        self.assertEqual(response.status_code, 302)
+
+    def test_full_pool_admin_login(self):
+        """Admin login refused by a full pool gets 503, not an error."""
+        busy = mock.patch.object(auth.HasherPool, "run",
+                                 side_effect=auth.HasherBusy)
+        with busy:
+            response = self.client.post(reverse("admin:login"), {
+                "username": "pooled", "password": "FatChance!"})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertNotIn("_auth_user_id", self.client.session)
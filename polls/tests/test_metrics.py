@@ -0,0 +1,61 @@
+"""Module to test request metrics and the metrics endpoint."""
+
+import re
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from mysite.metrics import registry
+from .shortcut import create_question, create_choice
+
+
+def metric(text, line):
+    """Return value of the metric line in Prometheus text format."""
+    match = re.search(rf"^{re.escape(line)} (\S+)$", text, re.MULTILINE)
+    return float(match.group(1)) if match else None
+
+
+class MetricsTests(TestCase):
+    """Test request measurements by route."""
+
+    def setUp(self):
+        """Create a question and start with empty histograms."""
+        self.question = create_question("Metrics question", -1)
+        create_choice(self.question, "Choice")
+        registry.clear()
+
+    def test_server_timing(self):
+        """Response tell time spent and number of queries."""
+        response = self.client.get(reverse("polls:index"))
+        timing = response["Server-Timing"]
+        self.assertRegex(timing, r'^app;dur=[\d.]+, '
+                                 r'db;dur=[\d.]+;desc="1 queries", '
+                                 r'tpl;dur=[\d.]+$')
+
+    def test_histograms_by_route(self):
+        """Requests are counted by route name with their queries."""
+        self.client.get(reverse("polls:index"))
+        self.client.get(reverse("polls:index"))
+        self.client.get(reverse("polls:results", args=(self.question.id,)))
+        text = self.client.get(reverse("metrics")).content.decode()
+        self.assertEqual(metric(text, 'http_request_duration_seconds_count'
+                                      '{route="polls:index"}'), 2)
+        self.assertEqual(metric(text, 'http_request_db_queries_sum'
+                                      '{route="polls:index"}'), 2)
+        self.assertEqual(metric(text, 'http_request_duration_seconds_count'
+                                      '{route="polls:results"}'), 1)
+        self.assertGreater(metric(text, 'http_request_template_duration_'
+                                        'seconds_sum{route="polls:index"}'),
+                           0)
+
+    @override_settings(ROOT_URLCONF='mysite.async_urls')
+    async def test_async_view_queries(self):
+        """Queries of async views running in a thread are counted."""
+        response = await self.async_client.get(reverse("polls:index"))
+        self.assertIn('desc="1 queries"', response["Server-Timing"])
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_token(self):
+        """Metrics require the bearer token when it is set."""
+        url = reverse("metrics")
+        self.assertEqual(self.client.get(url).status_code, 403)
+        response = self.client.get(url, HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(response.status_code, 200)
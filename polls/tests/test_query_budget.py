@@ -0,0 +1,97 @@
+"""Module to test that polls views stay in their database query budget."""
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from polls.models import Vote
+from .shortcut import create_question, create_choice, create_user
+
+# Budget of each view, does not depend on number of choices or votes.
+# Authenticated budgets include the user lookup, sessions are read from
+# cache as with a shared cache in production, and so is the user's vote
+# map after the first page loads it.
+INDEX_BUDGET = 1
+INDEX_AUTH_BUDGET = 2
+DETAIL_BUDGET = 2
+DETAIL_AUTH_BUDGET = 3
+RESULTS_BUDGET = 2
+RESULTS_CACHED_BUDGET = 0
+RESULTS_CACHED_AUTH_BUDGET = 1
+VOTE_MAP_BUDGET = 1
+VOTE_NEW_BUDGET = 10
+VOTE_CHANGE_BUDGET = 11
+
+
+@override_settings(
+    SESSION_ENGINE="django.contrib.sessions.backends.cached_db")
+class QueryBudgetTests(TestCase):
+    """Each polls view must run a fixed number of queries."""
+
+    def setUp(self):
+        """Create a question and a logged in user."""
+        cache.clear()
+        self.question = create_question("Budget question", -1)
+        self.user = create_user("budget", "FatChance!")
+        self.voters = 0
+
+    def grow(self, n_choices, n_votes):
+        """Add choices to the question and votes from other users."""
+        choices = [create_choice(self.question, f"Choice {n}")
+                   for n in range(n_choices)]
+        for n in range(n_votes):
+            self.voters += 1
+            voter = User.objects.create(username=f"voter{self.voters}")
+            Vote.objects.create(user=voter, choice=choices[n % n_choices])
+        return choices
+
+    def assertBudget(self, budget, url, method='get', data=None):
+        """Assert the request to url run exactly budget queries."""
+        with self.assertNumQueries(budget):
+            getattr(self.client, method)(url, data)
+
+    def test_index_budget(self):
+        """Index query count does not grow with number of questions."""
+        url = reverse('polls:index')
+        self.assertBudget(INDEX_BUDGET, url)
+        for n in range(5):
+            create_question(f"Other {n}", -1)
+        self.assertBudget(INDEX_BUDGET, url)
+        self.client.force_login(self.user)
+        self.assertBudget(INDEX_AUTH_BUDGET + VOTE_MAP_BUDGET, url)
+        self.grow(4, 4)
+        self.assertBudget(INDEX_AUTH_BUDGET, url)
+
+    def test_detail_budget(self):
+        """Detail query count does not grow with choices and votes."""
+        url = reverse('polls:detail', args=(self.question.id,))
+        self.grow(2, 0)
+        self.assertBudget(DETAIL_BUDGET, url)
+        self.grow(8, 4)
+        self.assertBudget(DETAIL_BUDGET, url)
+        self.client.force_login(self.user)
+        self.assertBudget(DETAIL_AUTH_BUDGET + VOTE_MAP_BUDGET, url)
+        self.assertBudget(DETAIL_AUTH_BUDGET, url)
+
+    def test_results_budget(self):
+        """Results query count does not grow with choices and votes."""
+        url = reverse('polls:results', args=(self.question.id,))
+        self.grow(2, 2)
+        self.assertBudget(RESULTS_BUDGET, url)
+        self.grow(8, 6)
+        self.assertBudget(RESULTS_BUDGET, url)
+        self.assertBudget(RESULTS_CACHED_BUDGET, url)
+        self.client.force_login(self.user)
+        self.assertBudget(RESULTS_CACHED_AUTH_BUDGET + VOTE_MAP_BUDGET, url)
+        self.assertBudget(RESULTS_CACHED_AUTH_BUDGET, url)
+
+    def test_vote_budget(self):
+        """Vote query count does not grow with choices and votes."""
+        url = reverse('polls:vote', args=(self.question.id,))
+        choices = self.grow(2, 2)
+        self.client.force_login(self.user)
+        self.assertBudget(VOTE_NEW_BUDGET, url, 'post',
+                          {'choice': choices[0].id})
+        choices += self.grow(8, 6)
+        self.assertBudget(VOTE_CHANGE_BUDGET, url, 'post',
+                          {'choice': choices[5].id})
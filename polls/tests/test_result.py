@@ -1,6 +1,6 @@
 """Test for Question Results Page."""
 
-from .shortcut import create_question
+from .shortcut import create_question, create_choice, create_user
 from django.test import TestCase
 from django.urls import reverse
 
@@ -31,3 +31,34 @@ class QuestionResultsViewTests(TestCase):
         url = reverse("polls:results", args=(past_question.id,))
         response = self.client.get(url)
         self.assertContains(response, past_question.question_text)
+
+
+class CachedResultsViewTests(TestCase):
+    """Module to test the results cache of the result view."""
+
+    def setUp(self):
+        """Create a question with a choice and a logged in user."""
+        self.question = create_question("Cached question", -1)
+        self.choice = create_choice(self.question, "Cached choice")
+        self.user = create_user("cached", "FatChance!")
+        self.client.force_login(self.user)
+        self.url = reverse("polls:results", args=(self.question.id,))
+
+    def test_vote_invalidate_results(self):
+        """Voting invalidate cached results so new vote is shown."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['choices'][0].votes, 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("polls:vote", args=(self.question.id,)),
+                             {"choice": self.choice.id})
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['choices'][0].votes, 1)
+        self.assertEqual(response.context['voted_choice'], self.choice.id)
+
+    def test_edit_question_invalidate_results(self):
+        """Editing the question invalidate cached results."""
+        self.client.get(self.url)
+        self.question.question_text = "Edited question"
+        self.question.save()
+        response = self.client.get(self.url)
+        self.assertContains(response, "Edited question")
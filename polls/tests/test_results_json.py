@@ -0,0 +1,77 @@
+"""Module to test the JSON results endpoint."""
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from polls import tallies
+from polls.cache import invalidate_results
+from .shortcut import create_question, create_choice
+
+
+class ResultsJSONTests(TestCase):
+    """Test JSON results and its conditional responses."""
+
+    def setUp(self):
+        """Create an open question with two choices."""
+        self.question = create_question("JSON question", -1)
+        self.choice1 = create_choice(self.question, "Choice 1")
+        self.choice2 = create_choice(self.question, "Choice 2")
+        self.url = reverse("polls:results_json", args=(self.question.id,))
+
+    def vote(self, username, choice):
+        """Vote as a new user, invalidating results like the vote view."""
+        tallies.record_vote(User.objects.create(username=username), choice)
+        invalidate_results(self.question.id)
+
+    def test_results(self):
+        """Per-choice counts are returned as JSON."""
+        self.vote("voter", self.choice2)
+        data = self.client.get(self.url).json()
+        self.assertEqual(data["total"], 1)
+        self.assertEqual([c["votes"] for c in data["choices"]], [0, 1])
+        self.assertIs(data["is_open"], True)
+
+    def test_not_modified(self):
+        """Matching If-None-Match is answered 304 without any query."""
+        etag = self.client.get(self.url)["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_vote_change_etag(self):
+        """A new vote change ETag so clients get the new counts."""
+        etag = self.client.get(self.url)["ETag"]
+        self.vote("voter", self.choice1)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.json()["total"], 1)
+
+    def test_if_modified_since(self):
+        """Unchanged results since Last-Modified is answered 304."""
+        last_modified = self.client.get(self.url)["Last-Modified"]
+        response = self.client.get(self.url,
+                                   HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_open_poll_revalidate(self):
+        """Open poll results must be revalidated by clients."""
+        response = self.client.get(self.url)
+        self.assertIn("no-cache", response["Cache-Control"])
+
+    @override_settings(POLLS_CLOSED_RESULTS_CACHE_TIMEOUT=86400)
+    def test_closed_poll_long_lived(self):
+        """Closed poll results are cacheable for a long time."""
+        question = create_question("Closed JSON question", -5, -1)
+        response = self.client.get(reverse("polls:results_json",
+                                           args=(question.id,)))
+        self.assertIn("max-age=86400", response["Cache-Control"])
+        self.assertIs(response.json()["is_open"], False)
+
+    def test_unpublished(self):
+        """Unpublished question is not found."""
+        question = create_question("Future JSON question", 5)
+        response = self.client.get(reverse("polls:results_json",
+                                           args=(question.id,)))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,139 @@
+"""Module to test live results push over Server-Sent Events."""
+
+import asyncio
+import json
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from polls import tallies
+from polls.broker import Broker, LocalBackend
+from polls.cache import get_results
+from polls.models import Question
+from .shortcut import create_question, create_choice
+
+
+def parse_event(chunk):
+    """Return (event name, data) of a Server-Sent Event chunk."""
+    if isinstance(chunk, bytes):
+        chunk = chunk.decode()
+    fields = dict(line.split(": ", 1) for line in chunk.strip().split("\n"))
+    return fields.get("event"), json.loads(fields.get("data", "null"))
+
+
+@override_settings(POLLS_RESULTS_STREAM_RATE=10)
+class BrokerTests(SimpleTestCase):
+    """Test fan out and coalescing of the broker."""
+
+    async def test_coalesce(self):
+        """Deltas waiting for a subscriber are merged into one message."""
+        broker = Broker(LocalBackend())
+        subscription = broker.subscribe(1)
+        subscription.start_at(0)
+        broker.publish(1, {10: 1}, 1)
+        broker.publish(1, {10: 1, 11: -1}, 2)
+        broker.publish(2, {20: 1}, 1)
+        self.assertEqual(await subscription.next(1), (2, {10: 2, 11: -1}))
+
+    async def test_skip_counted(self):
+        """Deltas not newer than the starting version are dropped."""
+        broker = Broker(LocalBackend())
+        subscription = broker.subscribe(1)
+        broker.publish(1, {10: 1}, 5)
+        broker.publish(1, {10: 1}, 7)
+        broker.publish(1, {11: 1}, 6)
+        subscription.start_at(6)
+        broker.publish(1, {11: 1}, 4)
+        self.assertEqual(await subscription.next(1), (7, {10: 1}))
+
+    async def test_rate_limit(self):
+        """Messages are not sent faster than the configured rate."""
+        broker = Broker(LocalBackend())
+        subscription = broker.subscribe(1)
+        subscription.start_at(0)
+        loop = asyncio.get_running_loop()
+        broker.publish(1, {10: 1}, 1)
+        await subscription.next(1)
+        start = loop.time()
+        broker.publish(1, {10: 1}, 2)
+        await subscription.next(1)
+        self.assertGreaterEqual(loop.time() - start, 0.09)
+
+    async def test_timeout(self):
+        """Idle subscription return None after the timeout."""
+        broker = Broker(LocalBackend())
+        subscription = broker.subscribe(1)
+        subscription.start_at(0)
+        self.assertIsNone(await subscription.next(0.01))
+        broker.unsubscribe(subscription)
+        self.assertEqual(dict(broker.subscriptions), {})
+
+
+@override_settings(ROOT_URLCONF='mysite.async_urls',
+                   POLLS_RESULTS_STREAM_RATE=1000)
+class AsyncResultsStreamTests(TestCase):
+    """Test the results stream served through ASGI."""
+
+    def setUp(self):
+        """Create an open question with two choices."""
+        self.question = create_question("Stream question", -1)
+        self.choice1 = create_choice(self.question, "Choice 1")
+        self.choice2 = create_choice(self.question, "Choice 2")
+        self.url = reverse("polls:results_stream", args=(self.question.id,))
+
+    def vote(self, username, choice):
+        """Vote as a new user and run the on-commit callbacks."""
+        with self.captureOnCommitCallbacks(execute=True):
+            tallies.record_vote(User.objects.create(username=username),
+                                choice)
+
+    async def test_snapshot_then_delta(self):
+        """Stream start with counts and push vote changes once committed."""
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        events = aiter(response.streaming_content)
+        event, data = parse_event(await anext(events))
+        self.assertEqual(event, "snapshot")
+        self.assertEqual(data["total"], 0)
+        version = data["version"]
+        await sync_to_async(self.vote)("voter", self.choice2)
+        event, data = parse_event(await anext(events))
+        self.assertEqual(event, "delta")
+        self.assertEqual(data["choices"], {str(self.choice2.id): 1})
+        self.assertEqual(data["version"], version + 1)
+        await events.aclose()
+
+    async def test_snapshot_not_from_cache(self):
+        """Snapshot is read from the database, not stale cached results."""
+        await sync_to_async(get_results)(self.question.id)
+        await sync_to_async(self.vote)("voter", self.choice1)
+        response = await self.async_client.get(self.url)
+        events = aiter(response.streaming_content)
+        event, data = parse_event(await anext(events))
+        question = await Question.objects.aget(pk=self.question.id)
+        self.assertEqual((data["version"], data["total"]),
+                         (question.results_version, 1))
+        await events.aclose()
+
+    async def test_unpublished(self):
+        """Unpublished question has no stream."""
+        question = await sync_to_async(create_question)("Future", 5)
+        response = await self.async_client.get(
+            reverse("polls:results_stream", args=(question.id,)))
+        self.assertEqual(response.status_code, 404)
+
+
+class ResultsStreamTests(TestCase):
+    """Test the results stream served through WSGI."""
+
+    def test_single_snapshot(self):
+        """WSGI stream send a snapshot and ask the browser to reconnect."""
+        question = create_question("Stream question", -1)
+        create_choice(question, "Choice 1")
+        response = self.client.get(reverse("polls:results_stream",
+                                           args=(question.id,)))
+        chunks = list(response.streaming_content)
+        self.assertEqual(chunks[0], b"retry: 5000\n\n")
+        event, data = parse_event(chunks[1])
+        self.assertEqual(event, "snapshot")
+        self.assertEqual(data["id"], question.id)
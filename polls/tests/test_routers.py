@@ -0,0 +1,140 @@
+"""Module to test routing of poll reads to replicas."""
+
+import unittest
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connections
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from polls.cache import aget_results, get_results, results_key
+from polls.models import Choice, Question, Vote
+from polls.routers import PIN_COOKIE, Pin, ReplicaRouter, current_pin
+from .shortcut import create_question, create_choice, create_user
+
+
+@override_settings(POLLS_READ_REPLICAS=["replica1"])
+class ReplicaRouterTests(SimpleTestCase):
+    """Test routing decisions of the router."""
+
+    def setUp(self):
+        """Create the router."""
+        self.router = ReplicaRouter()
+
+    def pin(self, pinned=False):
+        """Serve the rest of the test as a request with pinning state."""
+        pin = Pin(pinned)
+        self.addCleanup(current_pin.reset, current_pin.set(pin))
+        return pin
+
+    def test_polls_read_replica(self):
+        """Reads of polls models go to a replica."""
+        self.assertEqual(self.router.db_for_read(Question), "replica1")
+
+    def test_other_read_primary(self):
+        """Reads of other apps, such as users, go to the primary."""
+        self.assertIsNone(self.router.db_for_read(User))
+
+    def test_pinned_read_primary(self):
+        """Reads of a browser pinned by an earlier vote go to the primary."""
+        self.pin(pinned=True)
+        self.assertIsNone(self.router.db_for_read(Question))
+
+    def test_read_after_write_primary(self):
+        """Reads after a polls write in the same request go to primary."""
+        pin = self.pin()
+        self.assertEqual(self.router.db_for_read(Question), "replica1")
+        self.assertIsNone(self.router.db_for_write(Vote))
+        self.assertTrue(pin.wrote)
+        self.assertIsNone(self.router.db_for_read(Question))
+
+    @override_settings(POLLS_READ_REPLICAS=[])
+    def test_no_replica(self):
+        """Every read go to the primary without replicas."""
+        self.assertIsNone(self.router.db_for_read(Question))
+
+    def test_migrate_primary_only(self):
+        """Replicas are not migrated."""
+        self.assertIs(self.router.allow_migrate("replica1", "polls"), False)
+        self.assertIsNone(self.router.allow_migrate("default", "polls"))
+
+
+class PrimaryPinMiddlewareTests(TestCase):
+    """Test the cookie pinning a browser to the primary."""
+
+    def setUp(self):
+        """Create a question and a logged in user."""
+        self.question = create_question("Pinned question", -1)
+        self.choice = create_choice(self.question, "Choice")
+        self.client.force_login(create_user("voter", "FatChance!"))
+
+    def test_vote_pin(self):
+        """Voting set the pin cookie for a short time."""
+        response = self.client.post(reverse("polls:vote",
+                                            args=(self.question.id,)),
+                                    {"choice": self.choice.id})
+        cookie = response.cookies[PIN_COOKIE]
+        self.assertEqual(cookie["max-age"],
+                         settings.POLLS_PRIMARY_PIN_SECONDS)
+
+    def test_read_no_pin(self):
+        """Reading results does not pin the browser."""
+        response = self.client.get(reverse("polls:results",
+                                           args=(self.question.id,)))
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+
+@override_settings(POLLS_READ_REPLICAS=["replica1"])
+class PinnedResultsCacheTests(TestCase):
+    """Pinned requests never read results cached from a replica."""
+
+    def setUp(self):
+        """Cache results, then change the tally behind the cache."""
+        cache.clear()
+        self.question = create_question("Cached question", -1)
+        self.choice = create_choice(self.question, "Choice")
+        with override_settings(POLLS_READ_REPLICAS=[]):
+            get_results(self.question.id)
+        Choice.objects.filter(pk=self.choice.pk).update(vote_count=5)
+        pin = Pin(pinned=True)
+        self.addCleanup(current_pin.reset, current_pin.set(pin))
+
+    def test_pinned_refill(self):
+        """Pinned request reads the primary and refills the cache."""
+        _, choices = get_results(self.question.id)
+        self.assertEqual(choices[0].votes, 5)
+        _, choices = cache.get(results_key(self.question.id))
+        self.assertEqual(choices[0].votes, 5)
+
+    async def test_async_pinned_refill(self):
+        """Async results of a pinned request are read from the primary."""
+        _, choices = await aget_results(self.question.id)
+        self.assertEqual(choices[0].votes, 5)
+
+
+@unittest.skipUnless(settings.POLLS_READ_REPLICAS,
+                     "Set DATABASE_REPLICAS to test with a replica alias.")
+class ReplicaReadTests(TransactionTestCase):
+    """Test reads reach the replica alias, except after voting."""
+
+    databases = "__all__"
+
+    def test_read_your_vote(self):
+        """Results after a vote are read from the primary."""
+        question = create_question("Replica question", -1)
+        choice = create_choice(question, "Choice")
+        self.client.force_login(create_user("voter", "FatChance!"))
+        replica = connections[settings.POLLS_READ_REPLICAS[0]]
+        results_url = reverse("polls:results", args=(question.id,))
+        with override_settings(POLLS_READ_REPLICAS=[replica.alias]), \
+                CaptureQueriesContext(replica) as replica_queries:
+            self.client.get(reverse("polls:detail", args=(question.id,)))
+            self.assertGreater(len(replica_queries), 0)
+            self.client.post(reverse("polls:vote", args=(question.id,)),
+                             {"choice": choice.id})
+            reads = len(replica_queries)
+            response = self.client.get(results_url)
+        self.assertEqual(len(replica_queries), reads)
+        self.assertEqual(response.context["voted_choice"], choice.id)
@@ -0,0 +1,74 @@
+"""Module to test session and message storage of polls views."""
+
+from django.contrib.sessions.models import Session
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import reverse
+from polls import tallies
+from .shortcut import create_question, create_choice, create_user
+
+SESSION_ENGINES = [
+    "django.contrib.sessions.backends.db",
+    "django.contrib.sessions.backends.cached_db",
+    "django.contrib.sessions.backends.signed_cookies",
+]
+
+
+class SessionStorageTests(TestCase):
+    """Test which requests read or write session storage."""
+
+    def setUp(self):
+        """Create a question with a vote."""
+        self.question = create_question("Session question", -1)
+        self.choice = create_choice(self.question, "Choice")
+        self.user = create_user("voter", "FatChance!")
+        tallies.record_vote(self.user, self.choice)
+
+    def session_queries(self, method, url, data=None):
+        """Return queries on the session table run by the request."""
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method)(url, data)
+        return response, [query["sql"] for query in context.captured_queries
+                          if Session._meta.db_table in query["sql"]]
+
+    def test_anonymous_reads(self):
+        """Anonymous index and results never touch session storage."""
+        for engine in SESSION_ENGINES:
+            with self.subTest(engine=engine), \
+                    override_settings(SESSION_ENGINE=engine):
+                for url in [reverse("polls:index"),
+                            reverse("polls:results",
+                                    args=(self.question.id,))]:
+                    response, queries = self.session_queries("get", url)
+                    self.assertEqual(queries, [])
+                    self.assertNotIn("sessionid", response.cookies)
+
+    @override_settings(SESSION_ENGINE=SESSION_ENGINES[1])
+    def test_logged_in_read_from_cache(self):
+        """Cached sessions of logged in users are not read from database."""
+        self.client.force_login(self.user)
+        _, queries = self.session_queries(
+            "get", reverse("polls:results", args=(self.question.id,)))
+        self.assertEqual(queries, [])
+
+    @override_settings(SESSION_ENGINE=SESSION_ENGINES[1])
+    def test_vote_message_cookie(self):
+        """Vote message is kept in a cookie, the session is not written."""
+        self.client.force_login(self.user)
+        response, queries = self.session_queries(
+            "post", reverse("polls:vote", args=(self.question.id,)),
+            {"choice": self.choice.id})
+        self.assertEqual(queries, [])
+        self.assertIn("messages", response.cookies)
+
+    @override_settings(
+        SESSION_ENGINE="django.contrib.sessions.backends.signed_cookies")
+    def test_signed_cookies_pending_vote(self):
+        """Anonymous choice kept in a signed cookie survive the login."""
+        url = reverse("polls:vote", args=(self.question.id,))
+        response, queries = self.session_queries("post", url,
+                                                 {"choice": self.choice.id})
+        self.assertEqual(queries, [])
+        self.assertIn("sessionid", response.cookies)
+        self.assertFalse(Session.objects.exists())
@@ -0,0 +1,131 @@
+"""Module to test results snapshots of closed polls."""
+
+from io import StringIO
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from polls import snapshots, tallies
+from polls.cache import aget_results
+from polls.models import Choice, ResultsSnapshot, Vote
+from .shortcut import create_question, create_choice
+
+
+class SnapshotTests(TestCase):
+    """Closed polls are served from their results snapshot."""
+
+    def setUp(self):
+        """Create a closed question with two choices and a vote."""
+        cache.clear()
+        self.question = create_question("Closed question", -5, -1)
+        self.choice1 = create_choice(self.question, "Choice 1")
+        self.choice2 = create_choice(self.question, "Choice 2")
+        self.user = User.objects.create(username="voter")
+        Vote.objects.create(user=self.user, choice=self.choice1)
+        tallies.rebuild()
+        self.question.refresh_from_db()
+        self.url = reverse("polls:results", args=(self.question.id,))
+
+    def votes(self, response):
+        """Return votes of each choice shown in the response."""
+        return [(choice.choice_text, choice.votes)
+                for choice in response.context["choices"]]
+
+    def take_snapshots(self):
+        """Take snapshots of closed polls without a current one."""
+        return snapshots.take_snapshots(snapshots.missing_snapshots())
+
+    def test_load_does_not_take_snapshot(self):
+        """Results without snapshot are read from choices, not snapshot."""
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(self.votes(response),
+                         [("Choice 1", 1), ("Choice 2", 0)])
+        self.assertFalse(ResultsSnapshot.objects.exists())
+
+    def test_served_from_snapshot(self):
+        """Snapshot is used without reading choices."""
+        self.assertEqual(self.take_snapshots(), 1)
+        snapshot = ResultsSnapshot.objects.get(question=self.question)
+        self.assertEqual(snapshot.choices, [[self.choice1.id, "Choice 1", 1],
+                                            [self.choice2.id, "Choice 2", 0]])
+        # Rows changed behind the back of the tallies are not read again
+        Choice.objects.filter(pk=self.choice2.pk).update(vote_count=9)
+        cache.clear()
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(self.votes(response),
+                         [("Choice 1", 1), ("Choice 2", 0)])
+
+    def test_open_poll_not_snapshot(self):
+        """Results of open polls are never snapshot."""
+        question = create_question("Open question", -1)
+        self.client.get(reverse("polls:results", args=(question.id,)))
+        self.assertFalse(ResultsSnapshot.objects.filter(question=question)
+                         .exists())
+
+    def test_edit_outdates_snapshot(self):
+        """Choice edited by admin makes the snapshot out of date."""
+        self.take_snapshots()
+        self.choice2.choice_text = "Renamed"
+        self.choice2.save()
+        response = self.client.get(self.url)
+        self.assertEqual(self.votes(response),
+                         [("Choice 1", 1), ("Renamed", 0)])
+        self.assertEqual(self.take_snapshots(), 1)
+        self.assertEqual(ResultsSnapshot.objects.get().results_version,
+                         self.question.results_version + 1)
+
+    def test_reconcile_outdates_snapshot(self):
+        """Tallies corrected by reconcile make the snapshot out of date."""
+        self.take_snapshots()
+        Choice.objects.filter(pk=self.choice2.pk).update(vote_count=9)
+        call_command("reconcile_tallies", stdout=StringIO())
+        cache.clear()
+        self.assertEqual(self.votes(self.client.get(self.url)),
+                         [("Choice 1", 1), ("Choice 2", 0)])
+        self.assertEqual(self.take_snapshots(), 1)
+
+    def test_backfill_command(self):
+        """Command snapshots closed polls missing a current snapshot."""
+        create_question("Open question", -1)
+        other = create_question("Other closed question", -5, -2)
+        create_choice(other, "Other choice")
+        out = StringIO()
+        call_command("snapshot_results", "--batch-size", "1", stdout=out)
+        self.assertIn("Took 2 results snapshot(s)", out.getvalue())
+        self.assertEqual(ResultsSnapshot.objects.get(question=other).choices,
+                         [[other.choice_set.get().id, "Other choice", 0]])
+        out = StringIO()
+        call_command("snapshot_results", stdout=out)
+        self.assertIn("Took 0 results snapshot(s)", out.getvalue())
+
+    async def test_async_results(self):
+        """Async results cache uses snapshots too, without taking them."""
+        question, choices = await aget_results(self.question.id)
+        self.assertEqual([choice.votes for choice in choices], [1, 0])
+        self.assertFalse(await ResultsSnapshot.objects.aexists())
+        await sync_to_async(self.take_snapshots)()
+        await Choice.objects.filter(pk=self.choice2.pk)\
+            .aupdate(vote_count=9)
+        await cache.aclear()
+        question, choices = await aget_results(self.question.id)
+        self.assertEqual([choice.votes for choice in choices], [1, 0])
+
+
+class CloseActionSnapshotTests(TestCase):
+    """Polls closed from the admin are snapshot right away."""
+
+    def test_close_takes_snapshot(self):
+        """Close action takes snapshots of the closed polls."""
+        question = create_question("Open question", -2)
+        create_choice(question, "Choice")
+        admin = User.objects.create_superuser("admin", "", "FatChance!")
+        self.client.force_login(admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("admin:polls_question_changelist"), {
+                "action": "close_polls", "_selected_action": [question.id]})
+        self.assertTrue(ResultsSnapshot.objects.filter(question=question)
+                        .exists())
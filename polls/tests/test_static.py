@@ -0,0 +1,67 @@
+"""Module to test serving of hashed and compressed static files."""
+
+import tempfile
+from django.core.management import call_command
+from django.templatetags.static import static
+from django.test import TestCase, override_settings
+
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
+    },
+}
+
+
+class CompressedStaticTests(TestCase):
+    """Test static files collected with compression enabled."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Collect static files of the site into a temporary directory."""
+        super().setUpClass()
+        directory = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(directory.cleanup)
+        settings = override_settings(STATIC_ROOT=directory.name,
+                                     STORAGES=STORAGES)
+        settings.enable()
+        cls.addClassCleanup(settings.disable)
+        call_command("collectstatic", interactive=False, verbosity=0,
+                     ignore_patterns=["admin"])
+
+    def test_hashed_name(self):
+        """Static URL contains a hash of the file content."""
+        self.assertRegex(static("base.css"), r"/base\.[0-9a-f]{12}\.css$")
+
+    def test_immutable(self):
+        """Hashed files are cacheable forever."""
+        response = self.client.get(static("base.css"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("immutable", response["Cache-Control"])
+
+    def test_precompressed(self):
+        """Precompressed copy is chosen from Accept-Encoding."""
+        url = static("polls/style.css")
+        brotli = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip, br")
+        self.assertEqual(brotli["Content-Encoding"], "br")
+        gzip = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(gzip["Content-Encoding"], "gzip")
+        plain = self.client.get(url)
+        self.assertNotIn("Content-Encoding", plain)
+
+    async def test_async_request(self):
+        """Static files are served to async requests with their headers."""
+        url = static("polls/style.css")
+        response = await self.async_client.get(
+            url, headers={"accept-encoding": "br"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(response["Content-Type"], "text/css; charset=\"utf-8\"")
+        self.assertEqual(int(response["Content-Length"]),
+                         len(response.content))
+        self.assertEqual(response["X-Content-Type-Options"], "nosniff")
+        response = await self.async_client.get(
+            url, headers={"if-none-match": response["ETag"]})
+        self.assertEqual(response.status_code, 304)
@@ -0,0 +1,72 @@
+"""Module to test the synthetic dataset generator."""
+
+import random
+from django.contrib.auth.models import User
+from django.db.models import F
+from django.test import TestCase
+from django.utils import timezone
+from polls import synthetic, tallies
+from polls.models import Question, Choice, Vote
+
+
+class GenerateTests(TestCase):
+    """Test generated dataset is consistent and skewed."""
+
+    def generate(self, **kwargs):
+        """Generate a small dataset with a fixed seed."""
+        options = dict(questions=10, choices=3, users=50, votes=400,
+                       batch_size=12, rng=random.Random(1))
+        options.update(kwargs)
+        return synthetic.generate(**options)
+
+    def test_counts(self):
+        """Requested number of rows are created, tallies match votes."""
+        created = self.generate()
+        self.assertEqual(created, {'users': 50, 'questions': 10,
+                                   'choices': 30, 'votes': 400})
+        self.assertEqual(Vote.objects.count(), 400)
+        self.assertEqual(Choice.objects.count(), 30)
+        self.assertEqual(tallies.rebuild(), 0)
+        self.assertFalse(Vote.objects.exclude(
+            question=F('choice__question')).exists())
+
+    def test_bulk_insert(self):
+        """Dataset can be inserted without COPY."""
+        self.generate(use_copy=False)
+        self.assertEqual(Vote.objects.count(), 400)
+        self.assertEqual(tallies.rebuild(), 0)
+
+    def test_zipf_popularity(self):
+        """Most popular choice of a question get most of the votes."""
+        self.generate(questions=1, choices=3, users=3000, votes=3000)
+        counts = sorted(Choice.objects.values_list('vote_count', flat=True))
+        # Expected shares are 6/11, 3/11 and 2/11
+        self.assertGreater(counts[2], 1400)
+        self.assertLess(counts[0], 700)
+
+    def test_password_hashed_once(self):
+        """Every user can log in with the generated password."""
+        self.generate(password="secret")
+        user = User.objects.get(username="synthetic7")
+        self.assertTrue(user.check_password("secret"))
+
+    def test_unpublished_without_votes(self):
+        """Questions not published yet get no votes, others get them all."""
+        created = self.generate(future=0.5, votes=200)
+        unpublished = Question.objects.filter(pub_date__gt=timezone.now())
+        self.assertTrue(unpublished.exists())
+        self.assertFalse(Vote.objects.filter(question__in=unpublished)
+                         .exists())
+        self.assertFalse(Choice.objects.filter(question__in=unpublished,
+                                               vote_count__gt=0).exists())
+        self.assertEqual(created['votes'], 200)
+        self.assertEqual(Vote.objects.count(), 200)
+
+    def test_too_many_votes(self):
+        """Votes cannot exceed one per user and published question."""
+        with self.assertRaises(ValueError):
+            self.generate(questions=2, users=5, votes=11)
+        with self.assertRaises(ValueError):
+            self.generate(questions=2, users=5, votes=10, future=1)
+        self.assertFalse(Question.objects.exists())
+
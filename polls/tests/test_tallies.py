@@ -0,0 +1,82 @@
+"""Module to test the persisted vote tally of choices."""
+
+from io import StringIO
+from django.core.management import call_command
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from polls import tallies
+from polls.models import ArchivedVote, Question, Vote
+from .shortcut import create_question, create_choice, create_user
+
+
+class VoteTallyTests(TestCase):
+    """Test that votes keep choice tally in sync."""
+
+    def setUp(self):
+        """Create a question with two choices and a logged in user."""
+        self.question = create_question("Tally question", -1)
+        self.choice1 = create_choice(self.question, "Choice 1")
+        self.choice2 = create_choice(self.question, "Choice 2")
+        self.user = create_user("voter", "FatChance!")
+        self.client.force_login(self.user)
+        self.vote_url = reverse('polls:vote', args=(self.question.id,))
+
+    def test_new_vote_increment_tally(self):
+        """A new vote increase the tally of the selected choice by one."""
+        self.client.post(self.vote_url, {"choice": self.choice1.id})
+        self.choice1.refresh_from_db()
+        self.choice2.refresh_from_db()
+        self.assertEqual(self.choice1.votes, 1)
+        self.assertEqual(self.choice2.votes, 0)
+
+    def test_change_vote_move_tally(self):
+        """Changing a vote move the tally from old choice to new choice."""
+        self.client.post(self.vote_url, {"choice": self.choice1.id})
+        self.client.post(self.vote_url, {"choice": self.choice2.id})
+        self.choice1.refresh_from_db()
+        self.choice2.refresh_from_db()
+        self.assertEqual(self.choice1.votes, 0)
+        self.assertEqual(self.choice2.votes, 1)
+
+    def test_same_vote_keep_tally(self):
+        """Voting the same choice again does not count twice."""
+        self.client.post(self.vote_url, {"choice": self.choice1.id})
+        self.client.post(self.vote_url, {"choice": self.choice1.id})
+        self.choice1.refresh_from_db()
+        self.assertEqual(self.choice1.votes, 1)
+
+    def test_reconcile_command(self):
+        """reconcile_tallies rebuild tallies that drift from Vote rows."""
+        Vote.objects.create(user=self.user, choice=self.choice2)
+        self.choice1.vote_count = 5
+        self.choice1.save()
+        out = StringIO()
+        call_command('reconcile_tallies', stdout=out)
+        self.choice1.refresh_from_db()
+        self.choice2.refresh_from_db()
+        self.assertEqual(self.choice1.votes, 0)
+        self.assertEqual(self.choice2.votes, 1)
+        self.assertIn("2 choice(s) corrected", out.getvalue())
+
+    def test_deleted_voter_leaves_tally(self):
+        """Deleting a voter takes their votes, archived too, out of tallies."""
+        other = create_question("Archived question", -9, -8)
+        archived = create_choice(other, "Archived choice")
+        voter = User.objects.create(username="leaving")
+        tallies.record_vote(voter, self.choice1)
+        tallies.record_vote(self.user, self.choice1)
+        tallies.record_vote(voter, archived)
+        vote = Vote.objects.get(user=voter, question=other)
+        ArchivedVote.objects.create(id=vote.id, user=voter, choice=archived,
+                                    question=other)
+        vote.delete()
+        version = Question.objects.get(pk=self.question.pk).results_version
+        with self.captureOnCommitCallbacks(execute=True):
+            voter.delete()
+        self.choice1.refresh_from_db()
+        archived.refresh_from_db()
+        self.assertEqual((self.choice1.votes, archived.votes), (1, 0))
+        self.assertEqual(Question.objects.get(pk=self.question.pk)
+                         .results_version, version + 1)
+        self.assertEqual(tallies.rebuild(), 0)
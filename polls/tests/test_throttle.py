@@ -0,0 +1,106 @@
+"""Module to test throttling of failed logins and votes."""
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from polls import throttle
+from polls.throttle import CacheStore, LocalStore
+from .shortcut import create_question, create_choice, create_user
+
+RATES = {'login_username': '3/60', 'login_ip': '5/60', 'vote': '2/60'}
+
+
+class StoreTests(TestCase):
+    """Test the stores of hit times."""
+
+    @override_settings(POLLS_THROTTLE_MAX_KEYS=2)
+    def test_local_store_window_and_eviction(self):
+        """Old hits leave the window, least recently used key is evicted."""
+        store = LocalStore()
+        for now in (0, 10, 20):
+            store.add("a", 2, 30, now)
+        self.assertEqual(store.get("a", 30, 20), [10, 20])
+        self.assertEqual(store.get("a", 30, 45), [20])
+        store.add("b", 2, 30, 20)
+        store.get("a", 30, 20)
+        store.add("c", 2, 30, 20)
+        self.assertEqual(store.get("b", 30, 20), [])
+        self.assertEqual(store.get("a", 30, 20), [10, 20])
+
+    def test_cache_store(self):
+        """Cache store keeps the last hits of the window."""
+        store = CacheStore()
+        for now in (0, 10, 20):
+            store.add("a", 2, 30, now)
+        self.assertEqual(store.get("a", 30, 20), [10, 20])
+        store.delete("a")
+        self.assertEqual(store.get("a", 30, 20), [])
+
+
+class ThrottleTests(TestCase):
+    """Requests over the limit are refused before any query."""
+
+    def setUp(self):
+        """Start with an empty store, create a user and a question."""
+        self.enterContext(override_settings(POLLS_THROTTLE_RATES=RATES))
+        self.user = create_user("throttled", "FatChance!")
+        self.question = create_question("Throttled question", -1)
+        self.choice = create_choice(self.question, "Choice")
+
+    def login(self, password, ip="10.0.0.1", username="throttled"):
+        """Post the login form from ip."""
+        return self.client.post(reverse("login"),
+                                {"username": username, "password": password},
+                                REMOTE_ADDR=ip)
+
+    def test_wait_time(self):
+        """Wait lasts until the oldest hit of the limit leaves the window."""
+        for now in (0, 10, 20):
+            throttle.record("login_username", "someone", now)
+        self.assertEqual(throttle.wait_time("login_username", "someone", 30),
+                         30)
+        self.assertEqual(throttle.wait_time("login_username", "someone", 61),
+                         0)
+
+    def test_failed_logins_by_username(self):
+        """Username is refused after too many failures, even from new IP."""
+        for n in range(3):
+            self.assertEqual(self.login("wrong", f"10.0.0.{n}").status_code,
+                             200)
+        with self.assertNumQueries(0):
+            response = self.login("FatChance!", "10.0.1.1")
+        self.assertEqual(response.status_code, 429)
+        self.assertContains(response, "Too many failed logins",
+                            status_code=429)
+        self.assertNotIn("_auth_user_id", self.client.session)
+
+    def test_failed_logins_by_ip(self):
+        """IP address is refused after too many failures, any username."""
+        for n in range(5):
+            self.login("wrong", username=f"guess{n}")
+        self.assertEqual(self.login("FatChance!").status_code, 429)
+        self.assertEqual(self.login("FatChance!", "10.0.1.1").status_code,
+                         302)
+
+    def test_login_resets_username(self):
+        """Successful login forgets earlier failures of the username."""
+        for n in range(2):
+            self.login("wrong", f"10.0.0.{n}")
+        self.assertEqual(self.login("FatChance!").status_code, 302)
+        self.client.logout()
+        for n in range(2):
+            self.login("wrong", f"10.0.0.{n}")
+        self.assertEqual(self.login("FatChance!").status_code, 302)
+
+    @override_settings(
+        SESSION_ENGINE="django.contrib.sessions.backends.cached_db")
+    def test_votes_by_user(self):
+        """User voting too fast is refused before loading anything."""
+        self.client.force_login(self.user)
+        url = reverse("polls:vote", args=(self.question.id,))
+        for n in range(2):
+            response = self.client.post(url, {"choice": self.choice.id})
+            self.assertEqual(response.status_code, 302)
+        with self.assertNumQueries(0):
+            response = self.client.post(url, {"choice": self.choice.id})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response)
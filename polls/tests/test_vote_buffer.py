@@ -0,0 +1,138 @@
+"""Module to test buffered voting and its journal."""
+
+import tempfile
+from pathlib import Path
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from polls import tallies
+from polls.models import Vote
+from polls.votebuffer import VoteBuffer, VoteJournal, get_buffer
+from .shortcut import create_question, create_choice
+
+
+class RecordVotesTests(TestCase):
+    """Test recording a batch of votes."""
+
+    def setUp(self):
+        """Create a question with two choices and two users."""
+        self.question = create_question("Batch question", -1)
+        self.choice1 = create_choice(self.question, "Choice 1")
+        self.choice2 = create_choice(self.question, "Choice 2")
+        self.user1 = User.objects.create(username="voter1")
+        self.user2 = User.objects.create(username="voter2")
+
+    def assertTallies(self, *expected):
+        """Assert vote tally of choice 1 and choice 2."""
+        self.choice1.refresh_from_db()
+        self.choice2.refresh_from_db()
+        self.assertEqual((self.choice1.votes, self.choice2.votes), expected)
+
+    def test_latest_vote_win(self):
+        """Only the last vote of a user on a question is kept."""
+        question_id = self.question.id
+        changed = tallies.record_votes([
+            (self.user1.id, question_id, self.choice1.id),
+            (self.user2.id, question_id, self.choice1.id),
+            (self.user1.id, question_id, self.choice2.id)])
+        self.assertEqual(changed, {question_id})
+        self.assertEqual(Vote.objects.get(user=self.user1).choice,
+                         self.choice2)
+        self.assertTallies(1, 1)
+
+    def test_move_existing_vote(self):
+        """Batch moves votes recorded before from their old choice."""
+        tallies.record_vote(self.user1, self.choice1)
+        tallies.record_votes([(self.user1.id, self.question.id,
+                               self.choice2.id)])
+        self.assertEqual(Vote.objects.count(), 1)
+        self.assertTallies(0, 1)
+
+    def test_replay_unchanged(self):
+        """Recording the same batch again change nothing."""
+        votes = [(self.user1.id, self.question.id, self.choice1.id)]
+        tallies.record_votes(votes)
+        self.assertEqual(tallies.record_votes(votes), set())
+        self.assertTallies(1, 0)
+
+    def test_deleted_choice_dropped(self):
+        """Vote for a choice deleted before the flush is dropped."""
+        choice = create_choice(self.question, "Deleted")
+        choice_id = choice.id
+        choice.delete()
+        tallies.record_votes([(self.user1.id, self.question.id, choice_id)])
+        self.assertFalse(Vote.objects.exists())
+
+    def test_deleted_user_dropped(self):
+        """Vote of a user deleted before the flush does not fail the batch."""
+        user_id = self.user2.id
+        self.user2.delete()
+        changed = tallies.record_votes([
+            (self.user1.id, self.question.id, self.choice1.id),
+            (user_id, self.question.id, self.choice2.id)])
+        self.assertEqual(changed, {self.question.id})
+        self.assertEqual(list(Vote.objects.values_list('user_id', flat=True)),
+                         [self.user1.id])
+        self.assertTallies(1, 0)
+
+
+class VoteBufferTests(TestCase):
+    """Test journaling votes and flushing them."""
+
+    def setUp(self):
+        """Create a question, a voter and an empty journal."""
+        self.question = create_question("Buffered question", -1)
+        self.choice = create_choice(self.question, "Choice")
+        self.user = User.objects.create(username="voter")
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = str(Path(directory.name) / "journal.sqlite3")
+
+    def test_recover_after_restart(self):
+        """Votes journaled by a previous process are flushed."""
+        VoteJournal(self.path).append(self.user.id, self.question.id,
+                                      self.choice.id)
+        journal = VoteJournal(self.path)
+        self.assertEqual(VoteBuffer(journal, 1, 10).flush(), 1)
+        self.assertEqual(len(journal), 0)
+        self.choice.refresh_from_db()
+        self.assertEqual(self.choice.votes, 1)
+
+    def test_flush_in_batches(self):
+        """Journal is flushed in batches of the buffer size."""
+        users = User.objects.bulk_create(
+            [User(username=f"batch{n}") for n in range(5)])
+        buffer = VoteBuffer(VoteJournal(self.path), 1, 2)
+        for user in users:
+            buffer.submit(user.id, self.question.id, self.choice.id)
+        self.assertTrue(buffer.wake.is_set())
+        # Six statements per batch whatever its size, in a savepoint
+        with self.assertNumQueries(3 * 8):
+            self.assertEqual(buffer.flush(), 5)
+        self.assertEqual(Vote.objects.count(), 5)
+
+    def test_deleted_user_not_blocking(self):
+        """Journal moves past votes of deleted users."""
+        gone = User.objects.create(username="gone")
+        buffer = VoteBuffer(VoteJournal(self.path), 1, 10)
+        buffer.submit(gone.id, self.question.id, self.choice.id)
+        buffer.submit(self.user.id, self.question.id, self.choice.id)
+        gone.delete()
+        self.assertEqual(buffer.flush(), 2)
+        self.assertEqual(len(buffer.journal), 0)
+        self.assertEqual(Vote.objects.get().user, self.user)
+
+    def test_buffered_vote_view(self):
+        """Vote is acknowledged and journaled, then written by a flush."""
+        self.client.force_login(self.user)
+        with override_settings(POLLS_VOTE_BUFFER=True,
+                               POLLS_VOTE_JOURNAL=self.path):
+            response = self.client.post(
+                reverse("polls:vote", args=(self.question.id,)),
+                {"choice": self.choice.id})
+            self.assertRedirects(response, reverse("polls:results",
+                                                   args=(self.question.id,)))
+            self.assertFalse(Vote.objects.exists())
+            self.assertEqual(get_buffer().flush(), 1)
+        self.assertEqual(Vote.objects.get(user=self.user).choice,
+                         self.choice)
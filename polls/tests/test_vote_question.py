@@ -0,0 +1,88 @@
+"""Module to test the denormalized question key of Vote."""
+
+from io import StringIO
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.test import TestCase, skipUnlessDBFeature
+from polls.backfill import dedupe_votes
+from polls.models import Choice, Vote
+from .shortcut import create_question, create_choice, create_user
+
+
+class VoteQuestionTests(TestCase):
+    """Test that Vote.question follows the question of the choice."""
+
+    def setUp(self):
+        """Create a question with two choices and a user."""
+        self.question = create_question("Keyed question", -1)
+        self.choice1 = create_choice(self.question, "Choice 1")
+        self.choice2 = create_choice(self.question, "Choice 2")
+        self.user = create_user("keyed", "FatChance!")
+
+    def test_save_set_question(self):
+        """Saving a vote set its question from the choice."""
+        vote = Vote.objects.create(user=self.user, choice=self.choice1)
+        self.assertEqual(vote.question, self.question)
+
+    def test_one_vote_per_question(self):
+        """A user cannot have two votes on the same question."""
+        Vote.objects.create(user=self.user, choice=self.choice1)
+        with self.assertRaises(IntegrityError):
+            Vote.objects.create(user=self.user, choice=self.choice2)
+
+    def allow_null_question(self):
+        """Make Vote.question nullable again, as before the backfill."""
+        with connection.cursor() as cursor:
+            cursor.execute("ALTER TABLE polls_vote ALTER COLUMN question_id "
+                           "DROP NOT NULL")
+
+    @skipUnlessDBFeature("is_postgresql_14")
+    def test_backfill_command(self):
+        """backfill_vote_question fill votes without question in batches."""
+        self.allow_null_question()
+        other = create_user("other", "FatChance!")
+        Vote.objects.create(user=self.user, choice=self.choice1)
+        Vote.objects.create(user=other, choice=self.choice2)
+        Vote.objects.update(question=None)
+        out = StringIO()
+        call_command('backfill_vote_question', batch_size=1, stdout=out)
+        self.assertEqual(Vote.objects.filter(question=self.question).count(),
+                         2)
+        self.assertIn("2 vote(s) updated", out.getvalue())
+
+    @skipUnlessDBFeature("is_postgresql_14")
+    def test_backfill_resume(self):
+        """Backfill skip votes up to start id."""
+        self.allow_null_question()
+        vote = Vote.objects.create(user=self.user, choice=self.choice1)
+        Vote.objects.update(question=None)
+        call_command('backfill_vote_question', start_id=vote.id,
+                     stdout=StringIO())
+        vote.refresh_from_db()
+        self.assertIsNone(vote.question_id)
+
+    @skipUnlessDBFeature("is_postgresql_14")
+    def test_dedupe_keeps_latest(self):
+        """Duplicate votes left by old races are removed, latest kept."""
+        other = create_user("other", "FatChance!")
+        with connection.cursor() as cursor:
+            cursor.execute("ALTER TABLE polls_vote DROP CONSTRAINT "
+                           "polls_vote_user_question_uniq")
+        Vote.objects.create(user=self.user, choice=self.choice1)
+        Vote.objects.create(user=self.user, choice=self.choice1)
+        latest = Vote.objects.create(user=self.user, choice=self.choice2)
+        kept = Vote.objects.create(user=other, choice=self.choice1)
+        Choice.objects.filter(pk=self.choice1.pk).update(vote_count=3)
+        Choice.objects.filter(pk=self.choice2.pk).update(vote_count=1)
+        self.assertEqual(dedupe_votes(Vote, Choice, batch_size=1), 2)
+        self.assertEqual(set(Vote.objects.values_list('pk', flat=True)),
+                         {latest.pk, kept.pk})
+        self.assertEqual(list(Choice.objects.order_by('pk')
+                              .values_list('vote_count', flat=True)), [1, 1])
+        self.assertEqual(dedupe_votes(Vote, Choice), 0)
+
+    def test_question_not_null(self):
+        """Votes cannot be stored without their question."""
+        vote = Vote.objects.create(user=self.user, choice=self.choice1)
+        with self.assertRaises(IntegrityError):
+            Vote.objects.filter(pk=vote.pk).update(question=None)
@@ -0,0 +1,106 @@
+"""Module to test the cached map of choices each user voted for."""
+
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from polls.models import Vote
+from polls.votemap import get_vote_map, set_vote, invalidate_vote_maps
+from .shortcut import create_question, create_choice, create_user
+
+
+class VoteMapTests(TestCase):
+    """Test loading and updating vote maps."""
+
+    def setUp(self):
+        """Create two questions with a choice each and a user."""
+        cache.clear()
+        self.user = create_user("mapped", "FatChance!")
+        self.question1 = create_question("Mapped question 1", -1)
+        self.question2 = create_question("Mapped question 2", -1)
+        self.choice1 = create_choice(self.question1, "Choice 1")
+        self.choice2 = create_choice(self.question2, "Choice 2")
+
+    def vote(self, choice):
+        """Create a vote of the user, as committed by record_vote."""
+        Vote.objects.create(user=self.user, choice=choice)
+
+    def test_loaded_once(self):
+        """Map is loaded with one query, then read from cache."""
+        self.vote(self.choice1)
+        with self.assertNumQueries(1):
+            self.assertEqual(get_vote_map(self.user.id),
+                             {self.question1.id: self.choice1.id})
+        with self.assertNumQueries(0):
+            get_vote_map(self.user.id)
+        self.assertEqual(get_vote_map(None), {})
+
+    def test_set_vote_updates_map(self):
+        """Vote updates the cached map without loading it again."""
+        get_vote_map(self.user.id)
+        self.vote(self.choice2)
+        set_vote(self.user.id, self.question2.id, self.choice2.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_vote_map(self.user.id),
+                             {self.question2.id: self.choice2.id})
+
+    def test_concurrent_votes_reload(self):
+        """Votes reading the same stamp cannot drop each other."""
+        get_vote_map(self.user.id)
+        self.vote(self.choice1)
+        self.vote(self.choice2)
+        incr = cache.incr
+        interleaved = []
+
+        def first_vote_meanwhile(key):
+            # First vote updates the map after the second one read it
+            if not interleaved:
+                interleaved.append(key)
+                set_vote(self.user.id, self.question1.id, self.choice1.id)
+            return incr(key)
+
+        with mock.patch.object(cache, "incr", first_vote_meanwhile):
+            set_vote(self.user.id, self.question2.id, self.choice2.id)
+        with self.assertNumQueries(1):
+            self.assertEqual(get_vote_map(self.user.id),
+                             {self.question1.id: self.choice1.id,
+                              self.question2.id: self.choice2.id})
+
+    def test_stale_load_not_used(self):
+        """Map loaded before a vote but cached after it is not used."""
+        stale = get_vote_map(self.user.id)
+        stamp_key = f"polls:votes-stamp:{self.user.id}"
+        old_stamp = cache.get(stamp_key)
+        self.vote(self.choice1)
+        set_vote(self.user.id, self.question1.id, self.choice1.id)
+        cache.set(f"polls:votes:{self.user.id}", (old_stamp, stale))
+        self.assertEqual(get_vote_map(self.user.id),
+                         {self.question1.id: self.choice1.id})
+
+    def test_invalidate(self):
+        """Invalidated map is loaded again."""
+        get_vote_map(self.user.id)
+        self.vote(self.choice1)
+        invalidate_vote_maps([self.user.id])
+        self.assertEqual(get_vote_map(self.user.id),
+                         {self.question1.id: self.choice1.id})
+
+    def test_pages_show_vote(self):
+        """Index marks voted polls, detail and results show the choice."""
+        other = User.objects.create(username="other")
+        Vote.objects.create(user=other, choice=self.choice2)
+        self.client.force_login(self.user)
+        self.client.post(reverse("polls:vote", args=(self.question1.id,)),
+                         {"choice": self.choice1.id})
+        response = self.client.get(reverse("polls:index"))
+        voted = {question.id: question.voted_choice for question
+                 in response.context["latest_question_list"]}
+        self.assertEqual(voted, {self.question1.id: self.choice1.id,
+                                 self.question2.id: None})
+        self.assertContains(response, "class='voted'", count=1)
+        for name in ("polls:detail", "polls:results"):
+            response = self.client.get(reverse(name,
+                                               args=(self.question1.id,)))
+            self.assertEqual(response.context["voted_choice"],
+                             self.choice1.id)
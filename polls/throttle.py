@@ -0,0 +1,185 @@
+"""
+Module contains the sliding window throttle of logins and votes.
+
+Each rule of POLLS_THROTTLE_RATES allows a number of hits per window of
+seconds, such as "5/300", an empty rate has no limit. Hit times of each
+key are kept in a store, a key is over its limit while the window still
+holds that many hits. Logins count failures by username and by IP
+address, votes count every request by user, or by IP address for
+visitors. Checks only read the store, so requests over the limit are
+refused before any password hash or query.
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+
+def get_client_ip(request):
+    """Get IP address of visitor or user by HTTP request."""
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for:
+        return x_forwarded_for.split(',')[0]
+    return request.META.get("REMOTE_ADDR")
+
+
+def parse_rate(rate):
+    """
+    Parse a rate such as "5/300".
+
+    :return: tuple of number of hits and window in seconds
+    """
+    hits, seconds = rate.split("/")
+    return int(hits), float(seconds)
+
+
+class LocalStore:
+    """
+    In-process store of hit times.
+
+    Holds at most POLLS_THROTTLE_MAX_KEYS keys, the least recently used
+    key is forgotten first. Each key keeps only its last hits up to the
+    limit of its rule, so memory is bounded whatever the traffic.
+    """
+
+    def __init__(self):
+        """Create empty store."""
+        self.max_keys = settings.POLLS_THROTTLE_MAX_KEYS
+        self.hits = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, window, now):
+        """Return times of hits of key in the window ending now."""
+        with self.lock:
+            hits = self.hits.get(key)
+            if hits is None:
+                return []
+            self.hits.move_to_end(key)
+            return [hit for hit in hits if hit > now - window]
+
+    def add(self, key, limit, window, now):
+        """Record a hit of key at now."""
+        with self.lock:
+            hits = self.hits.get(key)
+            if hits is None or hits.maxlen != limit:
+                hits = self.hits[key] = deque(hits or (), maxlen=limit)
+            hits.append(now)
+            self.hits.move_to_end(key)
+            while len(self.hits) > self.max_keys:
+                self.hits.popitem(last=False)
+
+    def delete(self, key):
+        """Forget hits of key."""
+        with self.lock:
+            self.hits.pop(key, None)
+
+
+class CacheStore:
+    """
+    Store of hit times in the Django cache of POLLS_THROTTLE_CACHE.
+
+    A shared cache such as Redis or Memcached applies limits across
+    worker processes. Concurrent hits of a key may overwrite each other,
+    so limits are approximate.
+    """
+
+    def __init__(self):
+        """Create store on the configured cache."""
+        self.cache = caches[settings.POLLS_THROTTLE_CACHE]
+
+    def get(self, key, window, now):
+        """Return times of hits of key in the window ending now."""
+        return [hit for hit in self.cache.get(f"throttle:{key}", [])
+                if hit > now - window]
+
+    def add(self, key, limit, window, now):
+        """Record a hit of key at now."""
+        hits = self.get(key, window, now)[-limit + 1:] if limit > 1 else []
+        self.cache.set(f"throttle:{key}", hits + [now],
+                       timeout=int(window) + 1)
+
+    def delete(self, key):
+        """Forget hits of key."""
+        self.cache.delete(f"throttle:{key}")
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Return the throttle store of this process."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = import_string(settings.POLLS_THROTTLE_STORE)()
+        return _store
+
+
+@receiver(setting_changed)
+def reset_store(sender, setting, **kwargs):
+    """Create the store again when its settings change in tests."""
+    global _store
+    if setting.startswith("POLLS_THROTTLE_"):
+        with _store_lock:
+            _store = None
+
+
+def wait_time(rule, value, now=None):
+    """
+    Return seconds until value may hit rule again, 0 if under the limit.
+
+    :param rule: name of a rule of POLLS_THROTTLE_RATES, a rule without
+    rate has no limit
+    """
+    if not settings.POLLS_THROTTLE_RATES[rule]:
+        return 0
+    limit, window = parse_rate(settings.POLLS_THROTTLE_RATES[rule])
+    now = time.time() if now is None else now
+    hits = get_store().get(f"{rule}:{value}", window, now)
+    if len(hits) < limit:
+        return 0
+    return hits[-limit] + window - now
+
+
+def record(rule, value, now=None):
+    """Record a hit of value on rule."""
+    if not settings.POLLS_THROTTLE_RATES[rule]:
+        return
+    limit, window = parse_rate(settings.POLLS_THROTTLE_RATES[rule])
+    now = time.time() if now is None else now
+    get_store().add(f"{rule}:{value}", limit, window, now)
+
+
+def reset(rule, value):
+    """Forget hits of value on rule."""
+    get_store().delete(f"{rule}:{value}")
+
+
+def login_wait(request, username):
+    """Return seconds until username may try to log in from request."""
+    wait = wait_time("login_username", username)
+    if request is not None:
+        wait = max(wait, wait_time("login_ip", get_client_ip(request)))
+    return wait
+
+
+def vote_wait(request, user_id):
+    """
+    Record a vote request, return seconds to wait if it is over the limit.
+
+    :param user_id: id of logged in user, None to count by IP address
+    """
+    if user_id is not None:
+        value = f"user{user_id}"
+    else:
+        value = get_client_ip(request)
+    wait = wait_time("vote", value)
+    if not wait:
+        record("vote", value)
+    return wait
@@ -2,10 +2,27 @@
 from django.urls import path
 from . import views
 
+
+def polls_patterns(read_views):
+    """
+    Return urlpatterns of polls app.
+
+    :param read_views: module providing index, detail and results views
+    and the results stream, either polls.views or polls.async_views
+    """
+    return [
+        path('', read_views.IndexView.as_view(), name='index'),
+        path("<int:pk>/", read_views.DetailView.as_view(), name='detail'),
+        path("<int:pk>/results/", read_views.ResultsView.as_view(),
+             name='results'),
+        path("<int:pk>/results.json", read_views.results_json,
+             name='results_json'),
+        path("<int:pk>/results/stream/", read_views.results_stream,
+             name='results_stream'),
+        path("<int:question_id>/vote/", views.vote, name='vote'),
+        path("export/<str:kind>/", views.export, name='export'),
+    ]
+
+
 app_name = 'polls'
-urlpatterns = [
-    path('', views.IndexView.as_view(), name='index'),
-    path("<int:pk>/", views.DetailView.as_view(), name='detail'),
-    path("<int:pk>/results/", views.ResultsView.as_view(), name='results'),
-    path("<int:question_id>/vote/", views.vote, name='vote'),
-]
+urlpatterns = polls_patterns(views)
@@ -1,34 +1,114 @@
 """Module defined view class of each pages of Poll app."""
 
+import datetime
+import json
+import math
 from typing import Any
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.auth import SESSION_KEY
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.signals import user_logged_in, user_logged_out
 from django.contrib.auth.signals import user_login_failed
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
 from django.http import HttpRequest, HttpResponse, HttpResponseRedirect
+from django.http import Http404, HttpResponseBadRequest
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.urls import reverse
 from django.views import generic
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
 import django.contrib.messages as messages
 from django.dispatch import receiver
+from django.db import transaction
+from django.db.models import BooleanField, ExpressionWrapper, Q
 import logging
 
-from polls.models import Question, Choice, Vote
+from polls import tallies, throttle
+from polls.cache import get_results, invalidate_results
+from polls.export import CONTENT_TYPES, ExportError
+from polls.export import aiter_lines, export_rows, parse_moment, stream
+from polls.models import Question, Choice
+from polls.throttle import get_client_ip
+from polls.votebuffer import get_buffer
+from polls.votemap import get_vote_map, set_vote
 
 logger = logging.getLogger(__name__)
-user_choice = None  # Store choice in case of unauthenticated votes
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+# Session key of choices submitted by unauthenticated user, by question id
+PENDING_CHOICES_KEY = "pending_choices"
 
 
 class IndexView(generic.ListView):
-    """Index view show all published questions."""
+    """
+    Index view show published questions, newest first.
+
+    Questions are paginated with a keyset cursor on (pub_date, id), so the
+    cost of a page does not depend on how deep the user has browsed.
+    """
 
     template_name = "polls/index.html"
     context_object_name = "latest_question_list"
 
     def get_queryset(self):
-        """Return the last five published questions."""
-        return Question.objects.filter(pub_date__lte=timezone.now())\
-            .order_by("-pub_date")
+        """Return a page of published questions, plus one to detect more."""
+        now = timezone.now()
+        queryset = Question.objects.filter(pub_date__lte=now)\
+            .only('id', 'question_text', 'pub_date')\
+            .annotate(is_open=ExpressionWrapper(
+                Q(end_date__isnull=True) | Q(end_date__gt=now),
+                output_field=BooleanField()))\
+            .order_by('-pub_date', '-id')
+        cursor = decode_cursor(self.request.GET.get('before'))
+        if cursor is not None:
+            pub_date, question_id = cursor
+            queryset = queryset.filter(
+                Q(pub_date__lt=pub_date)
+                | Q(pub_date=pub_date, id__lt=question_id))
+        return queryset[:settings.POLLS_INDEX_PAGE_SIZE + 1]
+
+    def get(self, request: HttpRequest,
+            *args: Any, **kwargs: Any) -> HttpResponse:
+        """Show a page of questions, with the user's votes on them."""
+        self.vote_map = get_vote_map(get_user_id(request))
+        return super().get(request, *args, **kwargs)
+
+    def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
+        """Add cursor of the next page and the user's choices."""
+        context = super().get_context_data(**kwargs)
+        questions = list(self.object_list)
+        page_size = settings.POLLS_INDEX_PAGE_SIZE
+        for question in questions:
+            question.voted_choice = self.vote_map.get(question.id)
+        context['latest_question_list'] = questions[:page_size]
+        context['is_first_page'] = 'before' not in self.request.GET
+        context['next_cursor'] = None
+        if len(questions) > page_size:
+            context['next_cursor'] = encode_cursor(questions[page_size - 1])
+        return context
+
+
+def encode_cursor(question):
+    """Return index page cursor pointing after the given question."""
+    micros = (question.pub_date - EPOCH) // datetime.timedelta(microseconds=1)
+    return f"{micros}.{question.id}"
+
+
+def decode_cursor(cursor):
+    """
+    Parse index page cursor made by encode_cursor.
+
+    :return: tuple of (pub_date, question id), or None for invalid cursor
+    """
+    try:
+        micros, question_id = map(int, cursor.split('.'))
+        return EPOCH + datetime.timedelta(microseconds=micros), question_id
+    except (AttributeError, ValueError, OverflowError):
+        return None
 
 
 class DetailView(generic.DetailView):
@@ -45,19 +125,11 @@ class DetailView(generic.DetailView):
         """
         Override of get_context_data.
 
-        Modify Context data.
+        Add choices of the question and previous selected choice of the user.
         """
         context = super().get_context_data(**kwargs)
-        # Check for previous selected choice
-        if self.request.user.is_authenticated:
-            try:
-                # User is authenticated
-                vote = Vote.objects.get(user=self.request.user,
-                                        choice__question=self.question)
-                context['voted_choice'] = vote.choice.id
-            except (Vote.DoesNotExist):
-                # User is not authenticated
-                context['voted_choice'] = None
+        context['choices'] = self.choices
+        context['voted_choice'] = self.voted_choice
         return context
 
     def get(self, request: HttpRequest,
@@ -67,155 +139,292 @@ class DetailView(generic.DetailView):
 
         Check for question that does not exist and redirects user.
         """
-        question_id = kwargs['pk']
         try:
-            self.question = Question.objects.get(pk=question_id)
-            if (not self.question.is_published()):  # Check for unpublished
-                raise Question.DoesNotExist("Unpublished Question")
-            elif (not self.question.can_vote()):   # Check if unable to vote
-                return HttpResponseRedirect(reverse('polls:results',
-                                            args=(self.question.id,)))
-            return super().get(request, *args, **kwargs)
-        except (Question.DoesNotExist):
-            return handle_access_non_exist_question(request, question_id)
+            self.object = self.get_object()
+        except Http404:
+            return handle_access_non_exist_question(request, kwargs['pk'])
+        if not self.object.can_vote():  # Check if unable to vote
+            return HttpResponseRedirect(reverse('polls:results',
+                                        args=(self.object.id,)))
+        self.choices = list(self.object.choice_set.all())
+        self.voted_choice = get_voted_choice(request, self.object)
+        context = self.get_context_data(object=self.object)
+        return self.render_to_response(context)
 
 
 class ResultsView(generic.DetailView):
-    """Results view show question and each choice score."""
+    """
+    Results view show question and each choice score.
+
+    Question and choices come from the results cache, only the user's choice
+    is looked up per request. Closed polls are served from their results
+    snapshot on a cache miss, without reading choices or votes.
+    """
 
     model = Question
     template_name = "polls/results.html"
 
-    def get_queryset(self):
-        """Excludes any questions that aren't published yet."""
-        return Question.objects.filter(pub_date__lte=timezone.now())
-
     def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
         """Override get context data method of Detail View."""
         context = super().get_context_data(**kwargs)
-        try:
-            if (self.request.user.is_authenticated):
-                vote = Vote.objects.get(user=self.request.user,
-                                        choice__question=self.question)
-                context['voted_choice'] = vote.choice.id
-            else:
-                context['voted_choice'] = None
-        except (Vote.DoesNotExist):
-            context['voted_choice'] = None
+        context['choices'] = self.choices
+        context['voted_choice'] = self.voted_choice
         return context
 
     def get(self, request: HttpRequest,
             *args: Any, **kwargs: Any) -> HttpResponse:
         """Override of get method of an View superclass."""
-        self.request = request
-        question_id = kwargs['pk']
-        try:
-            self.question = Question.objects.get(pk=question_id)
-            if not self.question.is_published():
-                raise Question.DoesNotExist
-            return super().get(request, *args, **kwargs)
-        except (Question.DoesNotExist):
-            return handle_access_non_exist_question(request, question_id)
+        results = get_results(kwargs['pk'])
+        if results is None or not results[0].is_published():
+            return handle_access_non_exist_question(request, kwargs['pk'])
+        self.object, self.choices = results
+        self.voted_choice = get_voted_choice(request, self.object)
+        context = self.get_context_data(object=self.object)
+        return self.render_to_response(context)
+
+
+@require_safe
+def results_json(request: HttpRequest, pk: int) -> HttpResponse:
+    """
+    Return results of the question as JSON.
+
+    ETag comes from the results version of the question, so clients polling
+    with If-None-Match get 304 without counts being recomputed. Results of
+    closed polls are cacheable for a long time.
+    """
+    return results_json_response(request, pk, get_results(pk))
+
+
+def results_json_response(request, pk, results):
+    """
+    Build JSON results response of the question.
+
+    :param results: tuple of (question, choices) from the results cache
+    """
+    if results is None or not results[0].is_published():
+        return JsonResponse({"error": f"Polls {pk} not exists."}, status=404)
+    question, choices = results
+    etag = f'"{question.id}-{question.results_version}"'
+    last_modified = int((question.results_modified
+                         or question.pub_date).timestamp())
+    response = get_conditional_response(request, etag=etag,
+                                        last_modified=last_modified)
+    if response is None:
+        response = JsonResponse(results_data(question, choices))
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    if question.can_vote():
+        patch_cache_control(response, public=True, no_cache=True)
+    else:
+        patch_cache_control(
+            response, public=True,
+            max_age=settings.POLLS_CLOSED_RESULTS_CACHE_TIMEOUT)
+    return response
+
+
+def results_data(question, choices):
+    """Return results of the question as a JSON serializable dict."""
+    return {
+        "id": question.id,
+        "question": question.question_text,
+        "pub_date": question.pub_date,
+        "end_date": question.end_date,
+        "is_open": question.can_vote(),
+        "version": question.results_version,
+        "total": sum(choice.votes for choice in choices),
+        "choices": [{"id": choice.id, "text": choice.choice_text,
+                     "votes": choice.votes} for choice in choices],
+    }
+
+
+def results_stream(request: HttpRequest, pk: int) -> HttpResponse:
+    """
+    Return results of the question as a single Server-Sent Event.
+
+    Served when the site runs through WSGI, where an open stream would hold
+    a worker thread. The browser reconnects after the retry delay, so the
+    page still refreshes the counts, only at a slower pace than with the
+    async stream.
+    """
+    results = get_results(pk)
+    if results is None or not results[0].is_published():
+        raise Http404(f"Polls {pk} not exists.")
+    return results_stream_response([
+        "retry: 5000\n\n",
+        sse_event("snapshot", results_data(*results))])
+
+
+def results_stream_response(events):
+    """Build Server-Sent Events response streaming the events."""
+    response = StreamingHttpResponse(events, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Disable response buffering of nginx style reverse proxies
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+def sse_event(event, data):
+    """Return a Server-Sent Event with data encoded as JSON."""
+    return f"event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+
+
+def get_user_id(request):
+    """Return id of the logged in user, None for visitors."""
+    return request.user.id if request.user.is_authenticated else None
+
+
+def get_voted_choice(request, question):
+    """
+    Get the id of choice the current user voted for in the question.
+
+    :return: choice id, or None if user is anonymous or has not voted yet
+    """
+    return get_vote_map(get_user_id(request)).get(question.id)
 
 
 def handle_access_non_exist_question(request, question_id):
     """Redirect user to index page when question is not exists."""
     messages.error(request, f"Polls {question_id} not exists.")
-    error_str = f"IP {get_client_ip(request)} tried to access"\
-                f"non-existent question (ID: {question_id})"
-    logger.error(error_str)
+    logger.error("IP %s tried to access non-existent question (ID: %s)",
+                 get_client_ip(request), question_id)
     return redirect(f"{reverse('polls:index')}")
 
 
 @login_required
 def voting(request: HttpRequest, question_id: int) -> HttpResponse:
     """Handle votes POST request from vote button (detail page)."""
-    global user_choice
     question = get_object_or_404(Question, pk=question_id)
     # Reference to current user
     cur_user = request.user
+    # Choice submitted before login is kept in session until processed
+    pending_choice = pop_pending_choice(request, question_id)
     try:
-        if (user_choice is not None):
-            selected_choice = user_choice
-        else:
-            selected_choice = question.choice_set\
-                              .get(pk=request.POST["choice"])
-    except (KeyError, Choice.DoesNotExist):
+        selected_choice = question.choice_set\
+            .get(pk=request.POST.get("choice", pending_choice))
+    except (ValueError, Choice.DoesNotExist):
         # Redisplay the question voting form
         messages.error(request, "You didn't select a choice.")
         context = {
             "question": question,
+            "choices": question.choice_set.all(),
         }
         return render(request, 'polls/detail.html', context=context)
     if not question.can_vote():
         messages.error(request, "This polls is closed.")
         context = {
             "question": question,
+            "choices": question.choice_set.all(),
         }
         return render(request, 'polls/detail.html', context=context)
 
-    # Get the user vote's
-    try:
-        vote = cur_user.vote_set.get(choice__question=question)
-        old_choice = vote.choice.choice_text
-        # User has a vote for this question, update the choice.
-        vote.choice = selected_choice
-        vote.save()
+    if settings.POLLS_VOTE_BUFFER:
+        return buffered_voting(request, question, selected_choice)
+    old_choice = tallies.record_vote(cur_user, selected_choice)
+    transaction.on_commit(lambda: invalidate_results(question.id))
+    transaction.on_commit(lambda: set_vote(cur_user.id, question.id,
+                                           selected_choice.id))
+    if old_choice is None:
+        messages.success(request,
+                         f"Your voted for '{selected_choice.choice_text}'")
+        logger.info("User %s Vote choice %s (Question: %s)",
+                    cur_user.username, selected_choice.choice_text,
+                    question.question_text)
+    else:
         messages.success(request,
                          f"Your vote was updated to "
                          f"'{selected_choice.choice_text}'")
-        log_str = f"User {cur_user.username} Update vote From {old_choice} "\
-                  f"to {selected_choice.choice_text} "\
-                  f"(Question: {question.question_text})"
-        logger.info(log_str)
-    except (KeyError, Vote.DoesNotExist):
-        # User don't have a vote yet
-        vote = Vote.objects.create(user=cur_user, choice=selected_choice)
-        messages.success(request,
-                         f"Your voted for '{selected_choice.choice_text}'")
-        log_str = f"User {cur_user.username} "\
-                  f"Vote choice{selected_choice.choice_text} "\
-                  f"(Question: {question.question_text})"
-        logger.info(log_str)
-    selected_choice.save()
+        logger.info("User %s Update vote From %s to %s (Question: %s)",
+                    cur_user.username, old_choice.choice_text,
+                    selected_choice.choice_text, question.question_text)
     # Redirect user to results page
     return HttpResponseRedirect(reverse('polls:results', args=(question.id,)))
 
 
+def buffered_voting(request, question, selected_choice):
+    """Journal a validated vote, it reaches the results once flushed."""
+    get_buffer().submit(request.user.id, question.id, selected_choice.id)
+    # Shown as voted right away, the vote reaches the results once flushed
+    set_vote(request.user.id, question.id, selected_choice.id)
+    messages.success(request,
+                     f"Your vote for '{selected_choice.choice_text}' "
+                     f"was received")
+    logger.info("User %s Vote choice %s (Question: %s, buffered)",
+                request.user.username, selected_choice.choice_text,
+                question.question_text)
+    return HttpResponseRedirect(reverse('polls:results', args=(question.id,)))
+
+
 def vote(request: HttpRequest, question_id: int) -> HttpResponse:
     """Handle votes POST request from vote button (detail page)."""
-    global user_choice
-    if not request.user.is_authenticated:
+    # Refuse votes over the rate limit before loading the user or question
+    wait = throttle.vote_wait(request, request.session.get(SESSION_KEY))
+    if wait:
+        return throttled_response(wait, "Too many votes")
+    if not request.user.is_authenticated and "choice" in request.POST:
         # User does not authenticated, save their choice before redirect
-        question = get_object_or_404(Question, pk=question_id)
-        try:
-            user_choice = question.choice_set.get(pk=request.POST["choice"])
-        except (KeyError, Choice.DoesNotExist):
-            user_choice = None
-    response = voting(request, question_id)
-    if request.user.is_authenticated:
-        # user is now authenticated and those choice supposed to be processed
-        # delete the user_choice after processed
-        user_choice = None
-    return response  # return the response from vote operation
+        pending = request.session.get(PENDING_CHOICES_KEY, {})
+        pending[str(question_id)] = request.POST["choice"]
+        request.session[PENDING_CHOICES_KEY] = pending
+    return voting(request, question_id)
+
+
+def throttled_response(wait, reason):
+    """Return 429 response telling client to retry after wait seconds."""
+    seconds = math.ceil(wait)
+    response = HttpResponse(f"{reason}, try again in {seconds} seconds.",
+                            status=429, content_type="text/plain")
+    response["Retry-After"] = str(seconds)
+    return response
+
+
+def pop_pending_choice(request, question_id):
+    """
+    Remove and return the choice user submitted before logging in.
+
+    :return: submitted choice id, or None if nothing is pending
+    """
+    pending = request.session.get(PENDING_CHOICES_KEY)
+    if not pending or str(question_id) not in pending:
+        return None
+    choice_id = pending.pop(str(question_id))
+    request.session[PENDING_CHOICES_KEY] = pending
+    return choice_id
+
+
+@staff_member_required
+def export(request: HttpRequest, kind: str) -> HttpResponse:
+    """
+    Stream poll results or votes as CSV or NDJSON.
+
+    Query parameters: format (csv or ndjson), question (repeatable),
+    since and until (publication date range of polls). Served through
+    ASGI, lines are streamed by an async iterator.
+    """
+    fmt = request.GET.get("format", "csv")
+    try:
+        rows = export_rows(kind,
+                           questions=request.GET.getlist("question"),
+                           since=parse_moment(request.GET.get("since")),
+                           until=parse_moment(request.GET.get("until")))
+        lines = stream(kind, fmt, rows)
+    except ExportError as error:
+        return HttpResponseBadRequest(str(error))
+    if isinstance(request, ASGIRequest):
+        lines = aiter_lines(lines)
+    response = StreamingHttpResponse(lines, content_type=CONTENT_TYPES[fmt])
+    response["Content-Disposition"] = f'attachment; filename="{kind}.{fmt}"'
+    return response
 
 
 # Logging for Authorization system
-def get_client_ip(request):
-    """Get IP address of visitor or user by HTTP request."""
-    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    if x_forwarded_for:
-        return x_forwarded_for.split(',')[0]
-    return request.META.get("REMOTE_ADDR")
-
-
 @receiver(user_logged_in)
 def log_user_logged_in(sender, request, user, **kwargs):
     """Log user log in action."""
     ip_addr = get_client_ip(request)
     if (not user):
-        logger.error(f"User is none in logged in request (IP: {ip_addr})")
-    logger.info(f"User {user.username} has logged in (IP: {ip_addr})")
+        logger.error("User is none in logged in request (IP: %s)", ip_addr)
+    logger.info("User %s has logged in (IP: %s)", user.username, ip_addr)
+    throttle.reset("login_username", user.get_username())
 
 
 @receiver(user_logged_out)
@@ -223,8 +432,8 @@ def log_user_logged_out(sender, request, user, **kwargs):
     """Log user log out action."""
     ip_addr = get_client_ip(request)
     if (not user):
-        logger.error(f"User is none in logged out request (IP: {ip_addr})")
-    logger.info(f"User {user.username} has logged out (IP: {ip_addr})")
+        logger.error("User is none in logged out request (IP: %s)", ip_addr)
+    logger.info("User %s has logged out (IP: %s)", user.username, ip_addr)
 
 
 @receiver(user_login_failed)
@@ -232,4 +441,6 @@ def log_user_login_failed(sender, credentials, request, **kwargs):
     """Log user failed to login."""
     ip_addr = get_client_ip(request)
     username = credentials['username']
-    logger.warn(f"User Failed Login to {username} (IP: {ip_addr})")
+    logger.warning("User Failed Login to %s (IP: %s)", username, ip_addr)
+    throttle.record("login_username", username)
+    throttle.record("login_ip", ip_addr)
@@ -0,0 +1,200 @@
+"""
+Module contains the write-behind buffer of buffered voting mode.
+
+When POLLS_VOTE_BUFFER is on, validated votes are appended to a local
+SQLite journal and acknowledged right away. A background thread flushes
+the journal to the database in batches, every POLLS_VOTE_FLUSH_INTERVAL
+milliseconds or as soon as POLLS_VOTE_FLUSH_SIZE votes are waiting.
+
+Journal rows are only removed after their batch is committed, so votes
+left by a crash are flushed when the site starts again. Replaying a batch
+that was already committed does not change anything.
+"""
+
+import contextlib
+import logging
+import sqlite3
+import threading
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import close_old_connections
+from django.dispatch import receiver
+
+from polls import tallies
+from polls.cache import invalidate_results
+from polls.votemap import invalidate_vote_maps
+
+logger = logging.getLogger(__name__)
+
+
+class VoteJournal:
+    """Append-only SQLite journal of votes waiting to be flushed."""
+
+    def __init__(self, path):
+        """Create journal stored in the file at path."""
+        self.path = str(path)
+        self.local = threading.local()
+
+    def connect(self):
+        """Return SQLite connection of the current thread."""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30,
+                                   isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Each appended vote is on disk before it is acknowledged
+            conn.execute("PRAGMA synchronous=FULL")
+            conn.execute("CREATE TABLE IF NOT EXISTS vote ("
+                         "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                         "user_id INTEGER NOT NULL, "
+                         "question_id INTEGER NOT NULL, "
+                         "choice_id INTEGER NOT NULL)")
+            self.local.conn = conn
+        return conn
+
+    def append(self, user_id, question_id, choice_id):
+        """Append a vote to the journal."""
+        self.connect().execute(
+            "INSERT INTO vote (user_id, question_id, choice_id) "
+            "VALUES (?, ?, ?)", (user_id, question_id, choice_id))
+
+    def read(self, limit):
+        """Return the oldest votes as (id, user_id, question_id, choice_id)."""
+        return self.connect().execute(
+            "SELECT id, user_id, question_id, choice_id FROM vote "
+            "ORDER BY id LIMIT ?", (limit,)).fetchall()
+
+    def remove(self, last_id):
+        """Remove votes up to last_id, once they are in the database."""
+        self.connect().execute("DELETE FROM vote WHERE id <= ?", (last_id,))
+
+    def __len__(self):
+        """Return number of votes waiting in the journal."""
+        return self.connect().execute("SELECT COUNT(*) FROM vote")\
+            .fetchone()[0]
+
+    @contextlib.contextmanager
+    def flush_lock(self):
+        """
+        Hold the flush lock of the journal, shared by every process.
+
+        Only one flusher at a time may read and remove votes, otherwise an
+        older vote of a user could overwrite a newer one.
+
+        :return: True if the lock was acquired, False if another flusher
+        holds it
+        """
+        conn = sqlite3.connect(self.path + "-lock", timeout=0,
+                               isolation_level=None)
+        try:
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+            except sqlite3.OperationalError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                conn.execute("ROLLBACK")
+        finally:
+            conn.close()
+
+
+class VoteBuffer:
+    """Journal votes and flush them to the database in the background."""
+
+    def __init__(self, journal, interval, size):
+        """
+        Create buffer of the journal.
+
+        :param interval: seconds between flushes
+        :param size: most votes per batch, reaching it triggers a flush
+        """
+        self.journal = journal
+        self.interval = interval
+        self.size = size
+        self.waiting = 0
+        self.wake = threading.Event()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def submit(self, user_id, question_id, choice_id):
+        """Durably journal a validated vote, to be recorded later."""
+        self.journal.append(user_id, question_id, choice_id)
+        self.waiting += 1
+        if self.waiting >= self.size:
+            self.wake.set()
+
+    def start(self):
+        """Start flusher thread if not running."""
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+
+    def run(self):
+        """Flush the journal until the process exits, first at start."""
+        while True:
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Flushing buffered votes failed")
+            finally:
+                close_old_connections()
+            self.wake.wait(self.interval)
+            self.wake.clear()
+
+    def flush(self):
+        """
+        Record every journaled vote in the database, batch by batch.
+
+        :return: number of journaled votes flushed
+        """
+        flushed = 0
+        with self.journal.flush_lock() as acquired:
+            if not acquired:
+                return 0
+            self.waiting = 0
+            while True:
+                rows = self.journal.read(self.size)
+                if not rows:
+                    break
+                changed = tallies.record_votes(row[1:] for row in rows)
+                for question_id in changed:
+                    invalidate_results(question_id)
+                # Maps read before the flush may miss the flushed votes
+                invalidate_vote_maps({row[1] for row in rows})
+                self.journal.remove(rows[-1][0])
+                flushed += len(rows)
+        if flushed:
+            logger.info("Flushed %d buffered votes", flushed)
+        return flushed
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    """Return the vote buffer of this process, configured from settings."""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = VoteBuffer(VoteJournal(settings.POLLS_VOTE_JOURNAL),
+                                 settings.POLLS_VOTE_FLUSH_INTERVAL / 1000,
+                                 settings.POLLS_VOTE_FLUSH_SIZE)
+        return _buffer
+
+
+def start_buffer(sender, **kwargs):
+    """Start flushing, recovering votes journaled before a restart."""
+    get_buffer().start()
+
+
+@receiver(setting_changed)
+def reset_buffer(sender, setting, **kwargs):
+    """Configure the buffer again when its settings change in tests."""
+    global _buffer
+    if setting.startswith("POLLS_VOTE_"):
+        with _buffer_lock:
+            _buffer = None
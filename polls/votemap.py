@@ -0,0 +1,132 @@
+"""
+Module contains the cached map of choices each user voted for.
+
+The map of a user is {question id: choice id} of all their votes, loaded
+with one query and kept in cache with a version stamp. Each vote
+increments the stamp, and the map is updated only when no other vote
+incremented it meanwhile, otherwise it is loaded again on the next read.
+A map cached under an old stamp, such as one read from the database just
+before a vote, is never used. Archived votes of old polls are in the map
+too. Stamps only guard maps in one cache, with a cache in each process
+the maps of other processes are kept briefly, see POLLS_VOTE_MAP_TIMEOUT.
+"""
+
+import random
+from django.conf import settings
+from django.core.cache import cache
+
+from polls.models import Vote, ArchivedVote
+
+VOTES_KEY = "polls:votes:{}"
+STAMP_KEY = "polls:votes-stamp:{}"
+
+
+def votes_key(user_id):
+    """Return cache key of the vote map of the user."""
+    return VOTES_KEY.format(user_id)
+
+
+def stamp_key(user_id):
+    """Return cache key of the version stamp of the user's vote map."""
+    return STAMP_KEY.format(user_id)
+
+
+def cached_map(values, user_id):
+    """
+    Return cached vote map if its stamp is current, else None.
+
+    :param values: result of cache get_many of the map and stamp keys
+    """
+    entry = values.get(votes_key(user_id))
+    stamp = values.get(stamp_key(user_id))
+    if entry is None or stamp is None or entry[0] != stamp:
+        return None
+    return entry[1]
+
+
+def current_stamp(values, user_id):
+    """Return the stamp read in values, starting a new one if missing."""
+    stamp = values.get(stamp_key(user_id))
+    if stamp is None:
+        # Random start, so a map left from an evicted stamp never matches
+        cache.add(stamp_key(user_id), random.getrandbits(48),
+                  settings.POLLS_VOTE_MAP_TIMEOUT)
+        stamp = cache.get(stamp_key(user_id))
+    return stamp
+
+
+async def acurrent_stamp(values, user_id):
+    """Async version of current_stamp."""
+    stamp = values.get(stamp_key(user_id))
+    if stamp is None:
+        await cache.aadd(stamp_key(user_id), random.getrandbits(48),
+                         settings.POLLS_VOTE_MAP_TIMEOUT)
+        stamp = await cache.aget(stamp_key(user_id))
+    return stamp
+
+
+def user_votes(user_id):
+    """Return queryset of (question id, choice id) of all the user's votes."""
+    return Vote.objects.filter(user_id=user_id)\
+        .values_list('question_id', 'choice_id')\
+        .union(ArchivedVote.objects.filter(user_id=user_id)
+               .values_list('question_id', 'choice_id'), all=True)
+
+
+def get_vote_map(user_id):
+    """
+    Get {question id: choice id} of the user's votes, from cache if possible.
+
+    :return: vote map, empty for anonymous users (user_id None)
+    """
+    if user_id is None:
+        return {}
+    values = cache.get_many([votes_key(user_id), stamp_key(user_id)])
+    votes = cached_map(values, user_id)
+    if votes is None:
+        stamp = current_stamp(values, user_id)
+        votes = dict(user_votes(user_id))
+        cache.set(votes_key(user_id), (stamp, votes),
+                  settings.POLLS_VOTE_MAP_TIMEOUT)
+    return votes
+
+
+async def aget_vote_map(user_id):
+    """Async version of get_vote_map using the async ORM on cache miss."""
+    if user_id is None:
+        return {}
+    values = await cache.aget_many([votes_key(user_id), stamp_key(user_id)])
+    votes = cached_map(values, user_id)
+    if votes is None:
+        stamp = await acurrent_stamp(values, user_id)
+        votes = {question_id: choice_id async for question_id, choice_id
+                 in user_votes(user_id)}
+        await cache.aset(votes_key(user_id), (stamp, votes),
+                         settings.POLLS_VOTE_MAP_TIMEOUT)
+    return votes
+
+
+def set_vote(user_id, question_id, choice_id):
+    """
+    Record a committed vote of the user in their cached map.
+
+    The stamp is incremented atomically, the map is only written when the
+    increment follows the stamp it was read with, so concurrent votes of
+    the same user cannot drop each other from the map.
+    """
+    values = cache.get_many([votes_key(user_id), stamp_key(user_id)])
+    votes = cached_map(values, user_id)
+    try:
+        stamp = cache.incr(stamp_key(user_id))
+    except ValueError:
+        # No stamp, the map is loaded again on the next read
+        return
+    if votes is not None and stamp == values[stamp_key(user_id)] + 1:
+        cache.set(votes_key(user_id), (stamp, {**votes,
+                                               question_id: choice_id}),
+                  settings.POLLS_VOTE_MAP_TIMEOUT)
+
+
+def invalidate_vote_maps(user_ids):
+    """Make cached vote maps of the users load again on next read."""
+    cache.delete_many([stamp_key(user_id) for user_id in user_ids])